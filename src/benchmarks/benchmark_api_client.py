@@ -0,0 +1,130 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from preprocessing.api_football_client import ApiFootballClient, HEADER_MINUTE_LIMIT, HEADER_MINUTE_REMAINING
+
+
+class StubApiServer(ThreadingHTTPServer):
+    """
+    Local stub of API-Football answering 'fixtures/statistics' after a latency.
+
+    The first request of every `failure_interval`-th fixture fails alternately with 429 and 503,
+    such that the retries of the client are exercised. The server counts the requests and the
+    maximum number of requests in flight.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency, failure_interval):
+        super().__init__(('127.0.0.1', 0), StubApiHandler)
+        self.latency = latency
+        self.failure_interval = failure_interval
+        self.lock = threading.Lock()
+        self.n_requests = 0
+        self.n_failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failed_fixtures = set()
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # the headers and the body are written separately, without this every response waits for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        fixture_id = int(parse_qs(url.query)['fixture'][0])
+        with server.lock:
+            server.n_requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = fixture_id % server.failure_interval == 0 and fixture_id not in server.failed_fixtures
+            if fail:
+                server.failed_fixtures.add(fixture_id)
+                server.n_failures += 1
+        time.sleep(server.latency)
+
+        if fail:
+            status = 429 if fixture_id // server.failure_interval % 2 else 503
+            body = b'{}'
+        else:
+            status = 200
+            body = json.dumps({'errors': [], 'response': [{'fixture': fixture_id}]}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header(HEADER_MINUTE_LIMIT, '100000')
+        self.send_header(HEADER_MINUTE_REMAINING, '100000')
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+        with server.lock:
+            server.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PoolFullCounter(logging.Handler):
+    """Counts the warnings of urllib3 about connections discarded because the pool is full."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if 'Connection pool is full' in record.getMessage():
+            self.count += 1
+
+
+def run_benchmark(n_sessions, n_fixtures, max_workers, latency, failure_interval):
+    server = StubApiServer(latency, failure_interval)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    pool_full_counter = PoolFullCounter()
+    logging.getLogger('urllib3.connectionpool').addHandler(pool_full_counter)
+
+    # like retrieve_competition_seasons_in_parallel, several sessions share one client
+    client = ApiFootballClient({}, base_url, requests_per_second=1000, max_workers=max_workers, backoff_factor=0.01,
+                               response_cache=False)
+    sessions = [range(session * n_fixtures + 1, (session + 1) * n_fixtures + 1) for session in range(n_sessions)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_sessions) as executor:
+        results = list(executor.map(lambda fixtures: client.get_many(('fixtures/statistics', {'fixture': fixture_id}) for fixture_id in fixtures),
+                                    sessions))
+    elapsed = time.perf_counter() - start
+    client.close()
+    server.shutdown()
+    logging.getLogger('urllib3.connectionpool').removeHandler(pool_full_counter)
+
+    n_correct = sum(response is not None and response['response'][0]['fixture'] == fixture_id
+                    for fixtures, responses in zip(sessions, results) for fixture_id, response in zip(fixtures, responses))
+    n_total = n_sessions * n_fixtures
+    print(f"sessions: {n_sessions}, fixtures per session: {n_fixtures}, workers: {max_workers}")
+    print(f"correct responses:      {n_correct}/{n_total}")
+    print(f"requests (failures):    {server.n_requests} ({server.n_failures})")
+    print(f"max requests in flight: {server.max_in_flight}")
+    print(f"pool full warnings:     {pool_full_counter.count}")
+    print(f"time:                   {elapsed:.2f}s ({n_total / elapsed:.0f} responses/s)")
+    return n_correct == n_total and server.max_in_flight <= max_workers and pool_full_counter.count == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API-Football client against a local stub server with parallel sessions.")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--fixtures", type=int, default=100, help="number of requested fixtures per session")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02, help="latency of the stub server in seconds")
+    parser.add_argument("--failure-interval", type=int, default=10, help="every n-th fixture fails on its first request")
+    args = parser.parse_args()
+    ok = run_benchmark(args.sessions, args.fixtures, args.workers, args.latency, args.failure_interval)
+    print("ok" if ok else "FAILED")
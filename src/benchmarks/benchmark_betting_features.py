@@ -0,0 +1,76 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from preprocessing.data_preprocessor import get_favorite, get_underdog, get_result, calculate_margin, add_betting_info
+
+BET_TARGETS = ['favorite', 'underdog', 'draw']
+
+
+def generate_matches(n_matches, seed=42):
+    """
+    Generates a synthetic DataFrame of matches with odds and goals.
+
+    Parameters
+    ----------
+    n_matches : int
+        Number of matches to generate.
+    seed : int, optional
+        Seed of the random number generator, by default 42.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the columns 'home_odds', 'draw_odds', 'away_odds', 'home_goals' and 'away_goals'.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'home_odds': rng.uniform(1.1, 10, n_matches).round(2),
+        'draw_odds': rng.uniform(2.5, 6, n_matches).round(2),
+        'away_odds': rng.uniform(1.1, 10, n_matches).round(2),
+        'home_goals': rng.poisson(1.5, n_matches),
+        'away_goals': rng.poisson(1.2, n_matches),
+    })
+
+
+def betting_info_apply(df):
+    """Reference implementation with the row-wise apply calls."""
+    df = df.copy()
+    df['favorite'] = df.apply(get_favorite, axis=1)
+    df['underdog'] = df.apply(get_underdog, axis=1)
+    df['result'] = df.apply(get_result, axis=1)
+    for bet_target in BET_TARGETS:
+        df['win_margin_bet_on_' + bet_target] = df.apply(calculate_margin, args=(bet_target, 10), axis=1)
+    return df
+
+
+def betting_info_vectorized(df):
+    return add_betting_info(df, bet_targets=BET_TARGETS)
+
+
+def time_function(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def run_benchmark(sizes, repeat=3):
+    for n_matches in sizes:
+        df = generate_matches(n_matches)
+        time_apply, df_apply = time_function(betting_info_apply, df, repeat)
+        time_vectorized, df_vectorized = time_function(betting_info_vectorized, df, repeat)
+
+        pd.testing.assert_frame_equal(df_apply, df_vectorized, check_dtype=False)
+        print(f"{n_matches:>8} matches: apply {time_apply:8.4f}s | vectorized {time_vectorized:8.4f}s | "
+              f"speedup {time_apply / time_vectorized:6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the betting features against the row-wise apply path.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.repeat)
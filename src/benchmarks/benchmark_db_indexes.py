@@ -0,0 +1,134 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from db.db_manager import (create_matches_table, create_substitute_table, create_startingXI_table, create_players_table,
+                           create_fifa_players_table, create_statistics_player_table, match_fixture_teams_by_name, check_player_exists,
+                           SCHEMA_MIGRATIONS)
+from db.migrations import configure_connection, apply_migrations
+
+TEST_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'test.csv')
+
+# same query as FIFAPlayerScraper.get_teams_for_season
+TEAMS_FOR_SEASON_QUERY = """
+SELECT DISTINCT M.home_team 
+FROM Matches M 
+INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
+WHERE S.player_id = ? AND M.season = ? AND S.team = 'home'
+UNION
+SELECT DISTINCT M.away_team 
+FROM Matches M 
+INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
+WHERE S.player_id = ? AND M.season = ? AND S.team = 'away'
+"""
+
+
+def seed_database(database_path, csv_path, n_players=5000, seed=42):
+    """
+    Creates a database with the matches of test.csv and synthetic starting XIs and FIFA cards.
+
+    Parameters
+    ----------
+    database_path : str
+        Path of the SQLite database to create.
+    csv_path : str
+        Path of the CSV file with the matches.
+    n_players : int, optional
+        Number of distinct players, by default 5000.
+    seed : int, optional
+        Seed of the random number generator, by default 42.
+
+    Returns
+    -------
+    pd.DataFrame
+        The seeded matches.
+    """
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(database_path)
+    for create_table in [create_matches_table, create_substitute_table, create_startingXI_table, create_players_table,
+                         create_fifa_players_table, create_statistics_player_table]:
+        create_table(conn)
+
+    df_matches = pd.read_csv(csv_path, usecols=['fixture_id', 'competition_name', 'season', 'home_team', 'away_team',
+                                                'home_goals', 'away_goals', 'match_date', 'match_time', 'match_status'])
+    df_matches['fixture_id'] = df_matches['fixture_id'].astype(str)
+    df_matches['match_date'] = pd.to_datetime(df_matches['match_date']).dt.strftime('%d.%m.%Y')
+    df_matches.to_sql('Matches', conn, if_exists='append', index=False)
+
+    lineups = [(fixture_id, str(rng.integers(n_players)), 'M', '1:1', team)
+               for fixture_id in df_matches['fixture_id'] for team in ('home', 'away') for _ in range(11)]
+    conn.executemany("INSERT INTO StartingXI (fixture_id, player_id, position, position_on_grid, team) VALUES (?, ?, ?, ?, ?)", lineups)
+
+    cards = [(str(player_id), int(rng.integers(50, 95)), f"01.09.{2014 + version}")
+             for player_id in range(0, n_players, 2) for version in range(9)]
+    conn.executemany("INSERT INTO FIFA_Player_Statistics (player_id, overall_rating, date_fifa_card) VALUES (?, ?, ?)", cards)
+    conn.commit()
+    conn.close()
+    return df_matches
+
+
+def get_lookups(df_matches, n_lookups, seed=42):
+    """Returns the arguments of the benchmarked lookups, sampled from the seeded matches."""
+    df_sample = df_matches.sample(n_lookups, replace=True, random_state=seed)
+    rng = np.random.default_rng(seed)
+    return {
+        'match_fixture_teams_by_name': list(zip(df_sample['match_date'], df_sample['home_team'], df_sample['away_team'])),
+        'fuzzy_match_team_names (date scan)': list(df_sample['match_date']),
+        'StartingXI by fixture_id': list(df_sample['fixture_id']),
+        'get_teams_for_season': [(str(player_id), int(season)) for player_id, season
+                                 in zip(rng.integers(5000, size=n_lookups), df_sample['season'])],
+        'check_player_exists': [str(player_id) for player_id in rng.integers(5000, size=n_lookups)],
+    }
+
+
+def run_lookups(conn, lookups):
+    cur = conn.cursor()
+    runners = {
+        'match_fixture_teams_by_name': lambda args: match_fixture_teams_by_name(cur, *args),
+        'fuzzy_match_team_names (date scan)': lambda match_date: cur.execute(
+            "SELECT fixture_id, home_team, away_team FROM Matches WHERE match_date = ?", (match_date,)).fetchall(),
+        'StartingXI by fixture_id': lambda fixture_id: cur.execute(
+            "SELECT * FROM StartingXI WHERE fixture_id=?", (fixture_id,)).fetchone(),
+        'get_teams_for_season': lambda args: cur.execute(TEAMS_FOR_SEASON_QUERY, (args[0], args[1], args[0], args[1])).fetchall(),
+        'check_player_exists': lambda player_id: check_player_exists(conn, player_id),
+    }
+
+    timings = {}
+    for name, arguments in lookups.items():
+        start = time.perf_counter()
+        for argument in arguments:
+            runners[name](argument)
+        timings[name] = (time.perf_counter() - start) / len(arguments)
+    return timings
+
+
+def run_benchmark(csv_path, n_lookups):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, 'benchmark.db')
+        df_matches = seed_database(database_path, csv_path)
+        lookups = get_lookups(df_matches, n_lookups)
+
+        conn = sqlite3.connect(database_path)
+        timings_before = run_lookups(conn, lookups)
+
+        configure_connection(conn)
+        apply_migrations(conn, SCHEMA_MIGRATIONS)
+        timings_after = run_lookups(conn, lookups)
+        conn.close()
+
+    name_width = max(len(name) for name in timings_before)
+    print(f"{'lookup':<{name_width}}  {'before':>12}  {'after':>12}  {'speedup':>8}")
+    for name in timings_before:
+        before, after = timings_before[name] * 1e6, timings_after[name] * 1e6
+        print(f"{name:<{name_width}}  {before:10.1f}us  {after:10.1f}us  {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the lookup queries before and after the index migration.")
+    parser.add_argument("--csv", default=TEST_CSV_PATH, help="CSV file with the matches to seed the database with")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    run_benchmark(args.csv, args.lookups)
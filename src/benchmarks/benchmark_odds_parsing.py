@@ -0,0 +1,170 @@
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+import pandas as pd
+from bs4 import BeautifulSoup
+from db.db_manager import create_matches_table, create_odds_table, match_fixture_teams_by_name, fuzzy_match_team_names, NAMECONVERSION_ODDSPORTAL_API
+from db.fixture_resolver import FixtureResolver
+from db.migrations import create_lookup_indexes
+from web_scraping.odds_page_parser import parse_odds_page
+
+TEST_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'test.csv')
+
+ODDS_INSERT_QUERY = "INSERT OR REPLACE INTO Odds (fixture_id, home_odds, draw_odds, away_odds) VALUES (?, ?, ?, ?)"
+
+# markup of a match row of an oddsportal results page, reduced to the elements the parser reads
+EVENT_ROW_TEMPLATE = """
+<div class="eventRow flex w-full flex-col text-xs">
+  {date_header}
+  <div class="border-black-borders flex w-full min-w-0 border-b border-l border-r">
+    <a class="next-m:flex-row flex w-full" href="/football/{href}/"><span class="hidden"></span></a>
+    <div class="participant-name"><a title="{home_team}" href="#"><p class="participant-name truncate">{home_team}</p></a></div>
+    <div class="participant-name"><a title="{away_team}" href="#"><p class="participant-name truncate">{away_team}</p></a></div>
+    <div class="flex-center"><p class="height-content">{home_odds}</p></div>
+    <div class="flex-center"><p class="height-content">{draw_odds}</p></div>
+    <div class="flex-center"><p class="height-content">{away_odds}</p></div>
+  </div>
+</div>
+"""
+DATE_HEADER_TEMPLATE = '<div class="text-black-main font-main w-full truncate text-xs font-normal leading-5">{date}</div>'
+
+
+def seed_database(database_path, csv_path):
+    """Creates a database with the matches of test.csv and returns them."""
+    conn = sqlite3.connect(database_path)
+    create_matches_table(conn)
+    create_odds_table(conn)
+    df_matches = pd.read_csv(csv_path, usecols=['fixture_id', 'competition_name', 'season', 'home_team', 'away_team', 'match_date',
+                                                'home_odds', 'draw_odds', 'away_odds'])
+    df_matches['fixture_id'] = df_matches['fixture_id'].astype(str)
+    df_matches['match_date'] = pd.to_datetime(df_matches['match_date'])
+    df_db = df_matches.drop(columns=['home_odds', 'draw_odds', 'away_odds'])
+    df_db['match_date'] = df_db['match_date'].dt.strftime('%d.%m.%Y')
+    df_db.to_sql('Matches', conn, if_exists='append', index=False)
+    create_lookup_indexes(conn)
+    conn.commit()
+    conn.close()
+    return df_matches
+
+
+def generate_pages(df_matches, matches_per_page=50):
+    """Renders the seeded matches as synthetic results pages of 50 matches each, newest first like on oddsportal."""
+    df_matches = df_matches.sort_values('match_date', ascending=False)
+    pages = []
+    for start in range(0, len(df_matches), matches_per_page):
+        rows, last_date = [], None
+        for match in df_matches.iloc[start:start + matches_per_page].itertuples():
+            date = match.match_date.strftime('%d %b %Y')
+            rows.append(EVENT_ROW_TEMPLATE.format(
+                date_header=DATE_HEADER_TEMPLATE.format(date=date) if date != last_date else '',
+                href=match.fixture_id, home_team=match.home_team, away_team=match.away_team,
+                home_odds=match.home_odds, draw_odds=match.draw_odds, away_odds=match.away_odds))
+            last_date = date
+        pages.append(f"<html><body><div class='results'>{''.join(rows)}</div></body></html>")
+    return pages
+
+
+def load_pages(pages_dir):
+    """Reads saved oddsportal pages (*.html) from a directory."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.html'))):
+        with open(path, encoding='utf-8') as file:
+            pages.append(file.read())
+    return pages
+
+
+def parse_date(raw_text_string):
+    try:
+        return datetime.strptime(raw_text_string, '%d %b %Y').strftime('%d.%m.%Y')
+    except ValueError:
+        return None
+
+
+def extract_odds_before(conn, page_source):
+    """The previous OddsScraper.get_match_odds: python callbacks per tag, a query and a commit per row."""
+    soup = BeautifulSoup(page_source, 'lxml')
+    cur = conn.cursor()
+    match_odds = []
+    match_date = None
+    for match in soup.find_all('div', {'class': 'eventRow flex w-full flex-col text-xs'}):
+        regex_match_href = re.compile(".*next-m:flex-row.*")
+        match_href = match.find(lambda tag: tag.name == 'a' and tag.get('href') and
+                                re.search(regex_match_href, " ".join(tag.get('class', []))))
+        if not match_href:
+            continue
+        playing_teams = match.find_all('a', {'title': True})
+        if len(playing_teams) < 2:
+            continue
+        home_team, away_team = playing_teams[0].get('title'), playing_teams[1].get('title')
+        div_date = match.find(lambda tag: tag.name == 'div' and
+                              re.search(r"\btext-black-main\b.*\bfont-main\b.*\bw-full\b.*\btext-xs\b.*\bfont-normal\b.*\bleading-5\b",
+                                        " ".join(tag.get('class', []))))
+        if div_date:
+            match_date = parse_date(div_date.text.strip())
+
+        fixture_id = match_fixture_teams_by_name(cur, match_date, home_team, away_team) or \
+            fuzzy_match_team_names(cur, match_date, home_team, away_team)
+        if fixture_id:
+            odds = match.find_all(lambda tag: tag.name == 'p' and re.search(r"\bheight-content\b", " ".join(tag.get('class', []))))
+            if len(odds) >= 3:
+                match_odds.append((fixture_id, float(odds[0].text), float(odds[1].text), float(odds[2].text)))
+                cur.execute(ODDS_INSERT_QUERY, match_odds[-1])
+                conn.commit()
+    return match_odds
+
+
+def extract_odds_after(conn, page_source, resolver):
+    """The current OddsScraper.get_match_odds: one lxml pass, in-memory fixture resolution and one executemany per page."""
+    matches = parse_odds_page(page_source)
+    fixture_ids = resolver.resolve_many([(match['match_date'], match['home_team'], match['away_team']) for match in matches])
+    match_odds = [(fixture_id, match['home_odds'], match['draw_odds'], match['away_odds'])
+                  for match, fixture_id in zip(matches, fixture_ids) if fixture_id]
+    conn.executemany(ODDS_INSERT_QUERY, match_odds)
+    conn.commit()
+    return match_odds
+
+
+def time_extraction(database_path, pages, extract_odds):
+    conn = sqlite3.connect(database_path)
+    conn.execute("DELETE FROM Odds")
+    conn.commit()
+    start = time.perf_counter()
+    if extract_odds is extract_odds_after:
+        # the scraper loads the matches once and resolves all pages against the index
+        resolver = FixtureResolver.from_db(conn, NAMECONVERSION_ODDSPORTAL_API)
+        n_odds = sum(len(extract_odds(conn, page_source, resolver)) for page_source in pages)
+    else:
+        n_odds = sum(len(extract_odds(conn, page_source)) for page_source in pages)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed, n_odds
+
+
+def run_benchmark(csv_path, pages_dir=None, max_pages=None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        database_path = os.path.join(tmp_dir, 'benchmark.db')
+        df_matches = seed_database(database_path, csv_path)
+        pages = load_pages(pages_dir) if pages_dir else generate_pages(df_matches)
+        pages = pages[:max_pages] if max_pages else pages
+
+        time_before, n_odds_before = time_extraction(database_path, pages, extract_odds_before)
+        time_after, n_odds_after = time_extraction(database_path, pages, extract_odds_after)
+
+    print(f"{len(pages)} pages")
+    print(f"before: {time_before:8.2f}s  {n_odds_before} odds  {time_before / len(pages) * 1000:8.1f}ms per page")
+    print(f"after:  {time_after:8.2f}s  {n_odds_after} odds  {time_after / len(pages) * 1000:8.1f}ms per page")
+    print(f"speedup: {time_before / time_after:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the extraction of odds from oddsportal results pages.")
+    parser.add_argument("--csv", default=TEST_CSV_PATH, help="CSV file with the matches to seed the database with")
+    parser.add_argument("--pages", default=None, help="directory with saved oddsportal pages (*.html), by default synthetic pages are rendered from the CSV")
+    parser.add_argument("--max-pages", type=int, default=None)
+    args = parser.parse_args()
+    run_benchmark(args.csv, args.pages, args.max_pages)
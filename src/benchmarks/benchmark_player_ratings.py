@@ -0,0 +1,101 @@
+import argparse
+import bisect
+import time
+import numpy as np
+import pandas as pd
+from preprocessing.player_ratings import get_player_card_ratings, attach_player_ratings_as_of
+
+
+def generate_player_data(n_players, n_fixtures, cards_per_player=9, seed=42):
+    """
+    Generates synthetic FIFA cards, starting XIs and fixture dates.
+
+    Parameters
+    ----------
+    n_players : int
+        Number of players, every player gets `cards_per_player` cards.
+    n_fixtures : int
+        Number of fixtures, every fixture gets 22 starting players.
+    cards_per_player : int, optional
+        Number of FIFA cards per player, by default 9.
+    seed : int, optional
+        Seed of the random number generator, by default 42.
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]
+        The FIFA_Player_Statistics, StartingXI and fixture date DataFrames.
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2014-09-01')
+
+    card_offsets = np.sort(rng.integers(0, 9 * 365, (n_players, cards_per_player)), axis=1).ravel()
+    df_fifa_stats = pd.DataFrame({
+        'player_id': np.repeat(np.arange(n_players), cards_per_player).astype(str),
+        'overall_rating': rng.integers(50, 95, n_players * cards_per_player),
+        'date_fifa_card': pd.to_datetime(start + card_offsets.astype('timedelta64[D]')).strftime('%d.%m.%Y'),
+    })
+
+    df_fixture_dates = pd.DataFrame({
+        'fixture_id': np.arange(n_fixtures),
+        'match_date': pd.to_datetime(start + rng.integers(0, 9 * 365, n_fixtures).astype('timedelta64[D]')),
+    })
+    df_starting_xi = pd.DataFrame({
+        'fixture_id': np.repeat(np.arange(n_fixtures), 22),
+        'team': np.tile(np.repeat(['home', 'away'], 11), n_fixtures),
+        'player_id': rng.integers(0, n_players, n_fixtures * 22).astype(str),
+        'position': np.tile(list('GDDDDMMMMFF') * 2, n_fixtures),
+    })
+    return df_fifa_stats, df_starting_xi, df_fixture_dates
+
+
+def ratings_per_row_lookup(df_fifa_stats, df_starting_xi, df_fixture_dates):
+    """Reference implementation with one binary search per lineup row in Python."""
+    df_cards = get_player_card_ratings(df_fifa_stats)
+    card_index = {}
+    for player_id, card_date, rating in zip(df_cards['player_id'], df_cards['card_date'], df_cards['overall_rating']):
+        dates, ratings = card_index.setdefault(player_id, ([], []))
+        dates.append(card_date)
+        ratings.append(rating)
+
+    match_dates = df_fixture_dates.set_index('fixture_id')['match_date'].to_dict()
+    overall_ratings = []
+    for fixture_id, player_id in zip(df_starting_xi['fixture_id'], df_starting_xi['player_id']):
+        dates, ratings = card_index.get(player_id, ([], []))
+        position = bisect.bisect_right(dates, match_dates[fixture_id])
+        overall_ratings.append(ratings[position - 1] if position > 0 else np.nan)
+    return df_starting_xi.assign(overall_rating=overall_ratings)
+
+
+def ratings_as_of_join(df_fifa_stats, df_starting_xi, df_fixture_dates):
+    df_cards = get_player_card_ratings(df_fifa_stats)
+    return attach_player_ratings_as_of(df_starting_xi, df_cards, df_fixture_dates)
+
+
+def run_benchmark(player_counts, n_fixtures):
+    for n_players in player_counts:
+        df_fifa_stats, df_starting_xi, df_fixture_dates = generate_player_data(n_players, n_fixtures)
+
+        start = time.perf_counter()
+        df_lookup = ratings_per_row_lookup(df_fifa_stats, df_starting_xi, df_fixture_dates)
+        time_lookup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_as_of = ratings_as_of_join(df_fifa_stats, df_starting_xi, df_fixture_dates)
+        time_as_of = time.perf_counter() - start
+
+        key = ['fixture_id', 'team', 'player_id', 'overall_rating']
+        expected = df_lookup.astype({'overall_rating': float}).sort_values(key)[key].to_numpy()
+        actual = df_as_of.astype({'overall_rating': float}).sort_values(key)[key].to_numpy()
+        assert pd.DataFrame(expected).equals(pd.DataFrame(actual)), "as-of join differs from per-row lookup"
+
+        print(f"{n_players:>8} players, {len(df_fifa_stats):>8} cards, {len(df_starting_xi):>8} lineup rows: "
+              f"per-row lookup {time_lookup:8.3f}s | as-of join {time_as_of:8.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the as-of FIFA rating join.")
+    parser.add_argument("--players", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--fixtures", type=int, default=20_000)
+    args = parser.parse_args()
+    run_benchmark(args.players, args.fixtures)
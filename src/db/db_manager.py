@@ -1,6 +1,9 @@
 import sqlite3
+from functools import lru_cache
 import pandas as pd
 from fuzzywuzzy import fuzz
+from db.migrations import configure_connection, apply_migrations, create_lookup_indexes
+from db.fixture_resolver import FixtureResolver
 
 DATABASE_PATH = 'Data/football_database.db'
 
@@ -19,7 +22,11 @@ NAMECONVERSION_ODDSPORTAL_API = {
 
 def connect_db():
     """
-    Connect to the SQLite database and create the necessary tables if they do not exist.
+    Connect to the SQLite database and bring its schema up to date.
+    
+    The connection is configured with the tuned pragmas (WAL journal mode etc.). The tables and
+    indexes are created by the versioned migrations of SCHEMA_MIGRATIONS, so on an up-to-date
+    database the startup is a single check of the schema version.
     
     Returns
     -------
@@ -28,36 +35,221 @@ def connect_db():
     """
     try:
         conn = sqlite3.connect(DATABASE_PATH)
-
-        create_matches_table(conn)
-        create_substitute_table(conn)
-        create_startingXI_table(conn)
-        create_players_table(conn)
-        create_fifa_players_table(conn)
-        create_statistics_player_table(conn)
+        configure_connection(conn)
+        apply_migrations(conn, SCHEMA_MIGRATIONS)
 
         return conn
     except sqlite3.Error as e:
         print(f"An error occurred while connecting to the database: {e}")
 
-def fetch_data_from_db(table_name):
+def build_select_query(table_name, columns=None, where=None):
+    """
+    Build a SELECT query for a table with an optional column projection and WHERE clause.
+    
+    Parameters
+    ----------
+    table_name : str
+        The name of the table from which to fetch the data.
+    columns : list of str, optional
+        The columns to select, all columns if None.
+    where : str, optional
+        A SQL predicate with ? placeholders, e.g. "season = ?".
+    
+    Returns
+    -------
+    str
+        The SELECT query.
+    """
+    selected_columns = ', '.join(columns) if columns else '*'
+    query = f"SELECT {selected_columns} FROM {table_name}"
+    if where:
+        query += f" WHERE {where}"
+    return query
+
+
+def build_match_filter(seasons=None, competitions=None, date_from=None, date_to=None, fixture_column=None, table_alias=None):
+    """
+    Build a WHERE clause that restricts the rows to matches of certain seasons, competitions and dates.
+    
+    Parameters
+    ----------
+    seasons : list of int, optional
+        Seasons to keep.
+    competitions : list of str, optional
+        Competition names to keep.
+    date_from : str, optional
+        First match date to keep in the format %d.%m.%Y.
+    date_to : str, optional
+        Last match date to keep in the format %d.%m.%Y.
+    fixture_column : str, optional
+        If given, the clause is applied to a table without match columns (e.g. Odds) by restricting
+        this fixture column to the fixtures of the matching rows in the 'Matches' table.
+    table_alias : str, optional
+        Alias of the 'Matches' table in a query joining several tables, e.g. 'M'.
+    
+    Returns
+    -------
+    Tuple[str, list] or Tuple[None, list]
+        The WHERE clause with ? placeholders (None if no filter is set) and its parameters.
+    """
+    # match dates are stored as %d.%m.%Y and have to be rearranged to %Y%m%d to be compared
+    prefix = f"{table_alias}." if table_alias else ""
+    sortable_date = f"substr({prefix}match_date, 7, 4) || substr({prefix}match_date, 4, 2) || substr({prefix}match_date, 1, 2)"
+
+    predicates = []
+    params = []
+    if seasons:
+        predicates.append(f"{prefix}season IN ({', '.join('?' * len(seasons))})")
+        params += list(seasons)
+    if competitions:
+        predicates.append(f"{prefix}competition_name IN ({', '.join('?' * len(competitions))})")
+        params += list(competitions)
+    if date_from:
+        predicates.append(f"{sortable_date} >= ?")
+        params.append(date_from[6:10] + date_from[3:5] + date_from[0:2])
+    if date_to:
+        predicates.append(f"{sortable_date} <= ?")
+        params.append(date_to[6:10] + date_to[3:5] + date_to[0:2])
+
+    if not predicates:
+        return None, []
+
+    where = ' AND '.join(predicates)
+    if fixture_column:
+        where = f"{fixture_column} IN (SELECT fixture_id FROM Matches WHERE {where})"
+    return where, params
+
+
+def _read_chunks(query, params, dtypes, chunksize):
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        yield from pd.read_sql_query(query, conn, params=params, dtype=dtypes, chunksize=chunksize)
+
+
+def fetch_data_from_db(table_name, columns=None, where=None, params=None, dtypes=None, chunksize=None, conn=None):
     """
-    Fetch all rows from a specified table in the SQLite database and return them in a DataFrame.
+    Fetch rows from a specified table in the SQLite database and return them in a DataFrame.
     
     Parameters
     ----------
     table_name : str
         The name of the table from which to fetch the data.
+    columns : list of str, optional
+        The columns to fetch, by default all columns.
+    where : str, optional
+        A SQL predicate with ? placeholders restricting the rows, see `build_match_filter`.
+    params : list, optional
+        The parameters of the placeholders in `where`.
+    dtypes : dict, optional
+        Explicit dtypes of the fetched columns.
+    chunksize : int, optional
+        If given, an iterator over DataFrames of at most this many rows is returned instead of a single DataFrame.
+    conn : Connection, optional
+        An open SQLite connection to reuse, by default a new connection to the database is opened.
+    
+    Returns
+    -------
+    DataFrame or Iterator[DataFrame]
+        a DataFrame containing the requested rows from the specified table, or an iterator over chunks of it.
+    """
+    query = build_select_query(table_name, columns, where)
+    params = params or []
+
+    if conn is not None:
+        return pd.read_sql_query(query, conn, params=params, dtype=dtypes, chunksize=chunksize)
+    if chunksize:
+        return _read_chunks(query, params, dtypes, chunksize)
+
+    with sqlite3.connect(DATABASE_PATH) as conn:
+        df = pd.read_sql_query(query, conn, params=params, dtype=dtypes)
+    return df
+
+
+def build_match_data_query(statistics_columns, where=None):
+    """
+    Build a query that joins the 'Matches', 'Odds' and 'Match_Statistics' tables in SQLite.
+    
+    Matches without odds are dropped. Match statistics are LEFT JOINed, the returned column
+    'statistics_fixture_id' is NULL for matches without statistics. All fixture ids are returned as INTEGER.
+    
+    Parameters
+    ----------
+    statistics_columns : list of str
+        The columns of the 'Match_Statistics' table to select, without 'fixture_id'.
+    where : str, optional
+        A SQL predicate on the 'Matches' table (alias M) with ? placeholders, see `build_match_filter`.
+    
+    Returns
+    -------
+    str
+        The SELECT query.
+    """
+    match_columns = [column for column in get_table_columns('Matches') if column != 'fixture_id']
+    selected_columns = ['CAST(M.fixture_id AS INTEGER) AS fixture_id']
+    selected_columns += [f'M.{column}' for column in match_columns]
+    selected_columns += ['O.home_odds', 'O.draw_odds', 'O.away_odds']
+    selected_columns += ['S.fixture_id AS statistics_fixture_id']
+    selected_columns += [f'S.{column}' for column in statistics_columns]
+
+    # Match_Statistics stores the fixture id with numeric affinity, Matches and Odds as TEXT
+    query = f"""
+    SELECT {', '.join(selected_columns)}
+    FROM Matches M
+    INNER JOIN Odds O ON O.fixture_id = M.fixture_id
+    LEFT JOIN Match_Statistics S ON S.fixture_id = CAST(M.fixture_id AS INTEGER)
+    """
+    if where:
+        query += f"WHERE {where}"
+    return query
+
+
+def fetch_match_data(statistics_columns, where=None, params=None):
+    """
+    Fetch matches joined with their odds and statistics with a single query.
+    
+    Parameters
+    ----------
+    statistics_columns : list of str
+        The columns of the 'Match_Statistics' table to select, without 'fixture_id'.
+    where : str, optional
+        A SQL predicate on the 'Matches' table (alias M) with ? placeholders, see `build_match_filter`.
+    params : list, optional
+        The parameters of the placeholders in `where`.
     
     Returns
     -------
     DataFrame
-        a DataFrame containing all rows from the specified table.
+        a DataFrame with one row per match with odds, see `build_match_data_query`.
     """
+    query = build_match_data_query(statistics_columns, where)
     with sqlite3.connect(DATABASE_PATH) as conn:
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+        df = pd.read_sql_query(query, conn, params=params or [], dtype={'fixture_id': 'int64'})
     return df
 
+
+def get_table_columns(table_name, conn=None):
+    """
+    Get the column names of a table in the order they are defined in the database.
+    
+    Parameters
+    ----------
+    table_name : str
+        The name of the table.
+    conn : Connection, optional
+        An open SQLite connection to reuse, by default a new connection to the database is opened.
+    
+    Returns
+    -------
+    list of str
+        The column names of the table.
+    """
+    if conn is None:
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            return get_table_columns(table_name, conn)
+
+    db_cursor = conn.cursor()
+    db_cursor.execute(f"PRAGMA table_info({table_name})")
+    return [column[1] for column in db_cursor.fetchall()]
+
 def close_db(conn):
     """
     Close the connection to the SQLite database.
@@ -100,31 +292,119 @@ def create_matches_table(conn):
                 away_team_formation TEXT
                 )
             ''')
-    conn.commit()
     
 
-def create_match_statistics_table(conn, names_stats):
+def create_match_statistics_table(conn):
     """
     Create the 'Match_Statistics' table in the SQLite database if it does not exist.
     
+    The table is created with the fixture_id only, the stat columns are added by the
+    MatchStatisticsRegistry as the API delivers them.
+    
     Parameters
     ----------
     conn : Connection
         The SQLite connection object.
-    names_stats : str
-        A string representing the names of the columns in the 'Match_Statistics' table.
     """
     db_cursor = conn.cursor()
-    query_create_table = f'''
+    query_create_table = '''
                     CREATE TABLE IF NOT EXISTS Match_Statistics (
                     fixture_id STRING PRIMARY KEY,
-                    {names_stats},
                     FOREIGN KEY (fixture_id) REFERENCES Matches(fixture_id)
                     )
                     '''
 
     db_cursor.execute(query_create_table)
-    conn.commit()
+
+
+class MatchStatisticsRegistry:
+    """
+    Registry of the stat columns of the 'Match_Statistics' table.
+
+    The columns are read from the database once and cached in memory, so inserting the statistics of
+    a fixture is a single prepared INSERT. Only stat types the API has introduced since (e.g. for a
+    new season) cause an ALTER TABLE.
+    """
+
+    def __init__(self):
+        self.columns = None
+
+    def load_columns(self, conn):
+        """Reads the columns of the 'Match_Statistics' table if they are not cached yet."""
+        if self.columns is None:
+            self.columns = set(get_table_columns('Match_Statistics', conn))
+        return self.columns
+
+    def register_columns(self, conn, stat_types):
+        """
+        Adds the stat types that are not a column of the 'Match_Statistics' table yet.
+
+        Parameters
+        ----------
+        conn : Connection
+            The SQLite connection object.
+        stat_types : List[str]
+            Names of the stat columns, e.g. 'home_total_shots'.
+        """
+        columns = self.load_columns(conn)
+        new_columns = [stat for stat in stat_types if stat not in columns]
+        if not new_columns:
+            return
+
+        db_cursor = conn.cursor()
+        for column in new_columns:
+            try:
+                db_cursor.execute(f"ALTER TABLE Match_Statistics ADD COLUMN {column} REAL")
+            except sqlite3.OperationalError as e:
+                print(e)
+            columns.add(column)
+
+    def has_columns(self, conn, stat_types):
+        """Returns whether all stat types are columns of the 'Match_Statistics' table."""
+        columns = self.load_columns(conn)
+        return all(stat in columns for stat in stat_types)
+
+    def insert(self, conn, fixture_id, stat_types, stat_values):
+        """
+        Inserts the statistics of a fixture into the 'Match_Statistics' table.
+
+        The statement is not committed, such that the caller controls the transaction.
+
+        Parameters
+        ----------
+        conn : Connection
+            The SQLite connection object.
+        fixture_id : str
+            The fixture_id of the match.
+        stat_types : List[str]
+            Names of the stat columns.
+        stat_values : List[float]
+            Values of the stats in the order of stat_types.
+        """
+        self.register_columns(conn, stat_types)
+        conn.execute(get_match_statistics_insert_query(tuple(stat_types)), [str(fixture_id)] + list(stat_values))
+
+
+@lru_cache(maxsize=None)
+def get_match_statistics_insert_query(stat_types):
+    """
+    Returns the INSERT statement for the statistics of a fixture.
+
+    The API delivers the same stat types for nearly all fixtures, so the same SQL string is reused
+    and sqlite3 takes the prepared statement from its statement cache.
+
+    Parameters
+    ----------
+    stat_types : Tuple[str]
+        Names of the stat columns.
+
+    Returns
+    -------
+    str
+        The INSERT statement with one placeholder for the fixture_id and one per stat.
+    """
+    placeholders = ', '.join('?' * len(stat_types))
+    return f"INSERT OR IGNORE INTO Match_Statistics(fixture_id, {', '.join(stat_types)}) VALUES (?, {placeholders})"
 
 
 def create_substitute_table(conn):
@@ -149,7 +429,6 @@ def create_substitute_table(conn):
                         '''
     db_cursor = conn.cursor()
     db_cursor.execute(query_create_table_subs)
-    conn.commit()
 
 
 def create_startingXI_table(conn):
@@ -314,10 +593,161 @@ def create_statistics_player_table(conn):
     db_cursor.execute(query_create_statistics_players)
 
 
+def create_sync_checkpoints_table(conn):
+    """
+    Create the 'Sync_Checkpoints' table in the SQLite database if it does not exist.
+    
+    It records the completed API requests of the season sync, such that an interrupted backfill
+    resumes where it stopped and requests without data are not repeated.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Sync_Checkpoints (
+                target TEXT,
+                key TEXT,
+                season INTEGER,
+                completed_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY(target, season, key)
+                )
+            ''')
+
+
+def create_odds_table(conn):
+    """
+    Create the 'Odds' table in the SQLite database if it does not exist.
+    
+    The table holds the 1X2 closing odds scraped from oddsportal, one row per fixture.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Odds (
+                fixture_id TEXT PRIMARY KEY,
+                home_odds REAL,
+                draw_odds REAL,
+                away_odds REAL
+                )
+            ''')
+
+
+def create_sofifa_crawl_tables(conn):
+    """
+    Create the tables holding the state of the sofifa player crawl if they do not exist.
+    
+    'Sofifa_Searches' holds the result of every executed search, such that identical searches of
+    different players are executed once. 'Sofifa_Crawl_Players' holds the players to crawl with their
+    status and the position of their last queued search, an interrupted crawl resumes by skipping
+    the searches stored in 'Sofifa_Searches'.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Sofifa_Searches (
+                search_key TEXT PRIMARY KEY,
+                player_url TEXT,
+                searched_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Sofifa_Crawl_Players (
+                player_id TEXT PRIMARY KEY,
+                first_name TEXT,
+                last_name TEXT,
+                stage INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'pending',
+                player_url TEXT
+                )
+            ''')
+
+
+def create_sofifa_fallback_searches_table(conn):
+    """
+    Create the 'Sofifa_Fallback_Searches' table in the SQLite database if it does not exist.
+    
+    The table caches the results of the web searches for players the sofifa search could not find,
+    one row per distinct query.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS Sofifa_Fallback_Searches (
+                query TEXT PRIMARY KEY,
+                player_url TEXT,
+                searched_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+
+def create_tables(conn):
+    """
+    Create all tables of the database that do not exist yet.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    create_matches_table(conn)
+    create_match_statistics_table(conn)
+    create_substitute_table(conn)
+    create_startingXI_table(conn)
+    create_players_table(conn)
+    create_fifa_players_table(conn)
+    create_statistics_player_table(conn)
+
+
+def create_tables_with_lookup_indexes(conn):
+    """
+    Create all tables of the database that do not exist yet and their lookup indexes.
+    
+    On a new database migration 1 finds no tables to index, so the indexes are created here
+    together with the tables.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    create_tables(conn)
+    create_lookup_indexes(conn)
+
+
+# Versioned migrations of the database as (version, description, function), applied by connect_db.
+# Every migration runs exactly once per database. Applied migrations must never be renumbered,
+# new migrations have to be appended with a higher version.
+SCHEMA_MIGRATIONS = [
+    (1, "add lookup indexes", create_lookup_indexes),
+    (2, "create tables", create_tables_with_lookup_indexes),
+    (3, "add sync checkpoints", create_sync_checkpoints_table),
+    (4, "add odds table", create_odds_table),
+    (5, "add sofifa crawl tables", create_sofifa_crawl_tables),
+    (6, "add sofifa fallback searches", create_sofifa_fallback_searches_table),
+]
+
+
 def get_fixture_id(conn, match_date, home_team, away_team):
     """
     Retrieve the fixture_id for a match using match_date and team names.
     
+    To resolve many matches, e.g. a scraped season, use a FixtureResolver that loads the matches once.
+    
     Parameters
     ----------
     conn : Connection
@@ -334,16 +764,30 @@ def get_fixture_id(conn, match_date, home_team, away_team):
     str or None
         The fixture_id if found, None otherwise.
     """
-    conn = sqlite3.connect('Data/football_database.db')
-    cur = conn.cursor()
+    return get_fixture_ids(conn, [(match_date, home_team, away_team)])[0]
 
-    fixture_id = match_fixture_teams_by_name(cur, match_date, home_team, away_team)
 
-    if fixture_id:
-        return fixture_id
-    else:
-        fixture_id = fuzzy_match_team_names(cur, match_date, home_team, away_team)
-        return fixture_id
+def get_fixture_ids(conn, matches):
+    """
+    Retrieve the fixture_ids of several matches, e.g. all matches of a scraped page, with a single query.
+    
+    The matches played on the dates of the given matches are loaded into a FixtureResolver, which
+    resolves every match in memory, first by exact or converted team names and then by fuzzy matching.
+    
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    matches : list of tuple
+        The matches as (match_date, home_team, away_team).
+    
+    Returns
+    -------
+    list
+        The fixture_id of every match, None for matches that could not be resolved.
+    """
+    resolver = FixtureResolver.from_db(conn, NAMECONVERSION_ODDSPORTAL_API, match_dates=[match_date for match_date, _, _ in matches])
+    return resolver.resolve_many(matches)
 
 
 def update_team_name(conn, old_team_name, new_team_name):  
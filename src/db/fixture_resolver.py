@@ -0,0 +1,126 @@
+import json
+import unicodedata
+from fuzzywuzzy import fuzz
+
+# a similarity ratio above the threshold for the home or the away team is considered as a match
+DEFAULT_FUZZY_THRESHOLD = 65
+
+
+def normalize_team_name(team_name):
+    """
+    Normalizes a team name for comparisons between data sources.
+
+    Accents are removed and the name is lowercased with single spaces, e.g. 'FC Bayern  München'
+    becomes 'fc bayern munchen'.
+    """
+    team_name = unicodedata.normalize('NFKD', team_name)
+    team_name = ''.join(char for char in team_name if not unicodedata.combining(char))
+    return ' '.join(team_name.lower().split())
+
+
+class FixtureResolver:
+    """
+    Resolves matches of an external source, e.g. scraped odds, to the fixture ids of the Matches table in memory.
+
+    The matches are indexed by date once, such that resolving a match only compares it with the
+    few matches played on the same date. Team names are compared after normalization and after
+    applying the aliases of the source (e.g. NAMECONVERSION_ODDSPORTAL_API), which are normalized
+    once as well. If no team name matches, the names are compared by their fuzzy similarity ratio,
+    which is memoized per pair of source and canonical name since the same teams recur every match day.
+
+    Parameters
+    ----------
+    matches : Iterable[tuple]
+        The matches as (fixture_id, match_date, home_team, away_team).
+    aliases : dict, optional
+        Mapping from team names of the source to the names in the Matches table.
+    fuzzy_threshold : int, optional
+        Minimum similarity ratio (exclusive) of a fuzzy match.
+    """
+
+    def __init__(self, matches, aliases=None, fuzzy_threshold=DEFAULT_FUZZY_THRESHOLD):
+        self.aliases = {normalize_team_name(source_name): normalize_team_name(name) for source_name, name in (aliases or {}).items()}
+        self.fuzzy_threshold = fuzzy_threshold
+        self.fuzzy_scores = {}
+        self.candidates_by_date = {}
+        for fixture_id, match_date, home_team, away_team in matches:
+            self.candidates_by_date.setdefault(match_date, []).append(
+                (fixture_id, normalize_team_name(home_team), normalize_team_name(away_team)))
+
+    @classmethod
+    def from_db(cls, conn, aliases=None, match_dates=None, fuzzy_threshold=DEFAULT_FUZZY_THRESHOLD):
+        """
+        Loads the matches of the Matches table with a single query.
+
+        Parameters
+        ----------
+        conn : Connection
+            The SQLite connection object.
+        aliases : dict, optional
+            Mapping from team names of the source to the names in the Matches table.
+        match_dates : Iterable[str], optional
+            If given, only the matches of these dates are loaded.
+        fuzzy_threshold : int, optional
+            Minimum similarity ratio (exclusive) of a fuzzy match.
+
+        Returns
+        -------
+        FixtureResolver
+            The resolver.
+        """
+        query = "SELECT fixture_id, match_date, home_team, away_team FROM Matches"
+        params = ()
+        if match_dates is not None:
+            query += " WHERE match_date IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(sorted(set(match_dates))),)
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params)
+        return cls(db_cursor.fetchall(), aliases, fuzzy_threshold)
+
+    def resolve(self, match_date, home_team, away_team):
+        """
+        Returns the fixture id of a match, first by (aliased) team names and then by fuzzy matching.
+
+        Parameters
+        ----------
+        match_date : str
+            The date of the match in the format of the Matches table.
+        home_team : str
+            The name of the home team in the source.
+        away_team : str
+            The name of the away team in the source.
+
+        Returns
+        -------
+        str or None
+            The fixture_id if found, None otherwise.
+        """
+        candidates = self.candidates_by_date.get(match_date, [])
+        home_name, away_name = normalize_team_name(home_team), normalize_team_name(away_team)
+        home_alias, away_alias = self.aliases.get(home_name, home_name), self.aliases.get(away_name, away_name)
+
+        for fixture_id, candidate_home_team, candidate_away_team in candidates:
+            if candidate_home_team == home_alias or candidate_away_team == away_alias:
+                return fixture_id
+
+        for fixture_id, candidate_home_team, candidate_away_team in candidates:
+            if self.get_fuzzy_score(home_name, candidate_home_team) > self.fuzzy_threshold or \
+                    self.get_fuzzy_score(away_name, candidate_away_team) > self.fuzzy_threshold:
+                return fixture_id
+
+        print(f"No match found with provided date {match_date} and team names {home_team} and {away_team}.")
+        return None
+
+    def resolve_many(self, matches):
+        """
+        Returns the fixture ids of several matches given as (match_date, home_team, away_team), None for unresolved matches.
+        """
+        return [self.resolve(match_date, home_team, away_team) for match_date, home_team, away_team in matches]
+
+    def get_fuzzy_score(self, source_name, canonical_name):
+        """Returns the memoized similarity ratio of two normalized team names."""
+        key = (source_name, canonical_name)
+        score = self.fuzzy_scores.get(key)
+        if score is None:
+            score = self.fuzzy_scores[key] = fuzz.ratio(source_name, canonical_name)
+        return score
@@ -0,0 +1,159 @@
+import sqlite3
+
+# Pragmas applied to every connection. WAL lets readers run while the ingestion writes and
+# synchronous=NORMAL only syncs at checkpoints, which is safe in WAL mode.
+CONNECTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -64000,        # 64 MB page cache
+    "mmap_size": 268435456,      # 256 MB memory-mapped I/O
+}
+
+# Secondary indexes for the hot lookups, as (index name, table, columns)
+LOOKUP_INDEXES = [
+    # match_fixture_teams_by_name and fuzzy_match_team_names look up matches by date (and team)
+    ("idx_matches_date_home_team", "Matches", "match_date, home_team"),
+    ("idx_matches_date_away_team", "Matches", "match_date, away_team"),
+    # season and competition filters of the preprocessing
+    ("idx_matches_season_competition", "Matches", "season, competition_name"),
+    # existence checks by fixture in save_startingXI_to_db and save_substitutes_to_db
+    ("idx_startingxi_fixture", "StartingXI", "fixture_id"),
+    ("idx_substitutes_fixture", "Substitutes", "fixture_id"),
+    # FIFAPlayerScraper.get_teams_for_season joins the appearances of a player with Matches
+    ("idx_startingxi_player_team_fixture", "StartingXI", "player_id, team, fixture_id"),
+]
+
+
+def configure_connection(conn, pragmas=CONNECTION_PRAGMAS):
+    """
+    Apply the tuned pragmas to a SQLite connection.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    pragmas : dict, optional
+        A mapping from pragma name to value.
+    """
+    db_cursor = conn.cursor()
+    for pragma, value in pragmas.items():
+        db_cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+def table_exists(conn, table_name):
+    """
+    Check if a table exists in the SQLite database.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    table_name : str
+        The name of the table.
+
+    Returns
+    -------
+    bool
+        True if the table exists, False otherwise.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    return db_cursor.fetchone() is not None
+
+
+def create_lookup_indexes(conn):
+    """
+    Create the secondary indexes of LOOKUP_INDEXES for all tables that exist.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    for index_name, table_name, columns in LOOKUP_INDEXES:
+        if table_exists(conn, table_name):
+            db_cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table_name} ({columns})")
+    db_cursor.execute("ANALYZE")
+
+
+def create_schema_version_table(conn):
+    """
+    Create the 'schema_version' table in the SQLite database if it does not exist.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+
+def get_schema_version(conn):
+    """
+    Get the version of the last migration applied to the database.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+
+    Returns
+    -------
+    int
+        The schema version, 0 if no migration has been applied yet.
+    """
+    # a single query on an up-to-date database, a missing table means a new database
+    try:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+def apply_migrations(conn, migrations):
+    """
+    Apply all migrations with a version higher than the current schema version.
+
+    Every migration runs in its own transaction together with the update of the schema version,
+    so an interrupted migration is rolled back and retried on the next connection.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    migrations : list
+        The migrations as (version, description, function) tuples, every migration runs exactly
+        once per database in the order of its version.
+
+    Returns
+    -------
+    int
+        The schema version after applying the migrations.
+    """
+    current_version = get_schema_version(conn)
+    pending = [migration for migration in migrations if migration[0] > current_version]
+    if not pending:
+        return current_version
+
+    create_schema_version_table(conn)
+    for version, description, migrate in sorted(pending, key=lambda migration: migration[0]):
+        try:
+            # DDL does not open a transaction implicitly, so the transaction is started explicitly
+            conn.execute("BEGIN")
+            migrate(conn)
+            conn.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"An error occurred while applying migration {version} ({description}): {e}")
+            raise
+        current_version = version
+    return current_version
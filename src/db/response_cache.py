@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from db.migrations import configure_connection
+
+RESPONSE_CACHE_PATH = 'Data/response_cache.db'
+DEFAULT_MAX_SIZE = 2 * 2**30   # 2 GiB of compressed responses
+
+# ttl of responses that never change, e.g. the statistics of a finished fixture
+IMMUTABLE = float('inf')
+
+
+class CacheMissError(Exception):
+    """Raised in offline mode for a request that is not in the cache."""
+
+
+def get_cache_key(url, params=None):
+    """
+    Returns the key of a request: a hash of the URL and the sorted query parameters.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the request.
+    params : dict, optional
+        The query parameters.
+
+    Returns
+    -------
+    str
+        Hex digest identifying the request.
+    """
+    sorted_params = sorted((str(key), str(value)) for key, value in (params or {}).items())
+    return hashlib.sha256(json.dumps([url, sorted_params]).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of HTTP response bodies in a separate SQLite database.
+
+    Bodies are stored zlib-compressed and keyed by URL and query parameters. Every entry has its own
+    expiry time, entries stored with the ttl IMMUTABLE never expire. If the compressed bodies exceed
+    `max_size` bytes, the least recently used entries are evicted.
+
+    In offline mode no request may reach the network: expired entries are still served and a
+    missing entry raises a CacheMissError, such that re-ingestion and tests can replay stored
+    responses.
+
+    The cache can be shared by several threads.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the SQLite database of the cache.
+    max_size : int, optional
+        Maximum total size of the compressed bodies in bytes.
+    offline : bool, optional
+        Whether to run in offline replay mode.
+    """
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, max_size=DEFAULT_MAX_SIZE, offline=False):
+        self.path = path
+        self.max_size = max_size
+        self.offline = offline
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        configure_connection(self.conn)
+        self.conn.execute('''
+                    CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    body BLOB,
+                    size INTEGER,
+                    stored_at REAL,
+                    expires_at REAL,
+                    last_access REAL
+                    )
+                ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self.conn.commit()
+        self.total_size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url, params=None):
+        """
+        Returns the cached body of a request.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the request.
+        params : dict, optional
+            The query parameters.
+
+        Returns
+        -------
+        bytes or None
+            The body, or None if the request is not cached or the entry has expired.
+
+        Raises
+        ------
+        CacheMissError
+            In offline mode, if the request is not cached.
+        """
+        key = get_cache_key(url, params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT body, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (not self.offline and row[1] is not None and row[1] < now):
+                if self.offline:
+                    raise CacheMissError(f"{url} {params or ''} is not in the response cache")
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.conn.commit()
+        return zlib.decompress(row[0])
+
+    def set(self, url, params, body, ttl=IMMUTABLE):
+        """
+        Stores the body of a request.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the request.
+        params : dict or None
+            The query parameters.
+        body : bytes
+            The body of the response.
+        ttl : float, optional
+            Seconds until the entry expires, by default IMMUTABLE.
+        """
+        if self.offline:
+            return
+        key = get_cache_key(url, params)
+        compressed = zlib.compress(body)
+        now = time.time()
+        expires_at = None if ttl == IMMUTABLE else now + ttl
+        with self.lock:
+            previous = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, url, body, size, stored_at, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (key, url, compressed, len(compressed), now, expires_at, now))
+            self.total_size += len(compressed) - (previous[0] if previous else 0)
+            if self.total_size > self.max_size:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        # evict the least recently used entries until 90% of the maximum size are reached,
+        # such that not every following insert triggers an eviction
+        target_size = 0.9 * self.max_size
+        evicted_keys = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            if self.total_size <= target_size:
+                break
+            evicted_keys.append((key,))
+            self.total_size -= size
+        self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+    def close(self):
+        self.conn.close()
+
+
+_default_response_cache = None
+
+
+def get_default_response_cache():
+    """
+    Returns the response cache shared by all clients and scrapers of the process.
+
+    Offline replay mode is enabled by setting the environment variable RESPONSE_CACHE_OFFLINE=1.
+    """
+    global _default_response_cache
+    if _default_response_cache is None:
+        _default_response_cache = ResponseCache(offline=os.getenv('RESPONSE_CACHE_OFFLINE') == '1')
+    return _default_response_cache
@@ -0,0 +1,143 @@
+import queue
+import threading
+from db.write_buffer import WriteBuffer, DEFAULT_FLUSH_SIZE, DEFAULT_FLUSH_INTERVAL
+
+# maximum number of queued rows, producers block if the writer falls behind
+DEFAULT_QUEUE_SIZE = 10000
+# seconds between the checks of blocked producers whether the writer thread is still running
+POLL_INTERVAL = 0.1
+
+
+class SQLiteWriter:
+    """
+    Single writer thread that owns the only writing connection to the SQLite database.
+
+    Several producers, e.g. ingestion sessions running in parallel, put their rows into a queue and
+    the writer thread writes them through a WriteBuffer in batched transactions. SQLite only allows
+    one writer at a time, so this avoids lock contention between the producers. The writer has the
+    same interface as a WriteBuffer (`add`, `call`, `flush`) and can be used in its place.
+
+    Parameters
+    ----------
+    connect : Callable[[], Connection]
+        Function opening the connection, called in the writer thread.
+    flush_size : int, optional
+        Number of buffered rows that triggers a flush.
+    flush_interval : float, optional
+        Seconds after which buffered rows are flushed, also if no new rows arrive.
+    queue_size : int, optional
+        Maximum number of queued rows.
+    """
+
+    def __init__(self, connect, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL, queue_size=DEFAULT_QUEUE_SIZE):
+        self.connect = connect
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+
+    def start(self):
+        """Starts the writer thread and waits until its connection is open."""
+        self.thread.start()
+        self.ready.wait()
+        self._raise_error()
+        return self
+
+    def add(self, query, params):
+        """Queues a row of an INSERT or UPDATE statement."""
+        self._put(('row', query, tuple(params)))
+
+    def call(self, func):
+        """Queues a function that is called with the connection after all rows queued before it are written."""
+        self._put(('call', func))
+
+    def flush(self):
+        """Blocks until all queued rows are written and committed."""
+        done = threading.Event()
+        self._put(('flush', done))
+        while not done.wait(POLL_INTERVAL):
+            self._raise_stopped()
+        self._raise_error()
+
+    def close(self):
+        """Writes all queued rows and stops the writer thread."""
+        if self.thread.is_alive():
+            try:
+                self._put(None)
+            except RuntimeError:
+                pass
+            self.thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise RuntimeError("The SQLite writer has stopped after an error") from self.error
+
+    def _raise_stopped(self):
+        self._raise_error()
+        if not self.thread.is_alive():
+            raise RuntimeError("The SQLite writer is not running")
+
+    def _put(self, item):
+        # a writer that stopped after an error does not consume the queue anymore, so a full queue
+        # or a pending flush would block forever, the producer raises instead
+        self._raise_error()
+        while True:
+            try:
+                self.queue.put(item, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                self._raise_stopped()
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+        self.ready.set()
+
+        write_buffer = WriteBuffer(conn, flush_size=self.flush_size, flush_interval=self.flush_interval)
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    write_buffer.flush()
+                    continue
+
+                if item is None:
+                    break
+                kind = item[0]
+                if kind == 'row':
+                    write_buffer.add(item[1], item[2])
+                elif kind == 'call':
+                    write_buffer.call(item[1])
+                elif kind == 'flush':
+                    write_buffer.flush()
+                    item[1].set()
+            write_buffer.flush()
+        except Exception as e:
+            self.error = e
+            # release producers waiting for a flush, they see the error
+            self._drain()
+        finally:
+            conn.close()
+
+    def _drain(self):
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[0] == 'flush':
+                item[1].set()
@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+DEFAULT_FLUSH_SIZE = 1000
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+
+class WriteBuffer:
+    """
+    Accumulates rows per SQL statement and writes them with `executemany` in bounded transactions.
+
+    A flush writes all buffered rows in a single transaction, so a killed run loses at most the rows
+    buffered since the last flush and never leaves a partially written batch behind. The buffer is
+    flushed when it holds `flush_size` rows or when `flush_interval` seconds have passed since the
+    last flush; the interval is checked whenever a row is added, as the SQLite connection can only
+    be used from the thread that created it.
+
+    Rows are executed in the order they were added, such that e.g. an UPDATE of a match runs after
+    the INSERT of the match, also if several producers share the buffer. Consecutive rows of the
+    same statement are grouped into one `executemany`.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    flush_size : int, optional
+        Number of buffered rows that triggers a flush.
+    flush_interval : float, optional
+        Seconds after which buffered rows are flushed with the next added row.
+    """
+
+    def __init__(self, conn, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.conn = conn
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        # runs of consecutive rows of the same statement as [query, rows]
+        self.pending = []
+        self.n_pending = 0
+        self.last_flush = time.monotonic()
+
+    def add(self, query, params):
+        """
+        Buffers a row of a statement and flushes the buffer if it is full or the interval has passed.
+
+        Parameters
+        ----------
+        query : str
+            The INSERT or UPDATE statement with placeholders.
+        params : Sequence
+            The values of the placeholders.
+        """
+        if self.pending and self.pending[-1][0] == query:
+            self.pending[-1][1].append(tuple(params))
+        else:
+            self.pending.append([query, [tuple(params)]])
+        self.n_pending += 1
+        if self.n_pending >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def add_many(self, query, rows):
+        """Buffers several rows of a statement."""
+        for params in rows:
+            self.add(query, params)
+
+    def call(self, func):
+        """
+        Flushes the buffered rows and calls a function with the connection, e.g. to alter a table.
+
+        Parameters
+        ----------
+        func : Callable[[Connection], Any]
+            The function to call.
+        """
+        self.flush()
+        func(self.conn)
+        self.conn.commit()
+
+    def flush(self):
+        """
+        Writes all buffered rows in a single transaction.
+
+        If the transaction fails it is rolled back and the rows stay buffered.
+        """
+        if self.n_pending:
+            db_cursor = self.conn.cursor()
+            try:
+                for query, rows in self.pending:
+                    db_cursor.executemany(query, rows)
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.conn.rollback()
+                print(f"An error occurred while writing {self.n_pending} buffered rows: {e}")
+                raise
+            self.pending = []
+            self.n_pending = 0
+        self.last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # rows of completed work are written even if the run fails
+        self.flush()
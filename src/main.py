@@ -1,17 +1,14 @@
 from preprocessing.data_preprocessor import preprocess_data
+from preprocessing.feature_cache import FeatureCache
 from data_analysis.models import log_results_mlflow_with_cv, single_feature_assessment_ml_models, train_and_evaluate_models_with_cv
 from sklearn.model_selection import train_test_split
-import os
-import pandas as pd
 
 models_to_evaluate = ["Logistic Regression"]#], "Decision Tree", "Random Forest", "XGBoost"]
 
 def do_analysis():
 
-    if(os.path.exists("df_model.csv")):
-        df = pd.read_csv("df_model.csv")
-    else:
-        df = preprocess_data()
+    # reuses the features of the last run as long as the database and the preprocessing code are unchanged
+    df = FeatureCache(name="df_model").get_or_compute(preprocess_data)
         
     target_feature = "result"
 
@@ -0,0 +1,251 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from db.response_cache import IMMUTABLE, CacheMissError, get_default_response_cache
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# rate-limit headers of API-Football: per minute and, via RapidAPI, per day
+HEADER_MINUTE_LIMIT = 'X-RateLimit-Limit'
+HEADER_MINUTE_REMAINING = 'X-RateLimit-Remaining'
+HEADER_DAILY_REMAINING = 'X-RateLimit-Requests-Remaining'
+
+# default time to live of cached responses per endpoint in seconds. The data of a fixture is
+# requested for finished fixtures only and does not change anymore, callers can pass a shorter ttl.
+ENDPOINT_TTLS = {
+    'fixtures': 6 * 3600,
+    'fixtures/statistics': IMMUTABLE,
+    'fixtures/lineups': IMMUTABLE,
+    'fixtures/events': IMMUTABLE,
+    'players': 24 * 3600,
+}
+DEFAULT_TTL = 3600
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting the rate of requests.
+
+    The rate is adjusted to the limits the API reports in its response headers.
+
+    Parameters
+    ----------
+    rate : float
+        Number of tokens added per second.
+    capacity : float, optional
+        Maximum number of tokens, i.e. the size of a burst, by default the rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hands out no tokens for the given number of seconds, e.g. after a 429 response."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+    def update_from_headers(self, headers):
+        """
+        Adjusts the rate to the per-minute limit reported by the API.
+
+        If no request is left in the current minute, the bucket is paused until the next minute.
+
+        Parameters
+        ----------
+        headers : Mapping
+            The headers of a response.
+        """
+        limit = headers.get(HEADER_MINUTE_LIMIT)
+        remaining = headers.get(HEADER_MINUTE_REMAINING)
+        with self.lock:
+            if limit is not None and int(limit) > 0:
+                self.rate = min(self.rate, int(limit) / 60)
+        if remaining is not None and int(remaining) <= 0:
+            self.pause(60)
+
+
+class ApiFootballClient:
+    """
+    Client for API-Football that runs requests concurrently within the rate limit of the plan.
+
+    All requests share one HTTP session with a connection pool and the concurrent requests of all
+    callers, e.g. ingestion sessions running in parallel, share one pool of workers, such that
+    there are never more requests in flight than connections in the pool. A token bucket, driven by the
+    rate-limit headers of the responses, limits the request rate, and failed requests (429, 5xx,
+    connection errors) are retried with exponential backoff. Successful responses are stored in a
+    response cache with a ttl per endpoint, see ENDPOINT_TTLS.
+
+    Parameters
+    ----------
+    headers : dict
+        Headers sent with every request, e.g. the RapidAPI key and host.
+    base_url : str
+        Base URL of the API, e.g. the URL of a local stub server in tests.
+    requests_per_second : float, optional
+        Initial request rate, lowered to the limit reported by the API.
+    max_workers : int, optional
+        Maximum number of concurrent requests of all callers, also the size of the connection pool.
+    max_retries : int, optional
+        Maximum number of retries of a failed request.
+    backoff_factor : float, optional
+        Base of the exponential backoff in seconds.
+    timeout : float, optional
+        Timeout of a single request in seconds.
+    response_cache : ResponseCache, optional
+        Cache of the responses, by default the cache shared by the process. False disables caching.
+    """
+
+    def __init__(self, headers, base_url, requests_per_second=5, max_workers=8, max_retries=5, backoff_factor=1.0, timeout=30,
+                 response_cache=None):
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.quota_exhausted = False
+        self.response_cache = get_default_response_cache() if response_cache is None else response_cache
+
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        # requests made with `get` outside of the workers wait for a free connection instead of
+        # opening connections the pool cannot keep
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-football')
+
+    def get(self, endpoint, params=None, ttl=None):
+        """
+        Requests an endpoint of the API, or returns the cached response.
+
+        Parameters
+        ----------
+        endpoint : str
+            The endpoint relative to the base URL, e.g. 'fixtures/lineups'.
+        params : dict, optional
+            The query parameters.
+        ttl : float, optional
+            Seconds the response is cached, by default the ttl of the endpoint in ENDPOINT_TTLS.
+
+        Returns
+        -------
+        dict or None
+            The decoded JSON response, or None if the request failed after all retries or is not
+            cached in offline mode.
+        """
+        url = self.base_url + endpoint
+        if self.response_cache:
+            try:
+                body = self.response_cache.get(url, params)
+            except CacheMissError as e:
+                print(e)
+                return None
+            if body is not None:
+                return json.loads(body)
+
+        response_json = self._request(url, endpoint, params)
+        if self.response_cache and response_json is not None and not response_json.get("errors"):
+            ttl = ENDPOINT_TTLS.get(endpoint, DEFAULT_TTL) if ttl is None else ttl
+            self.response_cache.set(url, params, json.dumps(response_json).encode(), ttl)
+        return response_json
+
+    def _request(self, url, endpoint, params):
+        for attempt in range(self.max_retries + 1):
+            if self.quota_exhausted:
+                print(f"Daily request quota exhausted, skipping request to {endpoint} {params}")
+                return None
+
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                self._update_rate_limit(response.headers)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    try:
+                        response.raise_for_status()
+                        return response.json()
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        print(f"Exception occured when requesting from API: {e}")
+                        return None
+                error = f"status code {response.status_code}"
+                if response.status_code == 429:
+                    self.rate_limiter.pause(self._get_backoff(attempt, response.headers.get('Retry-After')))
+
+            if attempt < self.max_retries:
+                time.sleep(self._get_backoff(attempt))
+
+        print(f"Exception occured when requesting from API: {endpoint} {params} failed after {self.max_retries} retries ({error})")
+        return None
+
+    def get_many(self, requests_to_send):
+        """
+        Runs several requests concurrently on the workers of the client.
+
+        Parameters
+        ----------
+        requests_to_send : Iterable[Tuple]
+            The requests as (endpoint, params) or (endpoint, params, ttl) tuples.
+
+        Returns
+        -------
+        list
+            The decoded responses in the order of the requests, None for failed requests.
+        """
+        requests_to_send = list(requests_to_send)
+        if not requests_to_send:
+            return []
+        return list(self.executor.map(lambda request: self.get(*request), requests_to_send))
+
+    def close(self):
+        self.executor.shutdown()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _update_rate_limit(self, headers):
+        self.rate_limiter.update_from_headers(headers)
+        daily_remaining = headers.get(HEADER_DAILY_REMAINING)
+        if daily_remaining is not None and int(daily_remaining) <= 0:
+            self.quota_exhausted = True
+
+    def _get_backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # exponential backoff with jitter, such that the workers do not retry in lockstep
+        return self.backoff_factor * 2 ** attempt * random.uniform(0.5, 1.5)
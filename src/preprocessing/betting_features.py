@@ -0,0 +1,158 @@
+import pandas as pd
+import numpy as np
+
+BET_TARGETS = ('favorite', 'underdog', 'draw')
+
+
+def compute_favorite_underdog(home_odds, away_odds):
+    """
+    Determines favorite and underdog for every match in one vectorized comparison.
+
+    The odds are compared exactly as they are stored (as strings for scraped odds, as floats
+    otherwise), which matches the row-wise `get_favorite` and `get_underdog` functions.
+
+    Parameters
+    ----------
+    home_odds : np.ndarray
+        Array of home odds.
+    away_odds : np.ndarray
+        Array of away odds.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Arrays of 'home'/'away' labels for the favorite and the underdog.
+    """
+    favorite = np.where(np.asarray(home_odds < away_odds, dtype=bool), 'home', 'away')
+    underdog = np.where(np.asarray(home_odds > away_odds, dtype=bool), 'home', 'away')
+    return favorite, underdog
+
+
+def compute_result(home_goals, away_goals):
+    """
+    Calculates the result of every match based on the number of goals.
+
+    Parameters
+    ----------
+    home_goals : np.ndarray
+        Array of goals scored by the home teams.
+    away_goals : np.ndarray
+        Array of goals scored by the away teams.
+
+    Returns
+    -------
+    np.ndarray
+        Array with 'home', 'away' or 'draw' for every match.
+    """
+    home_won = np.asarray(home_goals > away_goals, dtype=bool)
+    away_won = np.asarray(home_goals < away_goals, dtype=bool)
+    return np.select([home_won, away_won], ['home', 'away'], default='draw')
+
+
+def compute_win_margin(picked, result, home_odds, draw_odds, away_odds, bet_target, bet_amount=10):
+    """
+    Calculates the win or loss margin of a bet for every match at once.
+
+    Mirrors `calculate_margin`: a lost bet returns -bet_amount, a won bet returns the profit and
+    a won bet whose odds cannot be parsed as a float is missing (NaN).
+
+    Parameters
+    ----------
+    picked : np.ndarray or None
+        Array of 'home'/'away' labels of the side that was bet on. Ignored for draw bets.
+    result : np.ndarray
+        Array of match results ('home', 'away' or 'draw').
+    home_odds, draw_odds, away_odds : np.ndarray
+        Arrays of odds as parsed floats, unparsable odds are NaN.
+    bet_target : str
+        The target of the bet. Can be 'draw', 'favorite', or 'underdog'.
+    bet_amount : int, optional
+        The amount of the bet, by default 10.
+
+    Returns
+    -------
+    np.ndarray
+        Array of float profits or losses.
+    """
+    if bet_target == 'draw':
+        # results are encoded as 'draw', so like in calculate_margin a draw bet is never won
+        won = result == 'X'
+        odds = draw_odds
+    else:
+        won = picked == result
+        odds = np.where(picked == 'home', home_odds, away_odds)
+
+    return np.where(won, bet_amount * odds - bet_amount, -float(bet_amount))
+
+
+def _to_float(values):
+    return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+
+
+def compute_bet_margin(df, bet_target, bet_amount=10):
+    """
+    Calculates the win or loss margin of a bet for all matches of a DataFrame that already
+    contains the 'favorite', 'underdog' and 'result' columns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame containing match data and betting information.
+    bet_target : str
+        The betting target, can be 'favorite', 'underdog', or 'draw'.
+    bet_amount : int, optional
+        The amount to bet, default is 10.
+
+    Returns
+    -------
+    np.ndarray
+        Array of float profits or losses.
+    """
+    picked = None if bet_target == 'draw' else df[bet_target].to_numpy()
+    return compute_win_margin(picked, df['result'].to_numpy(), _to_float(df['home_odds'].to_numpy()),
+                              _to_float(df['draw_odds'].to_numpy()), _to_float(df['away_odds'].to_numpy()),
+                              bet_target, bet_amount)
+
+
+def compute_betting_features(df, bet_targets=BET_TARGETS, bet_amount=10):
+    """
+    Computes favorite, underdog, result and the win margins of all bet targets in one pass
+    over the odds and goals arrays.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        A DataFrame containing match data with the columns 'home_odds', 'draw_odds', 'away_odds',
+        'home_goals' and 'away_goals'.
+    bet_targets : Iterable[str], optional
+        The bet targets for which a 'win_margin_bet_on_<target>' column is computed,
+        by default all of 'favorite', 'underdog' and 'draw'.
+    bet_amount : int, optional
+        The amount to bet, default is 10.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with the same index as the input containing the columns 'favorite', 'underdog',
+        'result' and one 'win_margin_bet_on_<target>' column per bet target.
+    """
+    home_odds_raw = df['home_odds'].to_numpy()
+    away_odds_raw = df['away_odds'].to_numpy()
+
+    favorite, underdog = compute_favorite_underdog(home_odds_raw, away_odds_raw)
+    result = compute_result(df['home_goals'].to_numpy(), df['away_goals'].to_numpy())
+
+    features = {'favorite': favorite, 'underdog': underdog, 'result': result}
+
+    if bet_targets:
+        home_odds = _to_float(home_odds_raw)
+        draw_odds = _to_float(df['draw_odds'].to_numpy())
+        away_odds = _to_float(away_odds_raw)
+        picked_sides = {'favorite': favorite, 'underdog': underdog, 'draw': None}
+
+        for bet_target in bet_targets:
+            features['win_margin_bet_on_' + bet_target] = compute_win_margin(
+                picked_sides[bet_target], result, home_odds, draw_odds, away_odds, bet_target, bet_amount
+            )
+
+    return pd.DataFrame(features, index=df.index)
@@ -1,6 +1,12 @@
+import os
 import pandas as pd
 import numpy as np
-from db.db_manager import fetch_data_from_db
+from db.db_manager import fetch_data_from_db, fetch_match_data, build_match_filter, get_table_columns
+from preprocessing.betting_features import compute_betting_features, compute_bet_margin
+from preprocessing.streaks import compute_streak_features
+from preprocessing.form_features import FormFeatureEngine, DEFAULT_WINDOWS, DEFAULT_EWM_SPANS
+from preprocessing.pipeline import Stage, Pipeline, get_module_path
+from preprocessing.player_ratings import get_player_card_ratings, attach_player_ratings_as_of, aggregate_lineup_ratings, RATING_AGGREGATIONS
 from sklearn.preprocessing import MinMaxScaler
 
 
@@ -106,14 +112,21 @@ def calculate_margin(row, bet_target, bet_amount=10):
         return None
 
 
-def add_betting_info(df):
+def add_betting_info(df, bet_targets=(), bet_amount=10):
     """
     Adds columns for favorite, underdog, and result to the DataFrame.
     
+    The columns are computed column-wise over the odds and goals arrays instead of row by row. If bet targets
+    are given, the corresponding 'win_margin_bet_on_<target>' columns are computed in the same pass.
+    
     Parameters
     ----------
     df : pd.DataFrame
         A DataFrame containing match data.
+    bet_targets : Iterable[str], optional
+        Bet targets ('favorite', 'underdog', 'draw') for which the win margin is added as well, by default none.
+    bet_amount : int, optional
+        The amount to bet for the win margins, default is 10.
         
     Returns
     -------
@@ -121,9 +134,9 @@ def add_betting_info(df):
         A new DataFrame with additional columns: 'favorite', 'underdog', and 'result' representing the favorite team, underdog team, and result of the match respectively.
     """
     df = df.copy()  # make a copy of the dataframe to avoid changing the original dataframe
-    df['favorite'] = df.apply(get_favorite, axis=1)
-    df['underdog'] = df.apply(get_underdog, axis=1)
-    df['result'] = df.apply(get_result, axis=1)
+    df_betting_features = compute_betting_features(df, bet_targets=bet_targets, bet_amount=bet_amount)
+    for column in df_betting_features.columns:
+        df[column] = df_betting_features[column]
     return df
 
 
@@ -145,81 +158,53 @@ def bet_on(df, bet_target, bet_amount = 10):
     pd.DataFrame
         A new DataFrame with an additional column representing the margin of winning or losing for the betting.
     """
-    df['win_margin_bet_on_'+bet_target] = df.apply(calculate_margin, args=(bet_target, bet_amount), axis=1)
+    df['win_margin_bet_on_'+bet_target] = compute_bet_margin(df, bet_target, bet_amount)
     return df
 
 
 
-def add_winning_streak_info(df):
+def add_winning_streak_info(df, kinds=('winning',), scopes=('venue',)):
     """
     Adds winning streak information to a DataFrame with match data.
 
     This function computes the winning streaks of home and away teams for each match in the input DataFrame. 
     The winning streak is a running count of consecutive wins by a team, resetting to 0 whenever the team 
     experiences a loss or starts a new season. This additional information can provide insights into the 
-    form of the teams leading up to a match.
+    form of the teams leading up to a match. By default the home streak only counts home matches and the
+    away streak only counts away matches.
+
+    The streaks are computed on factorized team codes with cumulative sums (see `preprocessing.streaks`),
+    other kinds of streaks ('unbeaten', 'losing', 'clean_sheet') and the 'overall' scope over home and away
+    matches can be requested as well.
     
     Parameters
     ----------
     df : pd.DataFrame
         DataFrame with matches data sorted by date. It should include columns 'home_team', 'away_team', 
-        'result', and 'season', representing the participating teams, match result, and the season 
-        respectively.
+        'home_goals', 'away_goals' and 'season', representing the participating teams, the goals and the 
+        season respectively.
+    kinds : Iterable[str], optional
+        Kinds of streaks to add, by default only 'winning'.
+    scopes : Iterable[str], optional
+        'venue' for separate home and away streaks and/or 'overall' for streaks over all matches of a team,
+        by default only 'venue'.
         
     Returns
     -------
     pd.DataFrame
         A DataFrame with two new columns: 'home_winning_streak' and 'away_winning_streak' representing 
         the winning streak of home and away teams. The winning streak is reset to 0 at the end of each 
-        season or after a loss, and it is incremented after a win.
+        season or after a loss, and it is incremented after a win. Other kinds and scopes add columns
+        named like 'home_unbeaten_streak' or 'home_winning_streak_overall'.
         
     """
-    home_streaks = {}
-    away_streaks = {}
-    home_seasons = {}
-    away_seasons = {}
-
     # Convert 'match_date' to datetime
     df['match_date'] = pd.to_datetime(df['match_date'], format='%d.%m.%Y')
     df = df.sort_values('match_date')
 
-    for i, row in df.iterrows():
-        home_team = row['home_team']
-        away_team = row['away_team']
-        result = row['result']
-        season = row['season']
-        
-        # Check if the teams have played before, if not set their streaks to 0
-        home_streaks.setdefault(home_team, 0)
-        away_streaks.setdefault(away_team, 0)
-        home_seasons.setdefault(home_team, season)
-        away_seasons.setdefault(away_team, season)
-
-        # Reset the streak if the season has changed
-        if home_seasons[home_team] != season:
-            home_streaks[home_team] = 0
-            home_seasons[home_team] = season
-        if away_seasons[away_team] != season:
-            away_streaks[away_team] = 0
-            away_seasons[away_team] = season
-
-        # Store the streaks in the DataFrame
-        df.at[i, 'home_winning_streak'] = home_streaks[home_team]
-        df.at[i, 'away_winning_streak'] = away_streaks[away_team]
-
-        # Update the streaks based on the game result
-        # If the home team won, increase their streak and reset the away team's streak
-        if result == 'home':
-            home_streaks[home_team] += 1
-            away_streaks[away_team] = 0
-        # If the away team won, increase their streak and reset the home team's streak
-        elif result == 'away':
-            away_streaks[away_team] += 1
-            home_streaks[home_team] = 0
-        # If it was a draw, reset both team's streaks
-        else:
-            home_streaks[home_team] = 0
-            away_streaks[away_team] = 0
+    df_streaks = compute_streak_features(df, kinds=kinds, scopes=scopes)
+    for column in df_streaks.columns:
+        df[column] = df_streaks[column]
 
     return df
 
@@ -240,6 +225,11 @@ def calculate_rolling_avg(group, numeric_cols, n_rolling_average = 5):
     n_rolling_average : int, optional, default=5
         The window size for the rolling average calculation. Represents the number of rows
         included in each average calculation.
+
+    Notes
+    -----
+    The group has to contain the matches of a single team, otherwise the windows leak across teams.
+    For the whole unified dataset use `preprocessing.form_features.FormFeatureEngine` instead.
     """   
     group[numeric_cols] = group[numeric_cols].rolling(window=n_rolling_average, min_periods=1, closed="left").mean()
     return group
@@ -268,16 +258,46 @@ def merge_match_odds(df_matches, df_odds):
     df_merged_matches_odds = df_matches.merge(df_odds[['fixture_id', 'home_odds', 'draw_odds', 'away_odds']], on='fixture_id', how='inner')
     return df_merged_matches_odds
 
-def fetch_and_merge_data():
+def get_match_statistics_columns():
+    """
+    Gets the columns of the 'Match_Statistics' table that are used by the preprocessing.
+    
+    Returns
+    -------
+    List[str]
+        All columns up to and including 'home_expected_goals', which is the column `clean_data` cuts at.
+    """
+    columns = get_table_columns('Match_Statistics')
+    if 'home_expected_goals' in columns:
+        columns = columns[:columns.index('home_expected_goals') + 1]
+    return columns
+
+
+def fetch_and_merge_data(seasons=None, competitions=None, date_from=None, date_to=None):
     """
-    This function fetches matches, odds, and match statistics data separately from the database and 
+    This function fetches matches, odds, and match statistics data joined from the database and 
     performs multiple steps of data processing and merging to generate a consolidated DataFrame. 
     
-    It calls several other functions to merge match and odds data, calculate betting information, 
-    add winning streak information, compute goal difference, and format the 'fixture_id' column. 
+    It calls several other functions to calculate betting information, add winning streak information
+    and compute goal difference. 
     The resulting DataFrame provides a rich set of information which can be used for further analysis 
     or model development in predicting football match outcomes.
     
+    The tables are joined in SQLite with a single query that only selects the columns used later on.
+    The optional filters are applied in SQL as well; note that streaks then start from 0 at the first
+    selected match.
+    
+    Parameters
+    ----------
+    seasons : List[int], optional
+        Seasons to fetch, by default all seasons.
+    competitions : List[str], optional
+        Competitions to fetch, by default all competitions.
+    date_from : str, optional
+        First match date to fetch in the format %d.%m.%Y.
+    date_to : str, optional
+        Last match date to fetch in the format %d.%m.%Y.
+    
     Returns
     -------
     pd.DataFrame
@@ -286,18 +306,22 @@ def fetch_and_merge_data():
         and fixture_id as int64.
         
     """
-    df_matches = fetch_data_from_db('Matches')
-    df_odds = fetch_data_from_db('Odds')
-    df_match_statistics = fetch_data_from_db('Match_Statistics')
+    match_filter, params = build_match_filter(seasons, competitions, date_from, date_to, table_alias='M')
+    statistics_columns = [column for column in get_match_statistics_columns() if column != 'fixture_id']
+
+    # matches, odds and statistics are joined in SQLite, matches without statistics are kept for the streaks
+    df_match_data = fetch_match_data(statistics_columns, where=match_filter, params=params)
+    has_statistics = df_match_data.pop('statistics_fixture_id').notna()
     
-    df_merged_matches_odds = merge_match_odds(df_matches, df_odds)
-    df_betting_info = add_betting_info(df_merged_matches_odds)
+    df_betting_info = add_betting_info(df_match_data)
     df_added_winning_streak = add_winning_streak_info(df_betting_info)
     
     df_added_winning_streak['goal_difference'] = df_added_winning_streak['home_goals'] - df_added_winning_streak['away_goals']
-    df_added_winning_streak['fixture_id'] = df_added_winning_streak['fixture_id'].astype('int64')
 
-    return df_added_winning_streak.merge(df_match_statistics, on="fixture_id")
+    # keep only matches with statistics and put the statistics last, as clean_data cuts the columns positionally
+    df_added_winning_streak = df_added_winning_streak[has_statistics.reindex(df_added_winning_streak.index)]
+    other_columns = [column for column in df_added_winning_streak.columns if column not in statistics_columns]
+    return df_added_winning_streak[other_columns + statistics_columns].reset_index(drop=True)
 
 
 def clean_data(df):
@@ -397,35 +421,78 @@ def format_result(x):
     else:
         return 2
 
-def preprocess_data():
+def prepare_unified_stage(df):
+    """Pipeline stage: unified dataset with one row per team and match."""
+    home_stats, away_stats = get_home_away_stats()
+    return prepare_unified_dataset(df, home_stats, away_stats)
+
+
+def form_features_stage(all_teams_df):
+    """Pipeline stage: per-team rolling and exponentially weighted form features."""
+    numeric_cols = [col for col in all_teams_df.columns if all_teams_df[col].dtype != 'datetime64[ns]' and col not in ['team', 'type']]
+    form_feature_engine = FormFeatureEngine(numeric_cols, windows=DEFAULT_WINDOWS, ewm_spans=DEFAULT_EWM_SPANS, primary_window=5)
+    return form_feature_engine.fit_transform(all_teams_df)
+
+
+def merge_form_features_stage(df, all_teams_df_grouped):
+    """Pipeline stage: form features of the home and away team merged into the match data."""
+    home_stats_df = get_renamed_df(all_teams_df_grouped, 'home')
+    away_stats_df = get_renamed_df(all_teams_df_grouped, 'away')
+    return merge_home_away_with_original(df, home_stats_df, away_stats_df)
+
+
+def get_preprocessing_pipeline():
+    """
+    Returns the preprocessing steps as a pipeline of named stages with declared inputs and outputs.
+    
+    Returns
+    -------
+    Pipeline
+        The preprocessing pipeline, from 'fetch_and_merge_data' to 'normalize_numeric_columns'.
+    """
+    this_module = get_module_path('data_preprocessor.py')
+    db_module = get_module_path(os.path.join('..', 'db', 'db_manager.py'))
+    return Pipeline([
+        Stage('fetch_and_merge_data', fetch_and_merge_data, inputs=[], output='df_merged',
+              sources=['Matches', 'Odds', 'Match_Statistics'],
+              modules=[this_module, get_module_path('betting_features.py'), get_module_path('streaks.py'), db_module]),
+        Stage('clean_data', clean_data, inputs=['df_merged'], output='df_clean'),
+        Stage('prepare_unified_dataset', prepare_unified_stage, inputs=['df_clean'], output='all_teams_df',
+              modules=[this_module]),
+        Stage('rolling', form_features_stage, inputs=['all_teams_df'], output='all_teams_df_grouped',
+              modules=[get_module_path('form_features.py')]),
+        Stage('merge_home_away_with_original', merge_form_features_stage, inputs=['df_clean', 'all_teams_df_grouped'],
+              output='df_all_match_data', modules=[this_module]),
+        Stage('add_player_data', add_player_data, inputs=['df_all_match_data'], output='df_match_and_player_data',
+              sources=['StartingXI', 'FIFA_Player_Statistics'], modules=[get_module_path('player_ratings.py'), db_module]),
+        Stage('normalize_numeric_columns', normalize_numeric_columns, inputs=['df_match_and_player_data'], output='df_normalized'),
+    ])
+
+
+def preprocess_data(from_stage=None, until_stage=None, use_cache=False):
     """
     Executes a series of data preprocessing steps 
     including fetching and merging data, cleaning, and performing feature engineering, 
     to prepare the data for further analysis and modeling.
     
+    The steps run as stages of the preprocessing pipeline (see `get_preprocessing_pipeline`), which reports
+    the duration and peak memory of every stage.
+    
+    Parameters
+    ----------
+    from_stage : str, optional
+        Stage from which on all stages are recomputed, upstream stages are taken from the cache.
+    until_stage : str, optional
+        Last stage to run, by default 'normalize_numeric_columns'.
+    use_cache : bool, optional
+        Whether to cache the output of every stage, by default False.
+    
     Returns
     -------
     df_home_away : pd.DataFrame
         A preprocessed and cleaned DataFrame ready for modeling.
     """
-    df = fetch_and_merge_data()
-    df = clean_data(df)
-    
-    home_stats, away_stats = get_home_away_stats()
-    all_teams_df = prepare_unified_dataset(df, home_stats, away_stats)
-    numeric_cols = [col for col in all_teams_df.columns if all_teams_df[col].dtype != 'datetime64[ns]' and col not in ['team', 'type']]
-    all_teams_df_grouped = calculate_rolling_avg(all_teams_df, numeric_cols, n_rolling_average=5)
-    
-    home_stats_df = get_renamed_df(all_teams_df_grouped, 'home')
-    away_stats_df = get_renamed_df(all_teams_df_grouped, 'away')
-
-    df_all_match_data = merge_home_away_with_original(df, home_stats_df, away_stats_df)
-
-
-    df_match_and_player_data = add_player_data(df_all_match_data)
-    df_normalized = normalize_numeric_columns(df_match_and_player_data)
-
-    return df_normalized
+    return get_preprocessing_pipeline().run(from_stage=from_stage, until_stage=until_stage, use_cache=use_cache)
 
 def normalize_numeric_columns(df):
     # Separate the numeric columns and non-numeric columns
@@ -449,51 +516,41 @@ def normalize_numeric_columns(df):
 
 
 
-def add_player_data(df_match_data):
-    #df_players = fetch_data_from_db('Players')
-    df_starting_xi = fetch_data_from_db('StartingXI')
-    #df_player_stats = fetch_data_from_db("Player_Statistics")
-    df_fifa_stats = fetch_data_from_db("FIFA_Player_Statistics")
-    df_starting_xi['fixture_id'] = df_starting_xi['fixture_id'].astype('int64')
-
-    df_starting_xi['team_position'] = df_starting_xi['team'] + '_' + df_starting_xi['position_on_grid']
-    df_starting_xi_grouped = df_starting_xi.groupby(['fixture_id', 'team_position'])['player_id'].agg(list).reset_index()
-    df_starting_xi_pivoted = df_starting_xi_grouped.pivot(index='fixture_id', columns='team_position', values='player_id').reset_index()
-
-    df_match_and_player_data = pd.merge(df_match_data, df_starting_xi_pivoted, on='fixture_id', how='left')
-
-    # Set of columns before the merge
-    original_columns = set(df_match_data.columns)
-    # Set of columns after the merge
-    merged_columns = set(df_match_and_player_data.columns)
-    # New columns added to df_merged
-    new_columns = merged_columns - original_columns
-    # Convert to a list, if needed
-    new_columns_list = list(new_columns)
-    # Create a mapping of player_id to overall_rating
-    id_to_rating = df_fifa_stats.set_index('player_id')['overall_rating'].to_dict()
-
-    # Define the lambda function to compute the average rating
-    def average_rating(ids):
-        if isinstance(ids, list) and ids:
-            ratings = [id_to_rating.get(id, np.nan) for id in ids]
-            return np.nanmean(ratings)
-        else:
-            return np.nan
-
-    # Apply the lambda function to the column
-    for column in new_columns_list:
-        df_match_and_player_data[column + '_rating'] = df_match_and_player_data[column].apply(average_rating)
-
-    # Extract columns related to home and away
-    home_cols = [col for col in df_match_and_player_data.columns if 'home_' in col and '_rating' in col]
-    away_cols = [col for col in df_match_and_player_data.columns if 'away_' in col and '_rating' in col]
+def add_player_data(df_match_data, aggregations=RATING_AGGREGATIONS, by_line=True):
+    """
+    Adds the aggregated FIFA ratings of the starting XI of both teams to the match data.
+    
+    The starting XI is joined with the ratings in long format (one row per player and fixture) and
+    aggregated with a single groupby over fixture and team. Every player gets the rating of the FIFA card
+    that was valid on the match date (as-of join), so later cards do not leak into earlier matches.
+    
+    Parameters
+    ----------
+    df_match_data : pd.DataFrame
+        DataFrame containing match information including 'fixture_id' and 'match_date'.
+    aggregations : Iterable[str], optional
+        Aggregations of the ratings of all players of a team, by default mean, max, min and std.
+        The mean is stored as 'home_rating_aggregate' and 'away_rating_aggregate'.
+    by_line : bool, optional
+        Whether to add the mean rating per position line (e.g. 'home_rating_def'), by default True.
+        
+    Returns
+    -------
+    pd.DataFrame
+        The match data with the aggregated rating columns of the home and away teams.
+    """
+    df_starting_xi = fetch_data_from_db('StartingXI', columns=['fixture_id', 'team', 'player_id', 'position'],
+                                        dtypes={'fixture_id': 'int64', 'player_id': str})
 
-    # Apply aggregation
-    df_match_and_player_data['home_rating_aggregate'] = df_match_and_player_data[home_cols].apply(np.nanmean, axis=1)  
-    df_match_and_player_data['away_rating_aggregate'] = df_match_and_player_data[away_cols].apply(np.nanmean, axis=1)
+    # compact every chunk of FIFA cards right away, such that the wide card rows are never all in memory
+    fifa_chunks = fetch_data_from_db("FIFA_Player_Statistics", columns=['player_id', 'overall_rating', 'date_fifa_card'],
+                                     dtypes={'player_id': str}, chunksize=100_000)
+    df_cards = pd.concat([get_player_card_ratings(chunk) for chunk in fifa_chunks], ignore_index=True)
+    df_cards = df_cards.sort_values('card_date', kind='stable').reset_index(drop=True)
+    df_lineup_ratings = attach_player_ratings_as_of(df_starting_xi, df_cards, df_match_data[['fixture_id', 'match_date']])
+    df_team_ratings = aggregate_lineup_ratings(df_lineup_ratings, aggregations=aggregations, by_line=by_line)
 
-    return df_match_and_player_data
+    return pd.merge(df_match_data, df_team_ratings, on='fixture_id', how='left')
 
 
 def get_home_away_stats():
@@ -536,3 +593,15 @@ def get_renamed_df(all_teams_df_grouped, team_type):
     stats_df.rename(columns=cols_to_rename, inplace=True)
     
     return stats_df
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the preprocessing pipeline with per-stage caching.")
+    parser.add_argument("--from-stage", help="recompute this stage and all stages after it")
+    parser.add_argument("--until-stage", help="stop after this stage")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write cached stage outputs")
+    args = parser.parse_args()
+
+    preprocess_data(from_stage=args.from_stage, until_stage=args.until_stage, use_cache=not args.no_cache)
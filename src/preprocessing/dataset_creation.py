@@ -1,8 +1,9 @@
 from preprocessing.match_data_retrieval import *
 from odds_scraper import generate_links_current_season, generate_links_historic_seasons
 from fifa_player_scraper import *
-import time
-import random
+from sofifa_crawler import SofifaCrawler, STATUS_FOUND, STATUS_NOT_FOUND
+from fifa_card_harvester import FIFACardHarvester
+from preprocessing.api_football_client import TokenBucket
 import logging
 
 # empty logging data before every script run
@@ -35,18 +36,15 @@ SEASONS_ODDS_PORTAL = ["2021-2022", "2020-2021", "2019-2020", "2018-2019", "2017
 SEASONS_API = [str(year) for year in range(2015, 2019)]
 
 
-def compile_data_for_leagues_and_seasons(leagues, seasons):
-    for league in leagues:
-        for season in seasons:
-            print(f"Getting data for {league} in season {season}")
-            retrieve_competition_season_data(competition_name=league, competition_api_id=LEAGUES_API_CODE.get(league), season=season)
+def compile_data_for_leagues_and_seasons(leagues, seasons, max_workers=4):
+    # the seasons are retrieved in parallel sessions that share the rate limit and a single database writer
+    retrieve_competition_seasons_in_parallel([(league, LEAGUES_API_CODE.get(league), season) for league in leagues for season in seasons],
+                                             max_workers=max_workers)
 
 
-def compile_data_for_internationalcomp_and_seasons(international_comp, seasons):
-    for comp in international_comp:
-        for season in seasons:
-            print(f"Getting data for {comp} in season {season}")
-            retrieve_competition_season_data(competition_name=comp, competition_api_id=INTERNATIONAL_COMPETITIONS_API_CODE.get(comp), season=season)
+def compile_data_for_internationalcomp_and_seasons(international_comp, seasons, max_workers=4):
+    retrieve_competition_seasons_in_parallel([(comp, INTERNATIONAL_COMPETITIONS_API_CODE.get(comp), season) for comp in international_comp for season in seasons],
+                                             max_workers=max_workers)
 
 
 def compile_odds_for_leagues_and_seasons(league_mapping: dict, seasons: list):
@@ -56,66 +54,33 @@ def compile_odds_for_leagues_and_seasons(league_mapping: dict, seasons: list):
 
 
 
-def search_for_player(player, conn):
-    num_words_last_name = count_words(player["last_name"])
-
-    for season_begin_year in range(2015, 2024):
-        time.sleep(random.uniform(0.05, 0.1))
-
-        teams = get_teams_for_player_in_season(player["player_id"], conn, season_begin_year)
-        fifa_version = map_season_to_fifa_version(season_begin_year)
-
-        print(teams)
-
-        for team in teams:
-            soup_player = search_through_different_player_teams(player, team, fifa_version, num_words_last_name)
-            if soup_player:
-                return soup_player
-    return None
-
-def search_through_different_player_teams(player, team, fifa_version, num_words_last_name):
-    if num_words_last_name > 1:
-        all_name_parts = player["last_name"].replace("-", " ").split()
+def compile_fifa_player_data(n_workers=4, requests_per_second=2.0):
+    conn = connect_db()
+    query = "SELECT player_id, first_name, last_name FROM Players"
+    df_players = pd.read_sql_query(query, conn)
+    conn.close()
 
-        for part_last_name in all_name_parts:
-            soup_player = get_player_soup(part_last_name, team, fifa_version, player["player_id"])
-            if soup_player:
-                return soup_player
-    else:
-        print(player)
-        return get_player_soup(player["last_name"], team, fifa_version, player["player_id"])
+    # the crawler and the harvester share the polite rate limit for sofifa.com
+    rate_limiter = TokenBucket(requests_per_second)
 
-def get_player_soup(name, team, fifa_version, id):
-    url_player = search_player_by_last_name_and_team(name, team, fifa_version)
-    if url_player:
-        return get_soup_for_url(url_player)
-    else:
-        logging.error(f"Webscraping did not work for player with {id} using {name}, {team}, {fifa_version}")
-        return None
+    # the sofifa profiles of all players are searched by a resumable crawl, see SofifaCrawler
+    crawler = SofifaCrawler(n_workers=n_workers, rate_limiter=rate_limiter)
+    crawler.enqueue_players(df_players)
+    crawl_status = crawler.run()
+    logging.info(f"Sofifa crawl finished: {crawl_status}")
 
-def compile_fifa_player_data():
-    conn = connect_db()
-    query = "SELECT * FROM Players"
-    df_players = pd.read_sql_query(query, conn)
+    for player_id, first_name, last_name, _ in crawler.get_players(STATUS_NOT_FOUND):
+        logging.error(f"Soup not found for player {player_id} {first_name} {last_name}")
 
-    for _, player in df_players.iterrows():
-        if check_player_exists(conn, player["player_id"]):
-            continue
-        
-        print(player["last_name"])
-        time.sleep(random.uniform(0.2, 0.5))
-        
-        soup_player = search_player_by_full_name(f"{player['first_name']} {player['last_name']}")
-        
-        if soup_player is None:
-            soup_player = search_for_player(player, conn)
-        if soup_player:
-            compile_data_for_all_fifa_version_cards(player["player_id"], soup_player)
-            logging.info(f"Inserted data for player {player['last_name']}")
-        else:
-            logging.error(f"Soup not found for player {id} {player['first_name']} {player['last_name']}")
+    # only the cards that are not stored yet are fetched, so players harvested by an earlier run cost one page
+    harvester = FIFACardHarvester(n_workers=n_workers, rate_limiter=rate_limiter)
+    for player_id, first_name, last_name, player_url in crawler.get_players(STATUS_FOUND):
+        n_cards = harvester.harvest(player_id, player_url)
+        if n_cards:
+            logging.info(f"Inserted {n_cards} cards for player {last_name}")
 
-    conn.close()
+    harvester.close_connection()
+    crawler.close_connection()
 
 
 compile_fifa_player_data()
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import sqlite3
+import pyarrow as pa
+import pyarrow.feather as feather
+from db.db_manager import DATABASE_PATH
+
+CACHE_DIR = 'Data/feature_cache'
+
+# tables read by preprocess_data, a change in any of them invalidates the cached features
+SOURCE_TABLES = ('Matches', 'Odds', 'Match_Statistics', 'StartingXI', 'FIFA_Player_Statistics')
+
+# modules whose code determines the features, a change in any of them invalidates the cached features,
+# db_manager builds the queries of the source data
+PREPROCESSING_MODULES = ('data_preprocessor.py', 'betting_features.py', 'streaks.py', 'form_features.py', 'player_ratings.py',
+                         os.path.join('..', 'db', 'db_manager.py'))
+
+
+def get_table_fingerprint(conn, table_name):
+    """
+    Returns a cheap fingerprint of a table: the number of rows, the maximum rowid and the maximum fixture_id.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    table_name : str
+        The name of the table.
+
+    Returns
+    -------
+    list or None
+        The row count, maximum rowid and maximum fixture_id (None if the table has no fixture_id column),
+        or None if the table does not exist.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    if db_cursor.fetchone() is None:
+        return None
+
+    db_cursor.execute(f"PRAGMA table_info({table_name})")
+    columns = [column[1] for column in db_cursor.fetchall()]
+    max_fixture_id = "MAX(CAST(fixture_id AS INTEGER))" if 'fixture_id' in columns else "NULL"
+
+    db_cursor.execute(f"SELECT COUNT(*), MAX(rowid), {max_fixture_id} FROM {table_name}")
+    return list(db_cursor.fetchone())
+
+
+def get_source_fingerprint(database_path=DATABASE_PATH, tables=SOURCE_TABLES):
+    """
+    Returns the fingerprints of all source tables of the preprocessing.
+
+    Parameters
+    ----------
+    database_path : str, optional
+        Path of the SQLite database.
+    tables : Iterable[str], optional
+        Names of the source tables.
+
+    Returns
+    -------
+    dict
+        A mapping from table name to its fingerprint.
+    """
+    with sqlite3.connect(database_path) as conn:
+        return {table_name: get_table_fingerprint(conn, table_name) for table_name in tables}
+
+
+def get_code_version(modules=PREPROCESSING_MODULES):
+    """
+    Returns a hash of the source code of the preprocessing modules.
+
+    Parameters
+    ----------
+    modules : Iterable[str], optional
+        Paths of the modules relative to the preprocessing package.
+
+    Returns
+    -------
+    str
+        Hex digest of the hashed source files.
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    code_hash = hashlib.sha256()
+    for module in modules:
+        with open(os.path.join(package_dir, module), 'rb') as file:
+            code_hash.update(file.read())
+    return code_hash.hexdigest()
+
+
+def prepare_for_feather(df):
+    """
+    Converts a DataFrame to types that can be stored in a Feather file.
+
+    Object columns are inferred to proper dtypes, columns with mixed values are stored as strings.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame to store.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with a default index and typed columns.
+    """
+    df = df.reset_index(drop=True).infer_objects()
+    for column in df.select_dtypes(include='object').columns:
+        try:
+            pa.array(df[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[column] = df[column].astype('string')
+    return df
+
+
+class FeatureCache:
+    """
+    Persistent cache of preprocessed features.
+
+    Entries are keyed by a fingerprint of the source tables in the SQLite database and of the
+    preprocessing code, and stored as uncompressed Feather files so that they can be loaded with
+    memory mapping. Entries with another key are stale and evicted when a new entry is saved.
+    """
+
+    def __init__(self, name='df_model', cache_dir=CACHE_DIR, database_path=DATABASE_PATH):
+        self.name = name
+        self.cache_dir = cache_dir
+        self.database_path = database_path
+
+    def get_key(self):
+        """Returns the key of the cache entry for the current database and preprocessing code."""
+        fingerprint = {'tables': get_source_fingerprint(self.database_path), 'code_version': get_code_version()}
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:16]
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, f"{self.name}-{key}.feather")
+
+    def contains(self, key):
+        """Returns whether an entry with the given key exists."""
+        return os.path.exists(self.get_path(key))
+
+    def load(self, key=None):
+        """
+        Loads the cache entry for the current fingerprint.
+
+        Parameters
+        ----------
+        key : str, optional
+            Key of the entry, by default the key of the current fingerprint.
+
+        Returns
+        -------
+        pd.DataFrame or None
+            The cached DataFrame, or None if there is no valid entry.
+        """
+        path = self.get_path(key or self.get_key())
+        if not os.path.exists(path):
+            return None
+        return feather.read_table(path, memory_map=True).to_pandas()
+
+    def save(self, df, key=None):
+        """
+        Stores a DataFrame as the cache entry for the current fingerprint and evicts stale entries.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            The DataFrame to store.
+        key : str, optional
+            Key of the entry, by default the key of the current fingerprint.
+        """
+        key = key or self.get_key()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # write to a temporary file first, such that an interrupted write never leaves a corrupt entry
+        path = self.get_path(key)
+        tmp_path = path + '.tmp'
+        feather.write_feather(prepare_for_feather(df), tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+        self.evict_stale(key)
+
+    def evict_stale(self, key):
+        """
+        Removes all entries of this cache except the one with the given key.
+
+        Parameters
+        ----------
+        key : str
+            Key of the entry to keep.
+        """
+        current_file = os.path.basename(self.get_path(key))
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(f"{self.name}-") and file_name != current_file:
+                os.remove(os.path.join(self.cache_dir, file_name))
+
+    def get_or_compute(self, compute_features):
+        """
+        Returns the cached features if they are up to date, otherwise computes and caches them.
+
+        Parameters
+        ----------
+        compute_features : Callable[[], pd.DataFrame]
+            Function computing the features, e.g. `preprocess_data`.
+
+        Returns
+        -------
+        pd.DataFrame
+            The features.
+        """
+        key = self.get_key()
+        df = self.load(key)
+        if df is None:
+            df = prepare_for_feather(compute_features())
+            self.save(df, key)
+        return df
@@ -0,0 +1,265 @@
+import pandas as pd
+import numpy as np
+
+DEFAULT_WINDOWS = (3, 5, 10)
+DEFAULT_EWM_SPANS = (5,)
+PRIMARY_WINDOW = 5
+
+
+def get_form_column_name(col, window=None, span=None, primary_window=PRIMARY_WINDOW):
+    """
+    Returns the name of a form feature column.
+
+    The rolling mean over the primary window keeps the name of the statistic, such that the
+    renamed columns stay e.g. 'home_avg_fouls'. Other windows and EWMA spans get a suffix.
+
+    Parameters
+    ----------
+    col : str
+        Name of the statistic.
+    window : int, optional
+        Window size of a rolling mean.
+    span : int, optional
+        Span of an exponentially weighted mean.
+    primary_window : int, optional
+        Window size whose rolling mean keeps the plain column name, by default 5.
+
+    Returns
+    -------
+    str
+        The name of the form feature column.
+    """
+    if span is not None:
+        return f'{col}_ewm{span}'
+    if window == primary_window:
+        return col
+    return f'{col}_roll{window}'
+
+
+def get_group_starts(team_codes):
+    """
+    Returns for every row the position of the first row of its team.
+
+    Parameters
+    ----------
+    team_codes : np.ndarray
+        Team code of every row, rows of the same team must be contiguous.
+
+    Returns
+    -------
+    np.ndarray
+        Integer array with the position of the first row of the team of each row.
+    """
+    n_rows = len(team_codes)
+    is_start = np.ones(n_rows, dtype=bool)
+    is_start[1:] = team_codes[1:] != team_codes[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(n_rows), 0))
+
+
+def compute_grouped_rolling_means(team_codes, values, windows):
+    """
+    Computes rolling means over the previous matches of each team for several window sizes in one pass.
+
+    Equivalent to `rolling(window, min_periods=1, closed="left").mean()` applied to every team
+    separately: the current row is excluded and missing values are ignored.
+
+    Parameters
+    ----------
+    team_codes : np.ndarray
+        Team code of every row, rows must be sorted by team and match date.
+    values : np.ndarray
+        2D float array with one column per statistic.
+    windows : Iterable[int]
+        Window sizes of the rolling means.
+
+    Returns
+    -------
+    Dict[int, np.ndarray]
+        A mapping from window size to a 2D array of rolling means with the shape of `values`.
+    """
+    n_rows = len(values)
+    is_valid = ~np.isnan(values)
+
+    # prefix sums with a leading row of zeros: prefix[k] is the sum over the first k rows
+    prefix_sum = np.zeros((n_rows + 1, values.shape[1]))
+    prefix_sum[1:] = np.cumsum(np.where(is_valid, values, 0.0), axis=0)
+    prefix_count = np.zeros((n_rows + 1, values.shape[1]), dtype=np.int64)
+    prefix_count[1:] = np.cumsum(is_valid, axis=0)
+
+    positions = np.arange(n_rows)
+    group_starts = get_group_starts(team_codes)
+
+    rolling_means = {}
+    for window in windows:
+        window_starts = np.maximum(group_starts, positions - window)
+        window_sum = prefix_sum[positions] - prefix_sum[window_starts]
+        window_count = prefix_count[positions] - prefix_count[window_starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rolling_means[window] = np.where(window_count > 0, window_sum / np.maximum(window_count, 1), np.nan)
+    return rolling_means
+
+
+def update_ewm_state(state, values, alpha):
+    """
+    Updates the exponentially weighted mean of a team with the values of its next match.
+
+    Parameters
+    ----------
+    state : np.ndarray
+        Current exponentially weighted means, NaN if no value has been observed yet.
+    values : np.ndarray
+        Values of the next match, missing values leave the mean unchanged.
+    alpha : float
+        Smoothing factor.
+
+    Returns
+    -------
+    np.ndarray
+        The updated exponentially weighted means.
+    """
+    updated = np.where(np.isnan(state), values, (1 - alpha) * state + alpha * values)
+    return np.where(np.isnan(values), state, updated)
+
+
+class FormFeatureEngine:
+    """
+    Computes per-team form features (rolling means over several windows and exponentially weighted
+    means) from the unified dataset created by `prepare_unified_dataset`.
+
+    All features only use matches before the current one. After `fit_transform` the engine keeps the
+    trailing state of every team, so that `update` can compute the features of newly appended fixtures
+    without recomputing the whole history.
+    """
+
+    def __init__(self, numeric_cols, windows=DEFAULT_WINDOWS, ewm_spans=DEFAULT_EWM_SPANS, primary_window=PRIMARY_WINDOW):
+        self.numeric_cols = list(numeric_cols)
+        self.windows = tuple(windows)
+        self.ewm_spans = tuple(ewm_spans)
+        self.primary_window = primary_window
+        self.tail = None
+        self.ewm_state = {}
+
+    def get_feature_columns(self):
+        """Returns the names of all form feature columns in the order they are created."""
+        columns = [get_form_column_name(col, window=window, primary_window=self.primary_window)
+                   for window in self.windows for col in self.numeric_cols]
+        columns += [get_form_column_name(col, span=span) for span in self.ewm_spans for col in self.numeric_cols]
+        return columns
+
+    def fit_transform(self, all_teams_df):
+        """
+        Computes the form features for the whole history and stores the trailing state of every team.
+
+        Parameters
+        ----------
+        all_teams_df : pd.DataFrame
+            Unified dataset with one row per team and match, sorted by team and match date.
+
+        Returns
+        -------
+        pd.DataFrame
+            The input DataFrame where the numeric columns are replaced by the form features.
+        """
+        values = all_teams_df[self.numeric_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        team_codes = pd.factorize(all_teams_df['team'])[0]
+
+        features = self._compute_rolling_features(team_codes, values)
+        features.update(self._compute_ewm_features(all_teams_df['team'], values))
+
+        self._store_state(all_teams_df, values)
+        return self._assemble(all_teams_df, features)
+
+    def update(self, new_teams_df):
+        """
+        Computes the form features of newly appended fixtures from the stored trailing state.
+
+        Only the teams that appear in the new fixtures are touched, the state of all other teams
+        remains unchanged.
+
+        Parameters
+        ----------
+        new_teams_df : pd.DataFrame
+            Unified dataset of the new fixtures, sorted by team and match date. All matches must be
+            played after the matches the engine has already seen.
+
+        Returns
+        -------
+        pd.DataFrame
+            The new rows where the numeric columns are replaced by the form features.
+        """
+        if self.tail is None:
+            raise RuntimeError("fit_transform has to be called before update.")
+
+        new_values = new_teams_df[self.numeric_cols].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        teams = new_teams_df['team'].to_numpy()
+
+        # prepend the stored trailing matches of the affected teams to compute the rolling windows
+        tail = self.tail[self.tail['team'].isin(set(teams))]
+        combined_teams = np.concatenate([tail['team'].to_numpy(), teams])
+        combined_values = np.vstack([tail[self.numeric_cols].to_numpy(dtype=float), new_values])
+        order = np.argsort(pd.factorize(combined_teams)[0], kind='stable')
+        team_codes = pd.factorize(combined_teams[order])[0]
+
+        features = {}
+        is_new_row = order >= len(tail)
+        new_row_order = order[is_new_row] - len(tail)
+        for name, feature_values in self._compute_rolling_features(team_codes, combined_values[order]).items():
+            feature_values = feature_values[is_new_row]
+            features[name] = np.empty_like(feature_values)
+            features[name][new_row_order] = feature_values
+
+        for span in self.ewm_spans:
+            alpha = 2 / (span + 1)
+            ewm_values = np.empty_like(new_values)
+            states = self.ewm_state[span]
+            for i, team in enumerate(teams):
+                state = states.get(team, np.full(len(self.numeric_cols), np.nan))
+                ewm_values[i] = state
+                states[team] = update_ewm_state(state, new_values[i], alpha)
+            for j, col in enumerate(self.numeric_cols):
+                features[get_form_column_name(col, span=span)] = ewm_values[:, j]
+
+        self.tail = self._get_tail(pd.concat([self.tail, self._as_state_frame(new_teams_df, new_values)], ignore_index=True))
+        return self._assemble(new_teams_df, features)
+
+    def _compute_rolling_features(self, team_codes, values):
+        features = {}
+        for window, means in compute_grouped_rolling_means(team_codes, values, self.windows).items():
+            for j, col in enumerate(self.numeric_cols):
+                features[get_form_column_name(col, window=window, primary_window=self.primary_window)] = means[:, j]
+        return features
+
+    def _compute_ewm_features(self, teams, values):
+        df_values = pd.DataFrame(values, columns=self.numeric_cols, index=teams.index)
+        df_previous = df_values.groupby(teams).shift()
+
+        features = {}
+        for span in self.ewm_spans:
+            ewm = df_previous.groupby(teams).transform(lambda s: s.ewm(span=span, adjust=False, ignore_na=True).mean())
+            for col in self.numeric_cols:
+                features[get_form_column_name(col, span=span)] = ewm[col].to_numpy()
+        return features
+
+    def _store_state(self, all_teams_df, values):
+        self.tail = self._get_tail(self._as_state_frame(all_teams_df, values))
+
+        self.ewm_state = {}
+        df_values = pd.DataFrame(values, columns=self.numeric_cols)
+        df_values['team'] = all_teams_df['team'].to_numpy()
+        for span in self.ewm_spans:
+            alpha = 2 / (span + 1)
+            last_ewm = df_values.groupby('team')[self.numeric_cols].agg(
+                lambda s: s.ewm(alpha=alpha, adjust=False, ignore_na=True).mean().iloc[-1])
+            self.ewm_state[span] = {team: row.to_numpy(dtype=float) for team, row in last_ewm.iterrows()}
+
+    def _as_state_frame(self, teams_df, values):
+        df_state = pd.DataFrame(values, columns=self.numeric_cols)
+        df_state.insert(0, 'team', teams_df['team'].to_numpy())
+        return df_state
+
+    def _get_tail(self, df_state):
+        return df_state.groupby('team', sort=False).tail(max(self.windows)).reset_index(drop=True)
+
+    def _assemble(self, teams_df, features):
+        df_features = pd.DataFrame(features, index=teams_df.index)[self.get_feature_columns()]
+        return pd.concat([teams_df.drop(columns=self.numeric_cols), df_features], axis=1)
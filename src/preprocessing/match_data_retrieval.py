@@ -6,6 +6,13 @@ import pandas as pd
 import os
 from dotenv import load_dotenv
 from db.db_manager import *
+from concurrent.futures import ThreadPoolExecutor
+from db.write_buffer import WriteBuffer, DEFAULT_FLUSH_SIZE, DEFAULT_FLUSH_INTERVAL
+from db.sqlite_writer import SQLiteWriter
+from preprocessing.api_football_client import ApiFootballClient
+from db.response_cache import IMMUTABLE
+from preprocessing.season_sync import (FIXTURE_SYNC_TABLES, PLAYER_STATS_TARGET, SEASON_TARGET, CHECKPOINT_INSERT_QUERY,
+                                       plan_fixture_sync, plan_player_sync, get_fixtures_with_lineups, is_season_synced)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -24,13 +31,25 @@ URL_LINEUPS = "https://api-football-v1.p.rapidapi.com/v3/fixtures/lineups"
 URL_EVENTS = f"https://api-football-v1.p.rapidapi.com/v3/fixtures/events"
 URL_PLAYERS = f"https://api-football-v1.p.rapidapi.com/v3/players/"
 
+# endpoints relative to BASE_URL, requested through the ApiFootballClient
+ENDPOINT_FIXTURES = "fixtures"
+ENDPOINT_STATISTICS = "fixtures/statistics"
+ENDPOINT_LINEUPS = "fixtures/lineups"
+ENDPOINT_EVENTS = "fixtures/events"
+ENDPOINT_PLAYERS = "players"
 
+# final statuses of fixtures, every other status (e.g. not started, live, postponed "PST", suspended or
+# abandoned "ABD") may still change and the responses of such fixtures are only cached for LIVE_TTL seconds
+FINISHED_STATUSES = {"FT", "AET", "PEN", "CANC", "AWD", "WO"}
+LIVE_TTL = 60
 
-def get_all_live_matches():
-    try:
-        response = requests.get(BASE_URL + "fixtures?live=all", headers=HEADERS).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured when requesting from API: {e}")
+
+
+def get_all_live_matches(client=None):
+    client = client or ApiFootballClient(HEADERS, BASE_URL)
+    response = client.get(ENDPOINT_FIXTURES, {"live": "all"}, ttl=LIVE_TTL)
+    if response is None:
+        return None
     
     live_matches = response["response"]
 
@@ -38,86 +57,539 @@ def get_all_live_matches():
 
 
 
-def retrieve_competition_season_data(competition_name, competition_api_id, season):
-    global conn
-    conn = connect_db()
+def retrieve_competition_season_data(competition_name, competition_api_id, season, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                                     client=None, use_bulk_players=False, resume=True):
+    # the requests run concurrently within the rate limit, all database writes stay in this thread
+    client = client or ApiFootballClient(HEADERS, BASE_URL)
+    session = IngestionSession(competition_name, competition_api_id, season, client, use_bulk_players=use_bulk_players, resume=resume,
+                               flush_size=flush_size, flush_interval=flush_interval)
+    session.run()
+
+
+def retrieve_competition_seasons_in_parallel(competition_seasons, max_workers=4, client=None, use_bulk_players=False, resume=True,
+                                             flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+    """
+    Retrieves the data of several competition seasons in parallel sessions.
+
+    The sessions share one API client, so the rate limit of the plan applies to all of them
+    together, and one SQLiteWriter, so a single connection writes to the database.
+
+    Parameters
+    ----------
+    competition_seasons : Iterable[Tuple[str, str, int]]
+        The (competition_name, competition_api_id, season) to retrieve.
+    max_workers : int, optional
+        Number of sessions running at the same time.
+    client : ApiFootballClient, optional
+        The API client, by default a new client.
+    use_bulk_players : bool, optional
+        Whether to fetch the players from the paginated bulk endpoint of the league.
+    resume : bool, optional
+        Whether to request only the data missing in the database.
+    flush_size : int, optional
+        Number of buffered rows that triggers a flush of the writer.
+    flush_interval : float, optional
+        Seconds after which the writer flushes buffered rows.
+    """
+    client = client or ApiFootballClient(HEADERS, BASE_URL)
+
+    def run_session(competition_season):
+        competition_name, competition_api_id, season = competition_season
+        print(f"Getting data for {competition_name} in season {season}")
+        IngestionSession(competition_name, competition_api_id, season, client, write_buffer=writer,
+                         use_bulk_players=use_bulk_players, resume=resume).run()
+
+    with SQLiteWriter(connect_db, flush_size=flush_size, flush_interval=flush_interval) as writer:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # list() re-raises the first exception of a session
+            list(executor.map(run_session, competition_seasons))
+
+
+def fetch_player_responses(client, players, season, league_api_id=None, ttl=None):
+    """
+    Requests the data of the players of a season with one request per player.
+
+    Parameters
+    ----------
+    client : ApiFootballClient
+        The API client.
+    players : Iterable[int]
+        The API ids of the players.
+    season : int
+        The season.
+    league_api_id : int, optional
+        If given, the squads of the whole league are fetched from the paginated bulk endpoint first
+        and only players missing there (e.g. after a transfer) are requested individually. Note that
+        the bulk endpoint only returns the statistics of this league, not of other competitions.
+    ttl : float, optional
+        Seconds the responses are cached, by default the ttl of the players endpoint.
+
+    Returns
+    -------
+    dict
+        A mapping from player id to the response of the player, None if the request failed.
+    """
+    players = list(players)
+    player_responses = fetch_league_player_responses(client, league_api_id, season, ttl) if league_api_id is not None else {}
+
+    missing_players = [player for player in players if player not in player_responses]
+    responses = client.get_many((ENDPOINT_PLAYERS, {"id": player, "season": season}, ttl) for player in missing_players)
+    player_responses.update(zip(missing_players, responses))
+
+    return {player: player_responses[player] for player in players}
+
+
+def fetch_league_player_responses(client, league_api_id, season, ttl=None):
+    """
+    Requests the players of all squads of a league from the paginated `players?league=&season=` endpoint.
+
+    The first page gives the number of pages, the remaining pages are requested concurrently.
+
+    Parameters
+    ----------
+    client : ApiFootballClient
+        The API client.
+    league_api_id : int
+        The API id of the league.
+    season : int
+        The season.
+    ttl : float, optional
+        Seconds the pages are cached, by default the ttl of the players endpoint.
+
+    Returns
+    -------
+    dict
+        A mapping from player id to a response in the format of the single-player request.
+    """
+    params = {"league": league_api_id, "season": season}
+    first_page = client.get(ENDPOINT_PLAYERS, params, ttl)
+    if first_page is None:
+        return {}
+
+    n_pages = first_page.get("paging", {}).get("total", 1)
+    pages = [first_page] + client.get_many((ENDPOINT_PLAYERS, {**params, "page": page}, ttl) for page in range(2, n_pages + 1))
+
+    player_responses = {}
+    for page in pages:
+        if page is None:
+            continue
+        for player_entry in page["response"]:
+            player_responses[player_entry["player"]["id"]] = {"response": [player_entry]}
+    return player_responses
+
+
+class IngestionSession:
+    """
+    Retrieves the data of one competition season from API-Football and saves it to the database.
+
+    The session owns its state: a connection for the reads, the write buffer all rows are written
+    through and the players of the season. Several sessions can therefore run in parallel threads,
+    sharing an ApiFootballClient (and with it the rate limit) and a SQLiteWriter.
+
+    Parameters
+    ----------
+    competition_name : str
+        The name of the competition, e.g. 'Bundesliga'.
+    competition_api_id : str
+        The API id of the competition.
+    season : int
+        The season.
+    client : ApiFootballClient
+        The API client.
+    write_buffer : WriteBuffer or SQLiteWriter, optional
+        Where the rows are written to, by default a WriteBuffer on the connection of the session.
+    use_bulk_players : bool, optional
+        Whether to fetch the players from the paginated bulk endpoint of the league.
+    resume : bool, optional
+        Whether to request only the data missing in the database and skip seasons that are synced completely.
+    flush_size : int, optional
+        Flush size of the default write buffer.
+    flush_interval : float, optional
+        Flush interval of the default write buffer.
+    """
+
+    def __init__(self, competition_name, competition_api_id, season, client, write_buffer=None, use_bulk_players=False, resume=True,
+                 flush_size=DEFAULT_FLUSH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.competition_name = competition_name
+        self.competition_api_id = competition_api_id
+        self.season = season
+        self.client = client
+        self.use_bulk_players = use_bulk_players
+        self.resume = resume
+
+        self.conn = connect_db()
+        # all rows are written in batches, a killed run loses at most the rows since the last flush
+        self.write_buffer = write_buffer or WriteBuffer(self.conn, flush_size=flush_size, flush_interval=flush_interval)
+
+        # collect all players that played in this season 
+        # to get the player stats in the national and internation competitions after collecting all the match data of the season
+        self.all_players_in_season = set()
+
+    def run(self):
+        try:
+            # with resume, only the data missing in the database is requested and finished seasons that
+            # have been synced completely are skipped without any request
+            if self.resume and is_season_synced(self.conn, self.competition_name, self.season):
+                print(f"{self.competition_name} {self.season} is already synced")
+                return
+
+            response = self.client.get(ENDPOINT_FIXTURES, {"league": self.competition_api_id, "season": self.season, "timezone": "Europe/Berlin"})
+            if response is None:
+                return
+
+            json_matches = response["response"]
+
+            # the data of finished fixtures never changes and is cached permanently, as are the player stats of a finished season
+            unfinished_fixture_ids = {str(match["fixture"]["id"]) for match in json_matches if match["fixture"]["status"]["short"] not in FINISHED_STATUSES}
+            players_ttl = None if unfinished_fixture_ids else IMMUTABLE
+
+            fixture_ids = self.save_matches_to_db(json_matches)
+            sync_plan = plan_fixture_sync(self.conn, fixture_ids, self.season, unfinished_fixture_ids) if self.resume else None
+            n_failed = self.process_fixtures(fixture_ids, unfinished_fixture_ids, sync_plan)
+
+            players = plan_player_sync(self.conn, fixture_ids, self.season, self.all_players_in_season) if self.resume else self.all_players_in_season
+
+            # one response per player feeds both the Players and the Player_Statistics table
+            league_api_id = self.competition_api_id if self.use_bulk_players else None
+            player_responses = fetch_player_responses(self.client, players, self.season, league_api_id, ttl=players_ttl)
+            for player, response in player_responses.items():
+                if response is None:
+                    n_failed += 1
+                    continue
+                if (self.is_player_already_in_table(player) == False):
+                    self.save_player(player, response)
+                self.save_player_stats_for_season(player, response)
+                self.save_checkpoint(PLAYER_STATS_TARGET, player)
+
+            # the checkpoint is written after the rows of the season, hence never committed before them
+            if json_matches and not unfinished_fixture_ids and n_failed == 0:
+                self.save_checkpoint(SEASON_TARGET, self.competition_name)
+        finally:
+            self.write_buffer.flush()
+            close_db(self.conn)
+
+    def save_matches_to_db(self, json_matches):    
+
+        fixture_ids = []
+
+        # loop through each match and extract the relevant data
+        for match in json_matches:
+            fixture_id = str(match["fixture"]["id"])
+            home_team = match["teams"]["home"]["name"]
+            away_team = match["teams"]["away"]["name"]
+            home_goals = match["goals"]["home"]
+            away_goals = match["goals"]["away"]
+            match_status = match["fixture"]["status"]["short"]
+            match_date = match["fixture"]["date"]
+
+            # Split the match_date string into date and time separately and convert date to format %d.%m.%Y
+            datetime_obj = datetime.fromisoformat(match_date.replace("Z", "+00:00"))
+            match_date = datetime_obj.strftime('%d.%m.%Y')
+            match_time = datetime_obj.strftime('%H:%M')
+
+            # if match has not been played yet or data is unavailable for other reasons, skip it
+            if (home_goals is None and away_goals is None):
+                continue
+
+            # Insert the retrieved data into the database
+            self.write_buffer.add('''
+                INSERT OR IGNORE INTO Matches (Fixture_ID, Competition_Name, Season, Home_Team, Away_Team, Home_Goals, Away_Goals, Match_Date, Match_Time, Match_Status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (fixture_id, self.competition_name, self.season, home_team, away_team, home_goals, away_goals, match_date, match_time, match_status))
+
+            fixture_ids.append(fixture_id)
+
+        return fixture_ids
+
+
+    def process_fixtures(self, fixture_ids, unfinished_fixture_ids=(), sync_plan=None):
+        """
+        Requests and saves the statistics, lineups and substitutions of fixtures.
+
+        Parameters
+        ----------
+        fixture_ids : List[str]
+            The fixtures of the season.
+        unfinished_fixture_ids : Iterable[str], optional
+            Fixtures that are not finished yet, their responses are cached for a short time only and
+            their requests are not checkpointed.
+        sync_plan : dict, optional
+            The fixtures to request per target as returned by `plan_fixture_sync`, by default all fixtures.
+
+        Returns
+        -------
+        int
+            The number of failed requests.
+        """
+        fixture_ids = [str(fixture_id) for fixture_id in fixture_ids]
+        if sync_plan is None:
+            sync_plan = {target: fixture_ids for target in FIXTURE_SYNC_TABLES}
+        ttls = {fixture_id: LIVE_TTL if fixture_id in unfinished_fixture_ids else None for fixture_id in fixture_ids}
+
+        def save_fixture_checkpoint(target, fixture_id):
+            if fixture_id not in unfinished_fixture_ids:
+                self.save_checkpoint(target, fixture_id)
+
+        # statistics and lineups of all fixtures are requested concurrently
+        responses = self.client.get_many([(ENDPOINT_STATISTICS, {"fixture": fixture_id}, ttls[fixture_id]) for fixture_id in sync_plan['statistics']]
+                                    + [(ENDPOINT_LINEUPS, {"fixture": fixture_id}, ttls[fixture_id]) for fixture_id in sync_plan['lineups']])
+        statistics_responses, lineups_responses = responses[:len(sync_plan['statistics'])], responses[len(sync_plan['statistics']):]
+        n_failed = responses.count(None)
+
+        for fixture_id, statistics_response in zip(sync_plan['statistics'], statistics_responses):
+            # if the api has statistics data regarding the fixture id, preprocess and save it to the database
+            if statistics_response is None:
+                continue
+            if (len(statistics_response["response"]) != 0):
+                stat_types, stat_values = extract_statistics(statistics_response["response"])
+                self.save_match_statistics_to_db(fixture_id, stat_types, stat_values)
+            save_fixture_checkpoint('statistics', fixture_id)
+
+        fixtures_with_lineups = get_fixtures_with_lineups(self.conn, sync_plan['events'])
+        for fixture_id, lineups_response in zip(sync_plan['lineups'], lineups_responses):
+            if lineups_response is None:
+                continue
+            if self.save_match_lineups_to_db(fixture_id, lineups_response["response"]):
+                fixtures_with_lineups.add(fixture_id)
+            save_fixture_checkpoint('lineups', fixture_id)
+
+        # the events are only needed for the substitutes of fixtures with lineups that are not in the table yet
+        fixtures_without_substitutes = [fixture_id for fixture_id in sync_plan['events']
+                                        if fixture_id in fixtures_with_lineups and not self.are_substitutes_in_table(fixture_id)]
+        events_responses = self.client.get_many((ENDPOINT_EVENTS, {"fixture": fixture_id}, ttls[fixture_id]) for fixture_id in fixtures_without_substitutes)
+        n_failed += events_responses.count(None)
+        for fixture_id, events_response in zip(fixtures_without_substitutes, events_responses):
+            if events_response is not None:
+                self.save_substitutes_to_db(fixture_id, events_response["response"])
+                save_fixture_checkpoint('events', fixture_id)
+
+        return n_failed
+
+
+    def save_checkpoint(self, target, key):
+        self.write_buffer.add(CHECKPOINT_INSERT_QUERY, (target, str(key), int(self.season)))
+
+
+    def save_match_statistics_to_db(self, fixture_id, stat_types, stat_values):
+        # new stat columns are added by the registry if the api has introduced new stats for new seasons,
+        # the table is altered by the writing connection before the row is written
+        if not match_statistics_registry.has_columns(self.conn, stat_types):
+            self.write_buffer.call(lambda conn: match_statistics_registry.register_columns(conn, stat_types))
+        self.write_buffer.add(get_match_statistics_insert_query(tuple(stat_types)), [str(fixture_id)] + list(stat_values))
+
+
+    def save_match_lineups_to_db(self, fixture_id, lineups): 
+        fixture_id = str(fixture_id)
+
+        if (lineups):
+            self.save_formations_to_matches_table(lineups, fixture_id)
+            self.save_startingXI_to_db(lineups, fixture_id)
+            return True
+        return False
+
 
-    try:
-        response = requests.get(BASE_URL + f"fixtures?league={competition_api_id}&season={season}&timezone=Europe/Berlin", headers=HEADERS).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured when requesting from API: {e}")
-        return
-    
-    json_matches = response["response"]
+    # Update the formations in the Matches table
+    def save_formations_to_matches_table(self, lineups, fixture_id):
+        try:
+            home_formation = lineups[0]["formation"]
+            away_formation = lineups[1]["formation"]
+        except IndexError as e:
+            return
 
-    # collect all players that played in this season 
-    # to get the player stats in the national and internation competitions after collecting all the match data of the season
-    global all_players_in_season
-    all_players_in_season = set()
+        self.write_buffer.add('''
+            UPDATE Matches 
+            SET home_team_formation = ?, away_team_formation = ? 
+            WHERE fixture_id = ?
+        ''', (home_formation, away_formation, fixture_id))
 
-    fixture_ids = save_matches_to_db(json_matches, season, competition_name)
-    process_fixtures(fixture_ids)
 
-    for player in all_players_in_season:
-        if (is_player_already_in_table(player) == False):
-            save_player(player, season)
-        save_player_stats_for_season(player, season)
-    
-    close_db(conn)
+    def is_player_already_in_table(self, player_id):
+        db_cursor = self.conn.cursor()
 
+        # check if player_id already exists
+        db_cursor.execute('SELECT * FROM Players WHERE player_id=?', (player_id,))
+        fixture_data = db_cursor.fetchone()
 
-def save_matches_to_db(json_matches, season, competition_name):    
-    global conn
-    db_cursor = conn.cursor()
+        if fixture_data:
+            return True
+        else:
+            return False
 
-    fixture_ids = []
 
-    # loop through each match and extract the relevant data
-    for match in json_matches:
-        fixture_id = str(match["fixture"]["id"])
-        home_team = match["teams"]["home"]["name"]
-        away_team = match["teams"]["away"]["name"]
-        home_goals = match["goals"]["home"]
-        away_goals = match["goals"]["away"]
-        match_status = match["fixture"]["status"]["short"]
-        match_date = match["fixture"]["date"]
+    def save_player(self, player_id, response):
+        if response is None:
+            return
 
-        # Split the match_date string into date and time separately and convert date to format %d.%m.%Y
-        datetime_obj = datetime.fromisoformat(match_date.replace("Z", "+00:00"))
-        match_date = datetime_obj.strftime('%d.%m.%Y')
-        match_time = datetime_obj.strftime('%H:%M')
+        try:
+            player_data = response["response"][0]["player"]
+        except IndexError as e:
+            return
 
-        # if match has not been played yet or data is unavailable for other reasons, skip it
-        if (home_goals is None and away_goals is None):
-            continue
+        player_data = response["response"][0]["player"]
+        player_id = player_data["id"]
+        first_name = player_data["firstname"]
+        last_name = player_data["lastname"]
+        nationality = player_data["nationality"]
+        height = player_data["height"]
+        weight = player_data["weight"]
+        birth_date = player_data["birth"]["date"]
+        try:
+            date_obj = datetime.strptime(birth_date, "%Y-%m-%d")
+            birth_date = date_obj.strftime("%d.%m.%Y")
+        # no birth date found in data
+        except TypeError as e:
+            birth_date = None
+        # sometimes there's an inconsistency in the api football with a different format for the birth date
+        except ValueError as e:
+            date_obj = datetime.strptime(birth_date, "%Y-%d-%m")
+            birth_date = date_obj.strftime("%d.%m.%Y")
+
+        self.write_buffer.add("INSERT OR IGNORE INTO Players (player_id, first_name, last_name, nationality, height, weight, birth_date) VALUES (?, ?, ?, ?, ?, ?, ?)", 
+                (player_id, first_name, last_name, nationality, height, weight, birth_date))
+
+
+    def save_startingXI_to_db(self, lineups, fixture_id):
+        db_cursor = self.conn.cursor()
+
+        # check if fixture_id already exists
+        db_cursor.execute('SELECT * FROM StartingXI WHERE fixture_id=?', (fixture_id,))
+        fixture_data = db_cursor.fetchone()
+        # if fixture is already present in the table, do not insert it again
+        if fixture_data is not None:
+            return
+
+        # extract the players who played in the match for each team
+        for i, team in enumerate(["home", "away"]):
+            try:
+                for player in lineups[i]["startXI"]:
+                    player_id = player["player"]["id"]
+                    position = player["player"]["pos"]
+                    position_on_grid = player["player"]["grid"]
+                    self.all_players_in_season.add(player_id)
 
-        # Insert the retrieved data into the database
-        db_cursor.execute(f'''
-            INSERT OR IGNORE INTO Matches (Fixture_ID, Competition_Name, Season, Home_Team, Away_Team, Home_Goals, Away_Goals, Match_Date, Match_Time, Match_Status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (fixture_id, competition_name, season, home_team, away_team, home_goals, away_goals, match_date, match_time, match_status))
+                    query_insert_player = '''
+                                    INSERT OR IGNORE INTO StartingXI (fixture_id, player_id, position, position_on_grid, team)
+                                    VALUES (?, ?, ?, ?, ?)
+                                    '''
+                    self.write_buffer.add(query_insert_player, [fixture_id, player_id, position, position_on_grid, team])
+            except IndexError as e:
+                continue
 
-        fixture_ids.append(fixture_id)
 
-    conn.commit()
+    def are_substitutes_in_table(self, fixture_id):
+        db_cursor = self.conn.cursor()
 
-    return fixture_ids
+        # check if fixture_id already exists
+        db_cursor.execute('SELECT * FROM Substitutes WHERE fixture_id=?', (fixture_id,))
+        return db_cursor.fetchone() is not None
 
 
-def process_fixtures(fixture_ids):
-    for fixture_id in fixture_ids:
-        querystring = {"fixture" : fixture_id}
-        try:
-            statistics_response = requests.request("GET", URL_STATISTICS, headers=HEADERS, params=querystring).json()
-        except requests.exceptions.RequestException as e:
-            print(f"Exception occured when requesting from API: {e}")
+    def save_substitutes_to_db(self, fixture_id, events):
+        for event in events:
+            try:
+                if (event['type'] == 'subst'):
+                    player_id_subbed_off = event["player"]["id"]
+                    player_id_subbed_in = event["assist"]["id"]
+                    self.all_players_in_season.add(player_id_subbed_in)
+                    self.all_players_in_season.add(player_id_subbed_off)
 
-        statistics = statistics_response["response"]
-        # if the api has statistics data regarding the fixture id, preprocess and save it to the database
-        if (len(statistics) != 0):
-            stat_types, stat_values = extract_statistics(statistics)
-            save_match_statistics_to_db(fixture_id, stat_types, stat_values)
-        save_match_lineups_to_db(fixture_id)
+                    team_name = event["team"]["name"]
+                    time_of_sub = event["time"]["elapsed"]
+                    query_insert_home_subs = '''
+                                    INSERT OR IGNORE INTO Substitutes (fixture_id, team, player_id_subbed_off, player_id_subbed_in, minute_subbed_in)
+                                    VALUES (?, ?, ?, ?, ?)
+                                    '''
+                    self.write_buffer.add(query_insert_home_subs, [fixture_id, team_name, player_id_subbed_off, player_id_subbed_in, time_of_sub])
+            except IndexError as e:
+                continue
+
+
+
+    def save_player_stats_for_season(self, player_id, response):
+        if response is None:
+            return
+
+        try:
+            player_stats = response["response"][0]["statistics"]
+        except IndexError as e:
+            return
+
+        for competition_player_data in player_stats:
+            # general comp data
+            competition = competition_player_data["league"]["name"]
+            appeareances = competition_player_data["games"]["appearences"]
+            lineups = competition_player_data["games"]["lineups"]
+            minutes_played = competition_player_data["games"]["minutes"]
+            position = competition_player_data["games"]["position"]
+            rating = competition_player_data["games"]["rating"]
+            captain = competition_player_data["games"]["captain"]
+
+            # sub data
+            substitutes_in = competition_player_data["substitutes"]["in"]
+            substitutes_out = competition_player_data["substitutes"]["out"]
+            substitutes_bench = competition_player_data["substitutes"]["bench"]
+
+            # shots
+            shots_total =  competition_player_data["shots"]["total"]
+            shots_on_goal = competition_player_data["shots"]["on"]
+
+            # goals
+            goals = competition_player_data["goals"]["total"]
+            goals_conceded = competition_player_data["goals"]["conceded"]
+            assists = competition_player_data["goals"]["assists"]
+            saves = competition_player_data["goals"]["saves"]
+
+            # passes
+            passes_total = competition_player_data["passes"]["total"]
+            key_passes = competition_player_data["passes"]["key"]
+            passes_accuracy = competition_player_data["passes"]["accuracy"]
+
+            # tackles
+            tackles_total = competition_player_data["tackles"]["total"]
+            blocks = competition_player_data["tackles"]["blocks"]
+            interceptions = competition_player_data["tackles"]["interceptions"]
+
+            # duels 
+            duels_total = competition_player_data["duels"]["total"]
+            duels_won = competition_player_data["duels"]["won"]
+            duels_winrate = None
+            if (duels_total is not None and duels_won is not None and duels_total != 0):
+                duels_winrate = duels_won / duels_total
+
+            # dribbles
+            dribble_attempts = competition_player_data["dribbles"]["attempts"]
+            dribble_success = competition_player_data["dribbles"]["success"]
+            dribble_past = competition_player_data["dribbles"]["past"]
+
+            # fouls
+            fouls_drawn = competition_player_data["fouls"]["drawn"]
+            fouls_commited = competition_player_data["fouls"]["committed"]
+
+            # cards
+            cards_yellow = competition_player_data["cards"]["yellow"]
+            cards_yellowred = competition_player_data["cards"]["yellowred"]
+            cards_red = competition_player_data["cards"]["red"]
+
+            # penalty
+            penalties_won = competition_player_data["penalty"]["won"]
+            penalties_commited = competition_player_data["penalty"]["commited"]
+            penalties_scored = competition_player_data["penalty"]["scored"]
+            penalties_missed = competition_player_data["penalty"]["missed"]
+            penalties_saved = competition_player_data["penalty"]["saved"]
+
+            # Insert data into Statistics table
+            self.write_buffer.add("""INSERT OR IGNORE INTO Player_Statistics (
+                player_id, season, competition_name, appeareances, lineups, minutes_played, position, rating, captain, substitutes_in, substitutes_out,
+                substitutes_bench, shots_total, shots_on_goal, goals_total, goals_conceded, assists, saves, passes_total, key_passes,
+                passes_accuracy, tackles_total, blocks, interceptions, duels_total, duels_won, duels_winrate, dribble_attempts,
+                dribble_success, dribble_past, fouls_drawn, fouls_committed, cards_yellow, cards_yellowred, cards_red,
+                penalties_won, penalties_committed, penalties_scored, penalties_missed, penalties_saved)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (player_id, self.season, competition, appeareances, lineups, minutes_played, position, rating, captain, substitutes_in, substitutes_out,
+                substitutes_bench, shots_total, shots_on_goal, goals, goals_conceded, assists, saves, passes_total, key_passes,
+                passes_accuracy, tackles_total, blocks, interceptions, duels_total, duels_won, duels_winrate, dribble_attempts,
+                dribble_success, dribble_past, fouls_drawn, fouls_commited, cards_yellow, cards_yellowred, cards_red,
+                penalties_won, penalties_commited, penalties_scored, penalties_missed, penalties_saved))
 
 
 def extract_statistics(statistics):
@@ -148,299 +620,5 @@ def extract_statistics(statistics):
         print(e)
 
 
-def update_match_statistic_columns(db_cursor, stat_types):
-    db_cursor.execute("PRAGMA table_info(Match_Statistics)")
-    existing_columns = [column[1] for column in db_cursor.fetchall()]  
-    new_columns = [stat for stat in stat_types if stat not in existing_columns]
-
-    if new_columns:
-        for column in new_columns:
-            try:
-                db_cursor.execute(f"ALTER TABLE Match_Statistics ADD COLUMN {column} REAL")
-            except sqlite3.OperationalError as e:
-                print(e)
-
-
-def save_match_statistics_to_db(fixture_id, stat_types, stat_values):
-    global conn
-    db_cursor = conn.cursor()
-
-    fixture_id = str(fixture_id)
-
-    # Create table if it doesn't exist already
-    stats_columns = ', '.join([f'{stat} REAL' for stat in stat_types])
-    create_match_statistics_table(conn, stats_columns)
-
-    # Add new stat columns to the table if api has introduced new stats for new seasons
-    update_match_statistic_columns(db_cursor, stat_types)
-
-    # Insert the statistics
-    placeholders = ', '.join('?' * len(stat_values))
-    query_insert = f'''
-                    INSERT OR IGNORE INTO Match_Statistics(fixture_id, {', '.join(stat_types)})
-                    VALUES (?, {placeholders})
-                    '''
-    db_cursor.execute(query_insert, [fixture_id] + stat_values)
-
-    conn.commit()
-
-
-def save_match_lineups_to_db(fixture_id): 
-    fixture_id = str(fixture_id)
-    querystring = {"fixture" : fixture_id}
-
-    try:
-        response = requests.request("GET", URL_LINEUPS, headers=HEADERS, params=querystring).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured when requesting from API: {e}")
-        return
-    
-    lineups = response["response"]
-    if (lineups):
-        save_formations_to_matches_table(lineups, fixture_id)
-        save_startingXI_to_db(lineups, fixture_id)
-        save_substitutes_to_db(fixture_id)
-
-
-# Update the formations in the Matches table
-def save_formations_to_matches_table(lineups, fixture_id):
-    try:
-        home_formation = lineups[0]["formation"]
-        away_formation = lineups[1]["formation"]
-    except IndexError as e:
-        return
-
-    global conn
-    db_cursor = conn.cursor()
-    db_cursor.execute('''
-        UPDATE Matches 
-        SET home_team_formation = ?, away_team_formation = ? 
-        WHERE fixture_id = ?
-    ''', (home_formation, away_formation, fixture_id))
-    conn.commit()
-
-
-def is_player_already_in_table(player_id):
-    global conn
-    db_cursor = conn.cursor()
-
-    # check if player_id already exists
-    db_cursor.execute('SELECT * FROM Players WHERE player_id=?', (player_id,))
-    fixture_data = db_cursor.fetchone()
-
-    if fixture_data:
-        return True
-    else:
-        return False
-    
-
-def save_player(player_id, season):
-    querystring = {"id" : player_id, "season": season}
-
-    try:
-        response = requests.request("GET", URL_PLAYERS, headers=HEADERS, params=querystring).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured when requesting from API: {e}")
-        return
-
-    try:
-        player_data = response["response"][0]["player"]
-    except IndexError as e:
-        return
-    
-    player_data = response["response"][0]["player"]
-    player_id = player_data["id"]
-    first_name = player_data["firstname"]
-    last_name = player_data["lastname"]
-    nationality = player_data["nationality"]
-    height = player_data["height"]
-    weight = player_data["weight"]
-    birth_date = player_data["birth"]["date"]
-    try:
-        date_obj = datetime.strptime(birth_date, "%Y-%m-%d")
-        birth_date = date_obj.strftime("%d.%m.%Y")
-    # no birth date found in data
-    except TypeError as e:
-        birth_date = None
-    # sometimes there's an inconsistency in the api football with a different format for the birth date
-    except ValueError as e:
-        date_obj = datetime.strptime(birth_date, "%Y-%d-%m")
-        birth_date = date_obj.strftime("%d.%m.%Y")
-
-    global conn
-    db_cursor = conn.cursor()
-    db_cursor.execute("INSERT OR IGNORE INTO Players (player_id, first_name, last_name, nationality, height, weight, birth_date) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-            (player_id, first_name, last_name, nationality, height, weight, birth_date))
-
-    conn.commit()
-
-
-def save_startingXI_to_db(lineups, fixture_id):
-    global conn
-    db_cursor = conn.cursor()
-
-    # check if fixture_id already exists
-    db_cursor.execute('SELECT * FROM StartingXI WHERE fixture_id=?', (fixture_id,))
-    fixture_data = db_cursor.fetchone()
-    # if fixture is already present in the table, do not insert it again
-    if fixture_data is not None:
-        return
-
-    global all_players_in_season
-    # extract the players who played in the match for each team
-    for i, team in enumerate(["home", "away"]):
-        try:
-            for player in lineups[i]["startXI"]:
-                player_id = player["player"]["id"]
-                position = player["player"]["pos"]
-                position_on_grid = player["player"]["grid"]
-                all_players_in_season.add(player_id)
-
-                query_insert_player = '''
-                                INSERT OR IGNORE INTO StartingXI (fixture_id, player_id, position, position_on_grid, team)
-                                VALUES (?, ?, ?, ?, ?)
-                                '''
-                db_cursor.execute(query_insert_player, [fixture_id, player_id, position, position_on_grid, team])
-        except IndexError as e:
-            continue
-
-    conn.commit()
-
-
-def save_substitutes_to_db(fixture_id):
-    global conn
-    db_cursor = conn.cursor()
-
-    # check if fixture_id already exists
-    db_cursor.execute('SELECT * FROM Substitutes WHERE fixture_id=?', (fixture_id,))
-    fixture_data = db_cursor.fetchone()
-    # if fixture is already present in the table, do not insert it again
-    if fixture_data is not None:
-        return
-
-    querystring = {"fixture" : fixture_id}
-
-    try:
-        response =  requests.request("GET", URL_EVENTS, headers=HEADERS, params=querystring).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured: {e}")
-        return
-
-
-    global all_players_in_season
-    for event in response["response"]:
-        try:
-            if (event['type'] == 'subst'):
-                player_id_subbed_off = event["player"]["id"]
-                player_id_subbed_in = event["assist"]["id"]
-                all_players_in_season.add(player_id_subbed_in)
-                all_players_in_season.add(player_id_subbed_off)
-
-                team_name = event["team"]["name"]
-                time_of_sub = event["time"]["elapsed"]
-                query_insert_home_subs = '''
-                                INSERT OR IGNORE INTO Substitutes (fixture_id, team, player_id_subbed_off, player_id_subbed_in, minute_subbed_in)
-                                VALUES (?, ?, ?, ?, ?)
-                                '''
-                db_cursor.execute(query_insert_home_subs, [fixture_id, team_name, player_id_subbed_off, player_id_subbed_in, time_of_sub])
-        except IndexError as e:
-            continue
-
-    conn.commit()
-
-
-
-def save_player_stats_for_season(player_id, season):
-    querystring = {"id" : player_id, "season": season}
-
-    try:
-        response = requests.request("GET", URL_PLAYERS, headers=HEADERS, params=querystring).json()
-    except requests.exceptions.RequestException as e:
-        print(f"Exception occured when requesting from API: {e}")
-
-    try:
-        player_stats = response["response"][0]["statistics"]
-    except IndexError as e:
-        return
-    
-    for competition_player_data in player_stats:
-        # general comp data
-        competition = competition_player_data["league"]["name"]
-        appeareances = competition_player_data["games"]["appearences"]
-        lineups = competition_player_data["games"]["lineups"]
-        minutes_played = competition_player_data["games"]["minutes"]
-        position = competition_player_data["games"]["position"]
-        rating = competition_player_data["games"]["rating"]
-        captain = competition_player_data["games"]["captain"]
-
-        # sub data
-        substitutes_in = competition_player_data["substitutes"]["in"]
-        substitutes_out = competition_player_data["substitutes"]["out"]
-        substitutes_bench = competition_player_data["substitutes"]["bench"]
-
-        # shots
-        shots_total =  competition_player_data["shots"]["total"]
-        shots_on_goal = competition_player_data["shots"]["on"]
-
-        # goals
-        goals = competition_player_data["goals"]["total"]
-        goals_conceded = competition_player_data["goals"]["conceded"]
-        assists = competition_player_data["goals"]["assists"]
-        saves = competition_player_data["goals"]["saves"]
-
-        # passes
-        passes_total = competition_player_data["passes"]["total"]
-        key_passes = competition_player_data["passes"]["key"]
-        passes_accuracy = competition_player_data["passes"]["accuracy"]
-
-        # tackles
-        tackles_total = competition_player_data["tackles"]["total"]
-        blocks = competition_player_data["tackles"]["blocks"]
-        interceptions = competition_player_data["tackles"]["interceptions"]
-
-        # duels 
-        duels_total = competition_player_data["duels"]["total"]
-        duels_won = competition_player_data["duels"]["won"]
-        duels_winrate = None
-        if (duels_total is not None and duels_won is not None and duels_total != 0):
-            duels_winrate = duels_won / duels_total
-
-        # dribbles
-        dribble_attempts = competition_player_data["dribbles"]["attempts"]
-        dribble_success = competition_player_data["dribbles"]["success"]
-        dribble_past = competition_player_data["dribbles"]["past"]
-
-        # fouls
-        fouls_drawn = competition_player_data["fouls"]["drawn"]
-        fouls_commited = competition_player_data["fouls"]["committed"]
-
-        # cards
-        cards_yellow = competition_player_data["cards"]["yellow"]
-        cards_yellowred = competition_player_data["cards"]["yellowred"]
-        cards_red = competition_player_data["cards"]["red"]
-
-        # penalty
-        penalties_won = competition_player_data["penalty"]["won"]
-        penalties_commited = competition_player_data["penalty"]["commited"]
-        penalties_scored = competition_player_data["penalty"]["scored"]
-        penalties_missed = competition_player_data["penalty"]["missed"]
-        penalties_saved = competition_player_data["penalty"]["saved"]
-
-        global conn
-        db_cursor = conn.cursor()
-        # Insert data into Statistics table
-        db_cursor.execute("""INSERT OR IGNORE INTO Player_Statistics (
-            player_id, season, competition_name, appeareances, lineups, minutes_played, position, rating, captain, substitutes_in, substitutes_out,
-            substitutes_bench, shots_total, shots_on_goal, goals_total, goals_conceded, assists, saves, passes_total, key_passes,
-            passes_accuracy, tackles_total, blocks, interceptions, duels_total, duels_won, duels_winrate, dribble_attempts,
-            dribble_success, dribble_past, fouls_drawn, fouls_committed, cards_yellow, cards_yellowred, cards_red,
-            penalties_won, penalties_committed, penalties_scored, penalties_missed, penalties_saved)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (player_id, season, competition, appeareances, lineups, minutes_played, position, rating, captain, substitutes_in, substitutes_out,
-            substitutes_bench, shots_total, shots_on_goal, goals, goals_conceded, assists, saves, passes_total, key_passes,
-            passes_accuracy, tackles_total, blocks, interceptions, duels_total, duels_won, duels_winrate, dribble_attempts,
-            dribble_success, dribble_past, fouls_drawn, fouls_commited, cards_yellow, cards_yellowred, cards_red,
-            penalties_won, penalties_commited, penalties_scored, penalties_missed, penalties_saved))
-
-        conn.commit()
-        
\ No newline at end of file
+# columns of the Match_Statistics table, read once per process and shared by all sessions
+match_statistics_registry = MatchStatisticsRegistry()
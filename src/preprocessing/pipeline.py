@@ -0,0 +1,187 @@
+import hashlib
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from preprocessing.feature_cache import FeatureCache, get_source_fingerprint, prepare_for_feather
+from db.db_manager import DATABASE_PATH
+
+PIPELINE_CACHE_DIR = 'Data/pipeline_cache'
+
+
+class Stage:
+    """
+    A named node of a pipeline with declared inputs and output.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the stage, used for --from-stage/--until-stage and as cache name.
+    func : Callable
+        Function computing the output, called with the input artifacts in the declared order.
+    inputs : Iterable[str]
+        Names of the artifacts the stage reads.
+    output : str
+        Name of the artifact the stage produces.
+    sources : Iterable[str], optional
+        Database tables the stage reads directly, their fingerprints are part of the cache key.
+    modules : Iterable[str], optional
+        Paths of source files the stage depends on besides its own function.
+    """
+
+    def __init__(self, name, func, inputs, output, sources=(), modules=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.output = output
+        self.sources = tuple(sources)
+        self.modules = tuple(modules)
+
+    def get_code_hash(self):
+        """Returns a hash of the code of the stage function and of the modules it depends on."""
+        code_hash = hashlib.sha256(inspect.getsource(self.func).encode())
+        for module in self.modules:
+            with open(module, 'rb') as file:
+                code_hash.update(file.read())
+        return code_hash.hexdigest()
+
+
+class Pipeline:
+    """
+    Runs stages in order and caches the output of every stage by content hash.
+
+    The key of a stage hashes its code, the keys of its inputs and the fingerprints of the database
+    tables it reads. A change in one stage therefore only invalidates this stage and the stages
+    downstream of it.
+
+    Parameters
+    ----------
+    stages : List[Stage]
+        Stages in execution order, every input has to be produced by an earlier stage.
+    cache_dir : str, optional
+        Directory of the stage outputs.
+    database_path : str, optional
+        Path of the SQLite database the source fingerprints are taken from.
+    """
+
+    def __init__(self, stages, cache_dir=PIPELINE_CACHE_DIR, database_path=DATABASE_PATH):
+        self.stages = list(stages)
+        self.cache_dir = cache_dir
+        self.database_path = database_path
+        self.stage_names = [stage.name for stage in self.stages]
+
+    def get_stage_index(self, name):
+        if name not in self.stage_names:
+            raise ValueError(f"Unknown stage '{name}', expected one of {self.stage_names}.")
+        return self.stage_names.index(name)
+
+    def get_stage_keys(self):
+        """
+        Computes the cache key of every stage.
+
+        Returns
+        -------
+        dict
+            A mapping from stage name to cache key.
+        """
+        all_sources = sorted({source for stage in self.stages for source in stage.sources})
+        fingerprints = get_source_fingerprint(self.database_path, all_sources) if all_sources else {}
+
+        artifact_keys = {}
+        stage_keys = {}
+        for stage in self.stages:
+            key_content = {
+                'name': stage.name,
+                'code': stage.get_code_hash(),
+                'inputs': [artifact_keys[artifact] for artifact in stage.inputs],
+                'sources': {source: fingerprints[source] for source in stage.sources},
+            }
+            stage_keys[stage.name] = hashlib.sha256(json.dumps(key_content, sort_keys=True).encode()).hexdigest()[:16]
+            artifact_keys[stage.output] = stage_keys[stage.name]
+        return stage_keys
+
+    def run(self, from_stage=None, until_stage=None, use_cache=True):
+        """
+        Runs the pipeline and returns the output of the last executed stage.
+
+        Parameters
+        ----------
+        from_stage : str, optional
+            Stage from which on all stages are recomputed even if a cached output exists.
+            Upstream stages are loaded from the cache if possible.
+        until_stage : str, optional
+            Last stage to run, by default the last stage of the pipeline.
+        use_cache : bool, optional
+            Whether to read and write stage outputs from the cache, by default True.
+
+        Returns
+        -------
+        pd.DataFrame
+            The output of the last executed stage.
+        """
+        first_forced = self.get_stage_index(from_stage) if from_stage else len(self.stages)
+        last = self.get_stage_index(until_stage) if until_stage else len(self.stages) - 1
+        stages = self.stages[:last + 1]
+
+        stage_keys = self.get_stage_keys() if use_cache else {}
+
+        artifacts = {}
+        report = []
+        for i, stage in enumerate(stages):
+            cache = self._get_cache(stage)
+            if use_cache and i < first_forced and cache.contains(stage_keys[stage.name]):
+                # cached outputs are only loaded when a later stage that is recomputed needs them
+                report.append((stage.name, 'cached', 0.0, 0))
+                continue
+
+            inputs = [self._get_artifact(artifacts, artifact, stage_keys) for artifact in stage.inputs]
+            output, duration, peak_memory = self._run_stage(stage, inputs)
+            if use_cache:
+                # continue with the stored types, such that a cached and a fresh run give the same result
+                output = prepare_for_feather(output)
+                cache.save(output, stage_keys[stage.name])
+            artifacts[stage.output] = output
+            report.append((stage.name, 'computed', duration, peak_memory))
+
+        print_stage_report(report)
+        return self._get_artifact(artifacts, stages[-1].output, stage_keys)
+
+    def _get_cache(self, stage):
+        return FeatureCache(name=stage.name, cache_dir=self.cache_dir, database_path=self.database_path)
+
+    def _get_artifact(self, artifacts, artifact, stage_keys):
+        if artifact not in artifacts:
+            producer = next(stage for stage in self.stages if stage.output == artifact)
+            artifacts[artifact] = self._get_cache(producer).load(stage_keys[producer.name])
+        return artifacts[artifact]
+
+    def _run_stage(self, stage, inputs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            output = stage.func(*inputs)
+            duration = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return output, duration, peak_memory
+
+
+def print_stage_report(report):
+    """
+    Prints the status, duration and peak memory of every stage.
+
+    Parameters
+    ----------
+    report : List[Tuple[str, str, float, int]]
+        Name, status ('cached' or 'computed'), duration in seconds and peak memory in bytes of every stage.
+    """
+    name_width = max(len(name) for name, _, _, _ in report)
+    for name, status, duration, peak_memory in report:
+        print(f"{name:<{name_width}}  {status:<8}  {duration:8.2f}s  {peak_memory / 2**20:10.1f} MiB peak")
+
+
+def get_module_path(module_name):
+    """Returns the path of a module of the preprocessing package."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), module_name)
@@ -0,0 +1,139 @@
+import pandas as pd
+import numpy as np
+
+RATING_AGGREGATIONS = ('mean', 'max', 'min', 'std')
+
+# positions of the starting XI as delivered by API-Football mapped to the line of the player
+POSITION_LINES = {'G': 'gk', 'D': 'def', 'M': 'mid', 'F': 'fwd'}
+
+
+def get_rating_column_name(team, aggregation):
+    """
+    Returns the name of an aggregated rating column.
+
+    The mean keeps the name 'home_rating_aggregate'/'away_rating_aggregate' used by the models.
+
+    Parameters
+    ----------
+    team : str
+        'home' or 'away'.
+    aggregation : str
+        Name of the aggregation (e.g. 'mean', 'std') or of the position line (e.g. 'gk', 'def').
+
+    Returns
+    -------
+    str
+        The name of the rating column.
+    """
+    if aggregation == 'mean':
+        return f'{team}_rating_aggregate'
+    return f'{team}_rating_{aggregation}'
+
+
+def get_player_card_ratings(df_fifa_stats):
+    """
+    Builds a compact, sorted index of all FIFA cards with their validity date and overall rating.
+
+    Parameters
+    ----------
+    df_fifa_stats : pd.DataFrame
+        DataFrame of the 'FIFA_Player_Statistics' table with at least the columns 'player_id',
+        'date_fifa_card' and 'overall_rating'.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with the columns 'player_id', 'card_date' and 'overall_rating' (float32), sorted by
+        card_date. Cards without a parsable date are dropped.
+    """
+    df_cards = pd.DataFrame({
+        'player_id': df_fifa_stats['player_id'].astype(str),
+        'card_date': pd.to_datetime(df_fifa_stats['date_fifa_card'], format='mixed', dayfirst=True, errors='coerce'),
+        'overall_rating': pd.to_numeric(df_fifa_stats['overall_rating'], errors='coerce').astype('float32'),
+    })
+    return df_cards.dropna(subset=['card_date']).sort_values('card_date', kind='stable').reset_index(drop=True)
+
+
+def attach_player_ratings_as_of(df_starting_xi, df_cards, df_fixture_dates, direction='backward'):
+    """
+    Joins the starting XI with the rating of the FIFA card that was valid on the date of each match.
+
+    Uses a sorted `merge_asof` on the match date, grouped by player, so for players with many cards
+    the latest card released before the match is taken instead of the last card overall. Player ids
+    are factorized to integer codes to keep the join keys small.
+
+    Parameters
+    ----------
+    df_starting_xi : pd.DataFrame
+        DataFrame with the columns 'fixture_id', 'player_id', 'position' and 'team'.
+    df_cards : pd.DataFrame
+        Sorted card index as returned by `get_player_card_ratings`.
+    df_fixture_dates : pd.DataFrame
+        DataFrame with the columns 'fixture_id' and 'match_date'.
+    direction : str, optional
+        Direction of the as-of join, by default 'backward' (only cards released on or before the
+        match date). 'nearest' takes the card closest to the match date, which may be released after it.
+
+    Returns
+    -------
+    pd.DataFrame
+        The starting XI with an additional 'overall_rating' column, NaN for players without a valid card.
+    """
+    df_dates = df_fixture_dates[['fixture_id', 'match_date']].drop_duplicates('fixture_id')
+    if not pd.api.types.is_datetime64_any_dtype(df_dates['match_date']):
+        df_dates = df_dates.assign(match_date=pd.to_datetime(df_dates['match_date'], format='%d.%m.%Y'))
+    # merge_asof requires both date keys to have the same resolution
+    df_dates = df_dates.astype({'match_date': 'datetime64[ns]'})
+
+    df_lineups = df_starting_xi[['fixture_id', 'team', 'player_id', 'position']].merge(df_dates, on='fixture_id', how='inner')
+
+    # shared integer codes for the player ids of both sides of the join
+    lineup_player_ids = df_lineups['player_id'].astype(str).to_numpy()
+    player_codes, _ = pd.factorize(np.concatenate([lineup_player_ids, df_cards['player_id'].to_numpy()]))
+    df_lineups['player_code'] = player_codes[:len(df_lineups)]
+    df_card_codes = pd.DataFrame({
+        'player_code': player_codes[len(df_lineups):],
+        'card_date': df_cards['card_date'].to_numpy(dtype='datetime64[ns]'),
+        'overall_rating': df_cards['overall_rating'].to_numpy(),
+    })
+
+    df_lineups = df_lineups.sort_values('match_date', kind='stable')
+    df_lineup_ratings = pd.merge_asof(df_lineups, df_card_codes, left_on='match_date', right_on='card_date',
+                                      by='player_code', direction=direction)
+    return df_lineup_ratings.drop(columns=['player_code', 'card_date'])
+
+
+def aggregate_lineup_ratings(df_lineup_ratings, aggregations=RATING_AGGREGATIONS, by_line=True):
+    """
+    Aggregates the player ratings per fixture and team in a single groupby.
+
+    Parameters
+    ----------
+    df_lineup_ratings : pd.DataFrame
+        Long-format DataFrame of the starting XI with the columns 'fixture_id', 'team', 'position'
+        and 'overall_rating'.
+    aggregations : Iterable[str], optional
+        Aggregations of the ratings of all players of a team, by default mean, max, min and std.
+    by_line : bool, optional
+        Whether to add the mean rating per position line (GK/DEF/MID/FWD), by default True.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with one row per fixture_id and one column per team and aggregation,
+        e.g. 'home_rating_aggregate', 'away_rating_max' or 'home_rating_def'.
+    """
+    df = df_lineup_ratings.assign(line=df_lineup_ratings['position'].map(POSITION_LINES))
+
+    agg_spec = {aggregation: ('overall_rating', aggregation) for aggregation in aggregations}
+    if by_line:
+        for line in POSITION_LINES.values():
+            agg_spec[line] = (f'rating_{line}', 'mean')
+            df[f'rating_{line}'] = df['overall_rating'].where(df['line'] == line)
+
+    df_aggregated = df.groupby(['fixture_id', 'team']).agg(**agg_spec).unstack('team')
+
+    # flatten (aggregation, team) columns to e.g. home_rating_max
+    df_aggregated.columns = [get_rating_column_name(team, aggregation) for aggregation, team in df_aggregated.columns]
+    ordered_columns = [get_rating_column_name(team, aggregation) for team in ('home', 'away') for aggregation in agg_spec]
+    return df_aggregated.reindex(columns=ordered_columns).reset_index()
@@ -0,0 +1,178 @@
+import json
+
+# data requested per fixture, mapped to the table that holds it
+FIXTURE_SYNC_TABLES = {
+    'statistics': 'Match_Statistics',
+    'lineups': 'StartingXI',
+    'events': 'Substitutes',
+}
+PLAYER_STATS_TARGET = 'player_stats'
+SEASON_TARGET = 'season'
+
+CHECKPOINT_INSERT_QUERY = "INSERT OR REPLACE INTO Sync_Checkpoints (target, key, season) VALUES (?, ?, ?)"
+
+
+def get_checkpointed_keys(conn, target, season):
+    """
+    Returns the keys of all completed requests of a target and season.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    target : str
+        The synced data, e.g. 'lineups' or 'player_stats'.
+    season : int
+        The season.
+
+    Returns
+    -------
+    set
+        The fixture ids or player ids as strings.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute("SELECT key FROM Sync_Checkpoints WHERE target = ? AND season = ?", (target, int(season)))
+    return {row[0] for row in db_cursor.fetchall()}
+
+
+def get_stored_fixture_ids(conn, table_name, fixture_ids):
+    """
+    Returns the fixtures of a list that already have rows in a table.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    table_name : str
+        The name of a table with a fixture_id column.
+    fixture_ids : Iterable[str]
+        The fixture ids to check.
+
+    Returns
+    -------
+    set
+        The stored fixture ids as strings.
+    """
+    db_cursor = conn.cursor()
+    # the ids are passed as one JSON array instead of one placeholder per fixture
+    db_cursor.execute(f"SELECT DISTINCT fixture_id FROM {table_name} WHERE fixture_id IN (SELECT value FROM json_each(?))",
+                      (json.dumps([str(fixture_id) for fixture_id in fixture_ids]),))
+    return {str(row[0]) for row in db_cursor.fetchall()}
+
+
+def plan_fixture_sync(conn, fixture_ids, season, unfinished_fixture_ids=()):
+    """
+    Diffs the fixtures of a season against the data already held in the database.
+
+    A fixture is up to date for a target if its table already has rows for it or if an earlier run
+    has checkpointed the request, e.g. because the API has no lineups for the fixture. Fixtures that
+    are not finished yet are always requested again.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    fixture_ids : Iterable[str]
+        The fixtures of the season.
+    season : int
+        The season.
+    unfinished_fixture_ids : Iterable[str], optional
+        Fixtures that are not finished yet.
+
+    Returns
+    -------
+    dict
+        A mapping from target ('statistics', 'lineups', 'events') to the fixtures to request. The
+        events are requested only for fixtures that have lineups, see `get_fixtures_with_lineups`.
+    """
+    fixture_ids = [str(fixture_id) for fixture_id in fixture_ids]
+    unfinished_fixture_ids = set(unfinished_fixture_ids)
+
+    plan = {}
+    for target, table_name in FIXTURE_SYNC_TABLES.items():
+        done = get_stored_fixture_ids(conn, table_name, fixture_ids) | get_checkpointed_keys(conn, target, season)
+        plan[target] = [fixture_id for fixture_id in fixture_ids if fixture_id not in done or fixture_id in unfinished_fixture_ids]
+    return plan
+
+
+def get_fixtures_with_lineups(conn, fixture_ids):
+    """Returns the fixtures of a list whose starting XI is stored."""
+    return get_stored_fixture_ids(conn, 'StartingXI', fixture_ids)
+
+
+def get_season_player_ids(conn, fixture_ids):
+    """
+    Returns all players of the starting XIs and substitutions of the given fixtures.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    fixture_ids : Iterable[str]
+        The fixtures of the season.
+
+    Returns
+    -------
+    set
+        The API ids of the players.
+    """
+    db_cursor = conn.cursor()
+    db_cursor.execute('''
+        WITH season_fixtures AS (SELECT value AS fixture_id FROM json_each(?))
+        SELECT player_id FROM StartingXI WHERE fixture_id IN season_fixtures
+        UNION
+        SELECT player_id_subbed_in FROM Substitutes WHERE fixture_id IN season_fixtures
+        UNION
+        SELECT player_id_subbed_off FROM Substitutes WHERE fixture_id IN season_fixtures
+    ''', (json.dumps([str(fixture_id) for fixture_id in fixture_ids]),))
+    return {int(row[0]) for row in db_cursor.fetchall() if row[0] is not None}
+
+
+def plan_player_sync(conn, fixture_ids, season, new_players=()):
+    """
+    Returns the players of a season whose statistics are neither stored nor checkpointed.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    fixture_ids : Iterable[str]
+        The fixtures of the season.
+    season : int
+        The season.
+    new_players : Iterable[int], optional
+        Players of lineups and substitutions that are not written to the database yet.
+
+    Returns
+    -------
+    list
+        The API ids of the players to request.
+    """
+    players = get_season_player_ids(conn, fixture_ids) | {int(player) for player in new_players}
+
+    db_cursor = conn.cursor()
+    db_cursor.execute("SELECT DISTINCT player_id FROM Player_Statistics WHERE season = ?", (int(season),))
+    done = {int(row[0]) for row in db_cursor.fetchall()}
+    done |= {int(key) for key in get_checkpointed_keys(conn, PLAYER_STATS_TARGET, season)}
+    return sorted(players - done)
+
+
+def is_season_synced(conn, competition_name, season):
+    """
+    Returns whether all data of a finished season has been retrieved by an earlier run.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+    competition_name : str
+        The name of the competition.
+    season : int
+        The season.
+
+    Returns
+    -------
+    bool
+        True if the season is checkpointed as completely synced.
+    """
+    return competition_name in get_checkpointed_keys(conn, SEASON_TARGET, season)
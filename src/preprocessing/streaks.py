@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+
+STREAK_KINDS = ('winning', 'unbeaten', 'losing', 'clean_sheet')
+STREAK_SCOPES = ('venue', 'overall')
+
+
+def get_streak_flags(kind, goals_for, goals_against):
+    """
+    Returns for every appearance of a team whether it extends a streak of the given kind.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of streak: 'winning', 'unbeaten', 'losing' or 'clean_sheet'.
+    goals_for : np.ndarray
+        Goals scored by the team.
+    goals_against : np.ndarray
+        Goals conceded by the team.
+
+    Returns
+    -------
+    np.ndarray
+        Boolean array, True if the appearance extends the streak and False if it resets it.
+    """
+    if kind == 'winning':
+        return goals_for > goals_against
+    elif kind == 'unbeaten':
+        return goals_for >= goals_against
+    elif kind == 'losing':
+        return goals_for < goals_against
+    elif kind == 'clean_sheet':
+        return goals_against == 0
+    raise ValueError(f"Unknown streak kind '{kind}', expected one of {STREAK_KINDS}.")
+
+
+def compute_streaks_before(segment_codes, flags):
+    """
+    Computes the length of the streak each row starts with, using cumulative sums only.
+
+    The rows must be ordered chronologically within each segment and all rows of a segment must
+    be contiguous. The streak of a row counts the consecutive flagged rows directly preceding it
+    within its segment.
+
+    Parameters
+    ----------
+    segment_codes : np.ndarray
+        Integer code of the segment (e.g. team and season) of every row.
+    flags : np.ndarray
+        Boolean array, True if the row extends the streak.
+
+    Returns
+    -------
+    np.ndarray
+        Integer array with the streak length before every row.
+    """
+    n_rows = len(flags)
+    if n_rows == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    flags = flags.astype(np.int64)
+    segment_start = np.empty(n_rows, dtype=bool)
+    segment_start[0] = True
+    segment_start[1:] = segment_codes[1:] != segment_codes[:-1]
+
+    # streak length including the current row: wins since the last reset point
+    cumulative = np.cumsum(flags)
+    is_reset = (flags == 0) | segment_start
+    base = np.where(is_reset, cumulative - flags, 0)
+    streak_after = cumulative - np.maximum.accumulate(base)
+
+    # the streak a row starts with is the streak after the previous row of the same segment
+    streak_before = np.zeros(n_rows, dtype=np.int64)
+    streak_before[1:] = streak_after[:-1]
+    streak_before[segment_start] = 0
+    return streak_before
+
+
+def compute_team_streaks(home_codes, away_codes, seasons, home_goals, away_goals, kinds=('winning',), scope='venue'):
+    """
+    Computes streaks for the home and away teams of chronologically ordered matches.
+
+    A streak is reset whenever the flag of a match is False or a team starts a new season. With
+    scope 'venue' the home streak only counts home matches and the away streak only counts away
+    matches, with scope 'overall' both count every match of the team.
+
+    Parameters
+    ----------
+    home_codes : np.ndarray
+        Factorized integer codes of the home teams.
+    away_codes : np.ndarray
+        Factorized integer codes of the away teams, using the same codes as the home teams.
+    seasons : np.ndarray
+        Season of every match.
+    home_goals : np.ndarray
+        Goals of the home teams.
+    away_goals : np.ndarray
+        Goals of the away teams.
+    kinds : Iterable[str], optional
+        Kinds of streaks to compute, by default only 'winning'.
+    scope : str, optional
+        'venue' or 'overall', by default 'venue'.
+
+    Returns
+    -------
+    Dict[str, Tuple[np.ndarray, np.ndarray]]
+        A mapping from streak kind to the home and away streak arrays.
+    """
+    if scope not in STREAK_SCOPES:
+        raise ValueError(f"Unknown streak scope '{scope}', expected one of {STREAK_SCOPES}.")
+
+    n_matches = len(home_codes)
+    n_teams = max(home_codes.max(initial=-1), away_codes.max(initial=-1)) + 1
+
+    # long format: one row per team appearance, home appearances first
+    team_codes = np.concatenate([home_codes, away_codes])
+    venue = np.repeat([0, 1], n_matches)
+    match_order = np.tile(np.arange(n_matches), 2)
+    goals_for = np.concatenate([home_goals, away_goals])
+    goals_against = np.concatenate([away_goals, home_goals])
+    season_codes = pd.factorize(np.concatenate([seasons, seasons]))[0]
+
+    # key identifying the team (and venue) a streak belongs to
+    team_keys = team_codes if scope == 'overall' else team_codes + venue * n_teams
+    order = np.lexsort((match_order, team_keys))
+
+    # a new segment starts whenever the team changes or its season differs from its previous match
+    sorted_keys = team_keys[order]
+    sorted_seasons = season_codes[order]
+    new_segment = np.ones(len(order), dtype=bool)
+    new_segment[1:] = (sorted_keys[1:] != sorted_keys[:-1]) | (sorted_seasons[1:] != sorted_seasons[:-1])
+    segment_codes = np.cumsum(new_segment)
+
+    streaks = {}
+    for kind in kinds:
+        flags = get_streak_flags(kind, goals_for[order], goals_against[order])
+        streak_before = np.empty(len(order), dtype=np.int64)
+        streak_before[order] = compute_streaks_before(segment_codes, flags)
+        streaks[kind] = (streak_before[:n_matches], streak_before[n_matches:])
+
+    return streaks
+
+
+def get_streak_column_names(kind, scope='venue'):
+    """
+    Returns the names of the home and away columns of a streak.
+
+    Parameters
+    ----------
+    kind : str
+        The kind of streak.
+    scope : str, optional
+        'venue' or 'overall', by default 'venue'.
+
+    Returns
+    -------
+    Tuple[str, str]
+        The home and away column names, e.g. 'home_winning_streak' and 'away_winning_streak'.
+    """
+    suffix = '' if scope == 'venue' else f'_{scope}'
+    return f'home_{kind}_streak{suffix}', f'away_{kind}_streak{suffix}'
+
+
+def compute_streak_features(df, kinds=('winning',), scopes=('venue',)):
+    """
+    Computes streak features for a DataFrame of matches sorted by date.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        DataFrame with matches data sorted by date, including the columns 'home_team', 'away_team',
+        'season', 'home_goals' and 'away_goals'.
+    kinds : Iterable[str], optional
+        Kinds of streaks to compute, by default only 'winning'.
+    scopes : Iterable[str], optional
+        Scopes of the streaks ('venue' and/or 'overall'), by default only 'venue'.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with the same index as the input and one home and one away column per streak kind and scope.
+    """
+    team_codes, _ = pd.factorize(pd.concat([df['home_team'], df['away_team']], ignore_index=True))
+    home_codes, away_codes = team_codes[:len(df)], team_codes[len(df):]
+    home_goals = df['home_goals'].to_numpy()
+    away_goals = df['away_goals'].to_numpy()
+    seasons = df['season'].to_numpy()
+
+    features = {}
+    for scope in scopes:
+        streaks = compute_team_streaks(home_codes, away_codes, seasons, home_goals, away_goals, kinds=kinds, scope=scope)
+        for kind, (home_streak, away_streak) in streaks.items():
+            home_column, away_column = get_streak_column_names(kind, scope)
+            features[home_column] = home_streak.astype(float)
+            features[away_column] = away_streak.astype(float)
+
+    return pd.DataFrame(features, index=df.index)
@@ -1,31 +1,143 @@
+import threading
+from urllib.parse import urlsplit
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
 from db.db_manager import connect_db, close_db
+from db.response_cache import CacheMissError, get_default_response_cache
 from fake_useragent import UserAgent
 
+# scraped pages are cached for a week by default
+DEFAULT_PAGE_TTL = 7 * 24 * 3600
+# maximum number of parallel requests to the same host, shared by all scrapers of the process
+DEFAULT_HOST_CONCURRENCY = 4
+# limits of hosts that differ from the default, see set_host_concurrency
+HOST_CONCURRENCY = {}
+# number of keep-alive connections kept open per host
+HTTP_POOL_SIZE = 16
+REQUEST_TIMEOUT = 30
+
+_http_session = None
+_host_semaphores = {}
+_http_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Returns the HTTP session shared by all scrapers of the process.
+
+    The session keeps connections alive, so consecutive requests to a host (e.g. sofifa.com) reuse
+    the TCP and TLS connection instead of paying a new handshake for every page.
+    """
+    global _http_session
+    with _http_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            _http_session.mount('https://', adapter)
+            _http_session.mount('http://', adapter)
+        return _http_session
+
+
+def set_host_concurrency(host, concurrency):
+    """
+    Sets the maximum number of parallel requests to a host, shared by all scrapers of the process.
+
+    Parameters
+    ----------
+    host : str
+        The host, e.g. 'sofifa.com'.
+    concurrency : int
+        Maximum number of parallel requests.
+
+    Raises
+    ------
+    ValueError
+        If the host already has another limit, e.g. because it has been requested with the default limit.
+    """
+    with _http_lock:
+        current = HOST_CONCURRENCY.setdefault(host, concurrency)
+        if current != concurrency:
+            raise ValueError(f"The concurrency of {host} is already set to {current}")
+
+
+def get_host_semaphore(url):
+    """
+    Returns the semaphore limiting the parallel requests to the host of a URL.
+
+    All scrapers share one semaphore per host, its limit is taken from HOST_CONCURRENCY.
+    """
+    host = urlsplit(url).netloc
+    with _http_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(HOST_CONCURRENCY.setdefault(host, DEFAULT_HOST_CONCURRENCY))
+        return _host_semaphores[host]
+
 
 class Scraper:
     HEADERS = {'User-Agent': UserAgent().chrome}
 
-    def __init__(self):
-        self.conn = connect_db()
+    def __init__(self, response_cache=None, rate_limiter=None):
+        # the database connection is opened on first use, scrapers that only read pages never open it
+        self._conn = None
+        # False disables the cache
+        self.response_cache = get_default_response_cache() if response_cache is None else response_cache
+        # limits the rate of the requests sent to the network, pages served from the cache are not limited
+        self.rate_limiter = rate_limiter
+
+    @property
+    def conn(self):
+        """The database connection, opened on first access."""
+        if self._conn is None:
+            self._conn = connect_db()
+        return self._conn
+
+    def get_soup(self, url, ttl=DEFAULT_PAGE_TTL):
+        """Fetches and parses HTML content from a URL, pages are served from the response cache if possible."""
+        html = self.get_html(url, ttl)
+        if html is None:
+            return None
+        return BeautifulSoup(html, 'lxml')
+
+    def get_html(self, url, ttl=DEFAULT_PAGE_TTL):
+        """Fetches the HTML content of a URL and caches it for ttl seconds."""
+        if self.response_cache:
+            try:
+                body = self.response_cache.get(url)
+            except CacheMissError as e:
+                print(e)
+                return None
+            if body is not None:
+                return body.decode('utf-8')
 
-    def get_soup(self, url):
-        """Fetches and parses HTML content from a URL."""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
         try:
-            response = requests.get(url, headers=self.HEADERS)
+            with get_host_semaphore(url):
+                response = get_http_session().get(url, headers=self.HEADERS, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
-            return BeautifulSoup(response.text, 'html.parser')
         except requests.exceptions.RequestException as e:
             print(f"Request failed: {e}")
             return None
 
+        if self.response_cache:
+            self.response_cache.set(url, None, response.text.encode('utf-8'), ttl)
+        return response.text
+
     def save_to_db(self, query, data):
         """Executes an insert or update query with provided data."""
         cursor = self.conn.cursor()
         cursor.execute(query, data)
         self.conn.commit()
 
+    def save_many_to_db(self, query, rows):
+        """Executes an insert or update query once per row of data in a single transaction."""
+        cursor = self.conn.cursor()
+        cursor.executemany(query, rows)
+        self.conn.commit()
+
     def close_connection(self):
-        """Closes the database connection."""
-        close_db(self.conn)
+        """Closes the database connection if it has been opened."""
+        if self._conn is not None:
+            close_db(self._conn)
+            self._conn = None
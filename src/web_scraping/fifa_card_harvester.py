@@ -0,0 +1,216 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from lxml import html
+from base_scraper import Scraper
+from fifa_player_scraper import FIFAPlayerScraper, SOFIFA_BASE_URL, get_sofifa_player_id, get_sofifa_rate_limiter
+
+DEFAULT_N_WORKERS = 4
+
+# links to the cards of a player, e.g. /player/158023/lionel-messi/230045/
+CARD_LINK_REGEX = re.compile(r'^/player/(\d+)/([^/?#]+)/(\d{6})/?')
+CARD_DATE_FORMATS = ('%b %d, %Y', '%d %b %Y')
+
+# labels of the player attributes on a card page, mapped to the columns of FIFA_Player_Statistics
+PLAYER_INFO_COLUMNS = {
+    'overall rating': 'overall_rating',
+    'potential': 'potential',
+    'preferred foot': 'preferred_foot',
+    'weak foot': 'weak_foot',
+    'skill moves': 'skill_moves',
+    'work rate': 'work_rate',
+    'body type': 'body_type',
+    'best position': 'best_position',
+    'best overall rating': 'best_overall_rating',
+}
+
+CARD_INSERT_QUERY = """
+INSERT OR IGNORE INTO FIFA_Player_Statistics
+(player_id, overall_rating, potential, preferred_foot, weak_foot,
+skill_moves, work_rate, body_type, best_position, best_overall_rating,
+positions, stats, fifa_version, date_fifa_card)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _has_class_prefix(element, prefix):
+    return (element.get('class') or '').startswith(prefix)
+
+
+def _has_class(element, class_name):
+    return class_name in (element.get('class') or '').split()
+
+
+def get_fifa_version(roster_id):
+    """Returns the FIFA version of a card update, e.g. 'FIFA 23' for 230045, None for unknown versions."""
+    for fifa_version, (first_roster_id, last_roster_id) in FIFAPlayerScraper.DATE_URL_COMPONENT_FIFA_VERSION.items():
+        if first_roster_id <= roster_id <= last_roster_id:
+            return fifa_version
+    return None
+
+
+def parse_card_date(text):
+    """Converts the displayed date of a card to 'dd.mm.yyyy', None if the text is no date."""
+    text = text.strip()
+    for date_format in CARD_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).strftime('%d.%m.%Y')
+        except ValueError:
+            continue
+    return None
+
+
+def discover_card_versions(page_source, player_id=None):
+    """
+    Returns all cards of a player linked from the version selection of a sofifa profile page.
+
+    Parameters
+    ----------
+    page_source : str
+        The HTML of the profile page.
+    player_id : str, optional
+        The sofifa id of the player, links to cards of other players are ignored.
+
+    Returns
+    -------
+    list
+        One dict per card with the keys 'fifa_version', 'date_fifa_card' and 'url'. Links without a
+        date are skipped, the date is part of the key of the stored cards.
+    """
+    cards = {}
+    for link in html.fromstring(page_source).iter('a'):
+        match = CARD_LINK_REGEX.match(link.get('href') or '')
+        if match is None or (player_id is not None and match.group(1) != str(player_id)):
+            continue
+        roster_id = match.group(3)
+        fifa_version = get_fifa_version(roster_id)
+        date_fifa_card = parse_card_date(link.text_content())
+        if fifa_version is None or date_fifa_card is None or roster_id in cards:
+            continue
+        cards[roster_id] = {
+            'fifa_version': fifa_version,
+            'date_fifa_card': date_fifa_card,
+            'url': f"{SOFIFA_BASE_URL}/player/{match.group(1)}/{match.group(2)}/{roster_id}/",
+        }
+    return list(cards.values())
+
+
+def parse_card_page(page_source):
+    """
+    Extracts the player attributes, position ratings and skill stats of a card page in a single walk of the tree.
+
+    Parameters
+    ----------
+    page_source : str
+        The HTML of the card page.
+
+    Returns
+    -------
+    tuple
+        The player attributes as {label: value} with lowercased labels, the position ratings as
+        {position: rating} and the skill stats as {stat: value}.
+    """
+    player_info, position_ratings, skill_stats = {}, {}, {}
+
+    for element in html.fromstring(page_source).iter('div', 'li'):
+        if element.tag == 'div':
+            if _has_class(element, 'block-quarter'):
+                span = next((span for span in element.iter('span') if _has_class(span, 'bp3-tag')), None)
+                sub_div = next((div for div in element.iter('div') if _has_class(div, 'sub')), None)
+                if span is not None and sub_div is not None:
+                    player_info[sub_div.text_content().strip().lower()] = span.text_content().strip()
+            elif _has_class_prefix(element, 'bp3-tag p'):
+                parts = [text.strip() for text in element.itertext() if text.strip()]
+                if len(parts) >= 2:
+                    position_ratings[parts[0]] = re.sub(r'\+\d$', '', parts[-1])
+        else:
+            label = element.find('label')
+            if label is not None:
+                # attributes such as the preferred foot are listed as <li><label>Preferred foot</label> Left</li>
+                value = element.text_content().replace(label.text_content(), '', 1).strip()
+                player_info.setdefault(label.text_content().strip().lower(), value)
+            stat_value = next((span for span in element.iter('span') if _has_class(span, 'bp3-tag')), None)
+            stat_name = next((span for span in element.iter('span') if span.get('role') == 'tooltip'), None)
+            if stat_value is not None and stat_name is not None:
+                skill_stats[stat_name.text_content()] = stat_value.text_content()
+
+    return player_info, position_ratings, skill_stats
+
+
+class FIFACardHarvester(Scraper):
+    """
+    Harvests all FIFA cards of players from their sofifa profile pages.
+
+    The cards of a player are discovered from the version selection of one profile page. Only the
+    cards that are not stored yet are fetched, concurrently within the polite rate limit for
+    sofifa.com shared with the crawler, and all cards of the player are inserted in a single
+    transaction. Pages served from the response cache do not count against the rate limit.
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of card pages fetched in parallel.
+    rate_limiter : TokenBucket, optional
+        The rate limit of the requests, by default the one shared by all sofifa scrapers of the process.
+    response_cache : ResponseCache or bool, optional
+        The cache of the fetched pages, False disables it.
+    """
+
+    def __init__(self, n_workers=DEFAULT_N_WORKERS, rate_limiter=None, response_cache=None):
+        super().__init__(response_cache=response_cache, rate_limiter=rate_limiter if rate_limiter is not None else get_sofifa_rate_limiter())
+        self.n_workers = n_workers
+
+    def get_stored_card_dates(self, player_id):
+        """Returns the dates of the stored cards of a player."""
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT date_fifa_card FROM FIFA_Player_Statistics WHERE player_id = ?", (str(player_id),))
+        return {row[0] for row in db_cursor.fetchall()}
+
+    def harvest(self, player_id, player_url):
+        """
+        Stores the missing cards of a player.
+
+        Parameters
+        ----------
+        player_id : str
+            The API id of the player.
+        player_url : str
+            The URL of the sofifa profile of the player.
+
+        Returns
+        -------
+        int
+            The number of inserted cards.
+        """
+        profile_page = self.get_html(player_url)
+        if profile_page is None:
+            return 0
+
+        # the profile page also links to teammates and similar players, only the cards of the player are kept
+        sofifa_player_id = get_sofifa_player_id(player_url)
+        if sofifa_player_id is None:
+            print(f"No sofifa player id in {player_url}")
+            return 0
+
+        stored_card_dates = self.get_stored_card_dates(player_id)
+        cards = [card for card in discover_card_versions(profile_page, sofifa_player_id) if card['date_fifa_card'] not in stored_card_dates]
+        if not cards:
+            return 0
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            rows = list(executor.map(lambda card: self.get_card_row(player_id, card), cards))
+        rows = [row for row in rows if row is not None]
+        self.save_many_to_db(CARD_INSERT_QUERY, rows)
+        return len(rows)
+
+    def get_card_row(self, player_id, card):
+        """Fetches a card page and returns its row of FIFA_Player_Statistics, None if the page could not be fetched."""
+        page_source = self.get_html(card['url'])
+        if page_source is None:
+            return None
+        player_info, position_ratings, skill_stats = parse_card_page(page_source)
+        values = {column: player_info.get(label) for label, column in PLAYER_INFO_COLUMNS.items()}
+        return (str(player_id), values['overall_rating'], values['potential'], values['preferred_foot'], values['weak_foot'],
+                values['skill_moves'], values['work_rate'], values['body_type'], values['best_position'], values['best_overall_rating'],
+                json.dumps(position_ratings), json.dumps({'stats': skill_stats}), card['fifa_version'], card['date_fifa_card'])
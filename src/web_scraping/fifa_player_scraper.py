@@ -1,8 +1,34 @@
 from base_scraper import Scraper
 from datetime import datetime
+from urllib.parse import urlencode
+import sys
+import threading
+from db.fixture_resolver import normalize_team_name
+from preprocessing.api_football_client import TokenBucket
 import re
 import json
 
+SOFIFA_BASE_URL = "https://sofifa.com"
+# polite request rate for sofifa.com, shared by the crawler and the card harvester
+SOFIFA_REQUESTS_PER_SECOND = 2.0
+SOFIFA_PLAYER_URL_REGEX = re.compile(r'/player/(\d+)/')
+
+_sofifa_rate_limiter = None
+_sofifa_rate_limiter_lock = threading.Lock()
+
+# query of FIFAPlayerScraper.get_teams_for_season
+TEAMS_FOR_SEASON_QUERY = """
+SELECT DISTINCT M.home_team 
+FROM Matches M 
+INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
+WHERE S.player_id = ? AND M.season = ? AND S.team = 'home'
+UNION
+SELECT DISTINCT M.away_team 
+FROM Matches M 
+INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
+WHERE S.player_id = ? AND M.season = ? AND S.team = 'away'
+"""
+
 
 class FIFAPlayerScraper(Scraper):
     DATE_URL_COMPONENT_FIFA_VERSION = {
@@ -36,20 +62,7 @@ class FIFAPlayerScraper(Scraper):
         return self.get_soup(url)
 
     def get_teams_for_season(self, season):
-        query = """
-        SELECT DISTINCT M.home_team 
-        FROM Matches M 
-        INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
-        WHERE S.player_id = ? AND M.season = ? AND S.team = 'home'
-        UNION
-        SELECT DISTINCT M.away_team 
-        FROM Matches M 
-        INNER JOIN StartingXI S ON M.fixture_id = S.fixture_id 
-        WHERE S.player_id = ? AND M.season = ? AND S.team = 'away'
-        """
-        cursor = self.conn.cursor()
-        cursor.execute(query, (self.player_id, season, self.player_id, season))
-        return [row[0] for row in cursor.fetchall()]
+        return get_teams_for_player_in_season(self.player_id, self.conn, season)
 
     def get_player_info(self, soup):
         player_info = {}
@@ -88,7 +101,148 @@ class FIFAPlayerScraper(Scraper):
         INSERT OR IGNORE INTO FIFA_Player_Statistics 
         (player_id, overall_rating, potential, preferred_foot, weak_foot, 
         skill_moves, work_rate, body_type, best_position, best_overall_rating, 
-        position_ratings, skill_stats, fifa_version, date_fifa_card)
+        positions, stats, fifa_version, date_fifa_card)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
         self.save_to_db(query, player_data)
+
+
+def get_sofifa_rate_limiter():
+    """Returns the rate limiter shared by all scrapers requesting sofifa.com in the process."""
+    global _sofifa_rate_limiter
+    with _sofifa_rate_limiter_lock:
+        if _sofifa_rate_limiter is None:
+            _sofifa_rate_limiter = TokenBucket(SOFIFA_REQUESTS_PER_SECOND)
+        return _sofifa_rate_limiter
+
+
+def get_sofifa_player_id(player_url):
+    """Returns the sofifa id of a player from the URL of its profile, None if the URL is no player URL."""
+    match = SOFIFA_PLAYER_URL_REGEX.search(player_url)
+    return match.group(1) if match else None
+
+
+def count_words(text):
+    """Returns the number of words of a name, hyphenated parts count as separate words."""
+    return len(text.replace("-", " ").split())
+
+
+def map_season_to_fifa_version(season_begin_year):
+    """Returns the FIFA version released at the beginning of a season, e.g. 'FIFA 16' for the season 2015/16."""
+    return f"FIFA {(int(season_begin_year) + 1) % 100:02d}"
+
+
+def get_teams_for_player_in_season(player_id, conn, season):
+    """
+    Returns the teams a player has been in the starting XI for in a season.
+
+    Parameters
+    ----------
+    player_id : str
+        The API id of the player.
+    conn : Connection
+        The SQLite connection object.
+    season : int
+        The season.
+
+    Returns
+    -------
+    list
+        The team names as in the Matches table.
+    """
+    cursor = conn.cursor()
+    cursor.execute(TEAMS_FOR_SEASON_QUERY, (player_id, season, player_id, season))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def build_player_season_teams_index(conn):
+    """
+    Builds the teams of all players per season with a single grouped query.
+
+    The index answers the same question as `get_teams_for_player_in_season` for every player
+    without a database round trip. Team names are interned, such that every name is held once.
+
+    Parameters
+    ----------
+    conn : Connection
+        The SQLite connection object.
+
+    Returns
+    -------
+    dict
+        Mapping from (player_id, season) to the tuple of team names, ordered by name.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+    SELECT S.player_id, M.season, CASE S.team WHEN 'home' THEN M.home_team ELSE M.away_team END AS team_name
+    FROM StartingXI S
+    INNER JOIN Matches M ON M.fixture_id = S.fixture_id
+    WHERE S.team IN ('home', 'away')
+    GROUP BY S.player_id, M.season, team_name
+    ORDER BY S.player_id, M.season, team_name
+    """)
+
+    index = {}
+    for player_id, season, team_name in cursor.fetchall():
+        if team_name is None or season is None:
+            continue
+        key = (str(player_id), int(season))
+        index[key] = index.get(key, ()) + (sys.intern(team_name),)
+    return index
+
+
+def get_search_url(name, fifa_version=None):
+    """
+    Returns the URL of the sofifa player search for a name.
+
+    Parameters
+    ----------
+    name : str
+        The searched name.
+    fifa_version : str, optional
+        If given, e.g. 'FIFA 16', the search is restricted to the last card update of this version.
+
+    Returns
+    -------
+    str
+        The URL.
+    """
+    params = {'keyword': name}
+    if fifa_version is not None:
+        params['r'] = FIFAPlayerScraper.DATE_URL_COMPONENT_FIFA_VERSION[fifa_version][-1]
+        params['set'] = 'true'
+    return f"{SOFIFA_BASE_URL}/players?{urlencode(params)}"
+
+
+def parse_search_result(soup, team=None):
+    """
+    Returns the profile URL of the first player of a sofifa search result page.
+
+    Parameters
+    ----------
+    soup : BeautifulSoup
+        The search result page.
+    team : str, optional
+        If given, only players of this team (as in the Matches table) are considered.
+
+    Returns
+    -------
+    str or None
+        The URL of the player profile, None if no player matches.
+    """
+    if team is not None:
+        team = normalize_team_name(FIFAPlayerScraper.TEAM_NAME_MAPPING.get(team, team))
+
+    for row in soup.select('table tbody tr'):
+        player_link = row.select_one('a[href^="/player/"]')
+        if player_link is None:
+            continue
+        if team is not None:
+            team_link = row.select_one('a[href^="/team/"]')
+            if team_link is None:
+                continue
+            row_team = normalize_team_name(team_link.text)
+            if team not in row_team and row_team not in team:
+                continue
+        return SOFIFA_BASE_URL + player_link['href']
+    return None
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from lxml import etree, html
+
+
+def _has_class(class_name):
+    """Returns an XPath predicate that is true for elements with the given class."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+# the selectors are compiled once and evaluated by lxml, without a python callback per tag
+EVENT_ROWS_XPATH = etree.XPath(f"//div[{_has_class('eventRow')}]")
+MATCH_LINK_XPATH = etree.XPath("(.//a[@href][contains(@class, 'next-m:flex-row')])[1]/@href")
+TEAM_TITLES_XPATH = etree.XPath(".//a[@title]/@title")
+DATE_XPATH = etree.XPath("(.//div[" + " and ".join(_has_class(class_name) for class_name in
+                         ('text-black-main', 'font-main', 'w-full', 'text-xs', 'font-normal', 'leading-5')) + "])[1]")
+ODDS_XPATH = etree.XPath(f".//p[{_has_class('height-content')}]")
+
+
+def parse_date(raw_text_string, today=None):
+    """
+    Converts the date of a match row on oddsportal to the format of the Matches table.
+
+    Parameters
+    ----------
+    raw_text_string : str
+        The date as displayed, e.g. '21 Aug 2010', 'Yesterday, 21 Aug'.
+    today : datetime, optional
+        The date relative dates refer to, by default now.
+
+    Returns
+    -------
+    str or None
+        The date as 'dd.mm.yyyy', None if it cannot be parsed.
+    """
+    today = datetime.now() if today is None else today
+    if "Yesterday" in raw_text_string:
+        return (today - timedelta(days=1)).strftime('%d.%m.%Y')
+    elif "Today" in raw_text_string:
+        return today.strftime('%d.%m.%Y')
+    elif "Tomorrow" in raw_text_string:
+        return (today + timedelta(days=1)).strftime('%d.%m.%Y')
+    else:
+        try:
+            return datetime.strptime(raw_text_string, '%d %b %Y').strftime('%d.%m.%Y')
+        except ValueError:
+            return None
+
+
+def parse_odds(text):
+    """Converts a displayed decimal odd to a float, None for missing odds such as '-'."""
+    try:
+        return float(text.strip())
+    except ValueError:
+        return None
+
+
+def parse_odds_page(page_source):
+    """
+    Extracts all match rows with 1X2 odds from a rendered oddsportal results page in a single pass.
+
+    The date is only displayed in the first row of every match day, the following rows of the day
+    inherit it.
+
+    Parameters
+    ----------
+    page_source : str or bytes
+        The HTML of the page.
+
+    Returns
+    -------
+    list
+        One dict per match with the keys 'match_date', 'home_team', 'away_team', 'home_odds',
+        'draw_odds', 'away_odds' and 'href'. Rows without a link, both teams or three odds are skipped.
+    """
+    tree = html.fromstring(page_source)
+    today = datetime.now()
+    match_date = None
+    matches = []
+
+    for row in EVENT_ROWS_XPATH(tree):
+        hrefs = MATCH_LINK_XPATH(row)
+        if not hrefs:
+            continue
+
+        teams = TEAM_TITLES_XPATH(row)
+        if len(teams) < 2:
+            continue
+
+        div_date = DATE_XPATH(row)
+        if div_date:
+            match_date = parse_date(div_date[0].text_content().strip(), today)
+
+        odds = [parse_odds(p.text_content()) for p in ODDS_XPATH(row)[:3]]
+        if len(odds) < 3 or None in odds:
+            continue
+
+        matches.append({
+            'match_date': match_date,
+            'home_team': teams[0],
+            'away_team': teams[1],
+            'home_odds': odds[0],
+            'draw_odds': odds[1],
+            'away_odds': odds[2],
+            'href': hrefs[0],
+        })
+    return matches
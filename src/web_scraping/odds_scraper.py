@@ -1,102 +1,132 @@
 # odds_scraper.py
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from base_scraper import Scraper
-import time
-import re
+from db.db_manager import NAMECONVERSION_ODDSPORTAL_API
+from db.fixture_resolver import FixtureResolver
+from odds_page_parser import parse_odds_page, parse_date
+from webdriver_pool import WebDriverPool, wait_for_element, DEFAULT_WAIT_TIMEOUT
+
+# the match rows are rendered by javascript after the page has loaded
+EVENT_ROW_SELECTOR = "div.eventRow"
+
+ODDS_INSERT_QUERY = "INSERT OR REPLACE INTO Odds (fixture_id, home_odds, draw_odds, away_odds) VALUES (?, ?, ?, ?)"
 
 
 class OddsScraper(Scraper):
-    def __init__(self, sport, country, tournament):
+    def __init__(self, sport, country, tournament, driver_pool=None, wait_selector=EVENT_ROW_SELECTOR, wait_timeout=DEFAULT_WAIT_TIMEOUT):
         super().__init__()
         self.sport = sport
         self.country = country
         self.tournament = tournament
+        # the pool can be shared between scrapers, browsers are only started on the first page. A pool
+        # created by the scraper is closed with its connection, a shared pool by its owner.
+        self.owns_driver_pool = driver_pool is None
+        self.driver_pool = driver_pool if driver_pool is not None else WebDriverPool()
+        self.wait_selector = wait_selector
+        self.wait_timeout = wait_timeout
+        self.fixture_resolver = None
+
+    def get_page_source(self, url):
+        """
+        Loads a page in a browser leased from the pool and returns its HTML once the match rows are rendered.
+
+        Parameters
+        ----------
+        url : str
+            The URL of the page.
+
+        Returns
+        -------
+        str
+            The rendered page. If no match row appears within the wait timeout, e.g. for a page
+            without matches, the page is returned as it is.
+        """
+        with self.driver_pool.lease() as driver:
+            driver.get(url)
+            wait_for_element(driver, self.wait_selector, self.wait_timeout)
+            return driver.page_source
 
-    def get_driver(self):
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-gpu")
-        options.add_argument("window-size=1024,768")
-        options.add_argument("--no-sandbox")
-        return webdriver.Chrome(options=options)
+    def get_page_sources(self, urls):
+        """
+        Loads several pages in parallel, one page per browser of the pool.
+
+        Parameters
+        ----------
+        urls : Iterable[str]
+            The URLs of the pages.
+
+        Returns
+        -------
+        list
+            The rendered pages in the order of the URLs.
+        """
+        with ThreadPoolExecutor(max_workers=self.driver_pool.size) as executor:
+            return list(executor.map(self.get_page_source, urls))
 
     def get_soup_for_page(self, url):
-        driver = self.get_driver()
-        driver.get(url)
-        time.sleep(2)
-        soup = BeautifulSoup(driver.page_source, 'lxml')
-        driver.quit()
-        return soup
-
-    def get_match_odds(self, soup):
-        soup_matches = soup.find_all('div', {'class': 'eventRow flex w-full flex-col text-xs'})
-        match_odds = []
+        return BeautifulSoup(self.get_page_source(url), 'lxml')
+
+    def get_soups_for_pages(self, urls):
+        return [BeautifulSoup(page_source, 'lxml') for page_source in self.get_page_sources(urls)]
+
+    def close_driver_pool(self):
+        """Quits all browsers of the pool."""
+        self.driver_pool.close()
 
-        for match in soup_matches:
-            regex_match_href = re.compile(".*next-m:flex-row.*")
-            match_href = match.find(lambda tag: tag.name == 'a' and 
-                                    tag.get('href') and 
-                                    re.search(regex_match_href, " ".join(tag.get('class', []))))
-            if not match_href:
-                continue
-            href = match_href['href']
-
-            playing_teams = match.find_all('a', {'title': True})
-            if len(playing_teams) < 2:
-                continue
-            home_team = playing_teams[0].get('title')
-            away_team = playing_teams[1].get('title')
-
-            div_date = match.find(lambda tag: tag.name == 'div' and 
-                                  re.search(r"\btext-black-main\b.*\bfont-main\b.*\bw-full\b.*\btext-xs\b.*\bfont-normal\b.*\bleading-5\b", 
-                                            " ".join(tag.get('class', []))))
-            if div_date:
-                raw_text_string = div_date.text.strip()
-                match_date = self.parse_date(raw_text_string)
-
-            fixture_id = self.get_fixture_id(match_date, home_team, away_team)
+    def close_connection(self):
+        """Closes the database connection and quits the browsers of the pool if it has been created by the scraper."""
+        super().close_connection()
+        if self.owns_driver_pool:
+            self.close_driver_pool()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_connection()
+
+    def get_match_odds(self, page_source):
+        """
+        Extracts the odds of all matches of a results page and saves them in the database.
+
+        The page is parsed in a single pass, the fixtures of all its matches are resolved in memory
+        and the odds are written in a single transaction.
+
+        Parameters
+        ----------
+        page_source : str or BeautifulSoup
+            The rendered page.
+
+        Returns
+        -------
+        list
+            The matches with a resolved fixture_id, see `parse_odds_page`.
+        """
+        if isinstance(page_source, BeautifulSoup):
+            page_source = str(page_source)
+        matches = parse_odds_page(page_source)
+
+        fixture_ids = self.get_fixture_ids(matches)
+        match_odds = []
+        for match, fixture_id in zip(matches, fixture_ids):
             if fixture_id:
-                odds = match.find_all(lambda tag: tag.name == 'p' and 
-                                      re.search(r"\bheight-content\b", 
-                                                " ".join(tag.get('class', []))))
-                if len(odds) >= 3:
-                    home_odds, draw_odds, away_odds = odds[0].text, odds[1].text, odds[2].text
-                    match_odds.append({
-                        'fixture_id': fixture_id,
-                        'match_date': match_date,
-                        'home_team': home_team,
-                        'away_team': away_team,
-                        'home_odds': home_odds,
-                        'draw_odds': draw_odds,
-                        'away_odds': away_odds,
-                        'href': href
-                    })
-                    self.save_odds_in_db(match_odds[-1])
+                match_odds.append({'fixture_id': fixture_id, **match})
 
+        self.save_odds_in_db(match_odds)
         return match_odds
 
     def parse_date(self, raw_text_string):
-        if "Yesterday" in raw_text_string:
-            return (datetime.now() - timedelta(days=1)).strftime('%d.%m.%Y')
-        elif "Today" in raw_text_string:
-            return datetime.now().strftime('%d.%m.%Y')
-        elif "Tomorrow" in raw_text_string:
-            return (datetime.now() + timedelta(days=1)).strftime('%d.%m.%Y')
-        else:
-            try:
-                return datetime.strptime(raw_text_string, '%d %b %Y').strftime('%d.%m.%Y')
-            except ValueError:
-                return None
-
-    def get_fixture_id(self, match_date, home_team, away_team):
-        query = """
-        SELECT fixture_id FROM Matches 
-        WHERE game_date = ? AND home_team = ? AND away_team = ?
-        """
-        cursor = self.conn.cursor()
-        cursor.execute(query, (match_date, home_team, away_team))
-        result = cursor.fetchone()
-        return
+        return parse_date(raw_text_string)
+
+    def get_fixture_ids(self, matches):
+        """Resolves the fixture ids of parsed matches in memory, the matches are loaded once per scraper."""
+        if self.fixture_resolver is None:
+            self.fixture_resolver = FixtureResolver.from_db(self.conn, NAMECONVERSION_ODDSPORTAL_API)
+        return self.fixture_resolver.resolve_many([(match['match_date'], match['home_team'], match['away_team']) for match in matches])
+
+    def save_odds_in_db(self, match_odds):
+        """Writes the odds of several matches with a single executemany."""
+        if match_odds:
+            self.save_many_to_db(ODDS_INSERT_QUERY, [(match['fixture_id'], match['home_odds'], match['draw_odds'], match['away_odds'])
+                                                     for match in match_odds])
@@ -0,0 +1,230 @@
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from base_scraper import Scraper
+from db.write_buffer import WriteBuffer
+from fifa_player_scraper import (FIFAPlayerScraper, count_words, map_season_to_fifa_version, build_player_season_teams_index,
+                                 get_search_url, parse_search_result, get_sofifa_rate_limiter)
+
+DEFAULT_N_WORKERS = 4
+# the crawl state is written after this many updates
+CRAWL_FLUSH_SIZE = 100
+
+# searches by full name are cheap and usually successful, they are executed before the fallback searches
+FULL_NAME_PRIORITY = 0
+FALLBACK_PRIORITY = 1
+FALLBACK_SEASONS = range(2015, 2024)
+
+STATUS_PENDING = 'pending'
+STATUS_FOUND = 'found'
+STATUS_NOT_FOUND = 'not_found'
+
+SEARCH_INSERT_QUERY = "INSERT OR REPLACE INTO Sofifa_Searches (search_key, player_url) VALUES (?, ?)"
+PLAYER_UPDATE_QUERY = "UPDATE Sofifa_Crawl_Players SET stage = ?, status = ?, player_url = ? WHERE player_id = ?"
+
+
+class SearchFailedError(Exception):
+    """Raised if a search page could not be fetched, the search is retried by the next crawl."""
+
+
+def get_search_key(name, team, fifa_version):
+    """Returns the key identifying a search, identical searches of different players share it."""
+    return f"{name}|{team or ''}|{fifa_version or ''}"
+
+
+class CrawlPlayer:
+    """State of a player during the crawl: the searches to execute in order and the position of the next one."""
+
+    def __init__(self, player_id, first_name, last_name, stage):
+        self.player_id = player_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.stage = stage
+        self.searches = None
+
+
+class SofifaCrawler(Scraper):
+    """
+    Crawls the sofifa profile URLs of players with a priority queue of searches and a pool of workers.
+
+    For every player the search by full name is tried first. If it finds nothing, the player's last
+    name (or every part of a multi-word last name) is searched per FIFA version and team the player
+    has played for, until a search finds the player. The searches of all players are scheduled
+    in one queue where searches by full name have priority. Identical searches of different players,
+    e.g. a common last name in the same team and version, are executed once.
+
+    The workers share the polite rate limit for sofifa.com with the card harvester, pages served from
+    the response cache do not count against it. The crawl state, i.e. the results of the
+    searches and the status of every player, is persisted in the database, such that an
+    interrupted crawl resumes without repeating executed searches.
+
+    Parameters
+    ----------
+    n_workers : int, optional
+        Number of parallel searches, the requests to sofifa.com are limited by its host concurrency as well.
+    rate_limiter : TokenBucket, optional
+        The rate limit of the requests, by default the one shared by all sofifa scrapers of the process.
+    response_cache : ResponseCache or bool, optional
+        The cache of the fetched pages, False disables it.
+    """
+
+    def __init__(self, n_workers=DEFAULT_N_WORKERS, rate_limiter=None, response_cache=None):
+        super().__init__(response_cache=response_cache, rate_limiter=rate_limiter if rate_limiter is not None else get_sofifa_rate_limiter())
+        self.n_workers = n_workers
+        self.teams_index = None
+
+    def enqueue_players(self, df_players):
+        """
+        Adds players to the crawl, players that are already queued or have FIFA cards are skipped.
+
+        Parameters
+        ----------
+        df_players : pd.DataFrame
+            The players with the columns 'player_id', 'first_name' and 'last_name'.
+        """
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT DISTINCT player_id FROM FIFA_Player_Statistics")
+        players_with_cards = {str(row[0]) for row in db_cursor.fetchall()}
+        rows = [(str(player.player_id), player.first_name, player.last_name) for player in df_players.itertuples()
+                if str(player.player_id) not in players_with_cards]
+        self.save_many_to_db("INSERT OR IGNORE INTO Sofifa_Crawl_Players (player_id, first_name, last_name) VALUES (?, ?, ?)", rows)
+
+    def get_players(self, status):
+        """Returns (player_id, first_name, last_name, player_url) of the crawled players with the given status."""
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT player_id, first_name, last_name, player_url FROM Sofifa_Crawl_Players WHERE status = ?", (status,))
+        return db_cursor.fetchall()
+
+    def run(self):
+        """
+        Crawls all pending players.
+
+        Returns
+        -------
+        dict
+            The number of players per status, pending players remain if search pages could not be fetched.
+        """
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT search_key, player_url FROM Sofifa_Searches")
+        self.search_results = dict(db_cursor.fetchall())
+        self.queue = []
+        self.queued_players = {}
+        self.sequence = itertools.count()
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor, \
+                WriteBuffer(self.conn, flush_size=CRAWL_FLUSH_SIZE) as self.write_buffer:
+            # the searches of a player depend on the teams index, which may have grown since the last crawl,
+            # so the stored stage is no position in the new list. The players restart at their first search,
+            # advance skips the searches whose results are stored without a request.
+            db_cursor.execute("SELECT player_id, first_name, last_name FROM Sofifa_Crawl_Players WHERE status = ?", (STATUS_PENDING,))
+            for player_id, first_name, last_name in db_cursor.fetchall():
+                self.advance(CrawlPlayer(player_id, first_name, last_name, 0))
+
+            in_flight = {}
+            while self.queue or in_flight:
+                while self.queue and len(in_flight) < self.n_workers:
+                    _, _, search_key, search = heapq.heappop(self.queue)
+                    in_flight[executor.submit(self.search, *search)] = search_key
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    search_key = in_flight.pop(future)
+                    players = self.queued_players.pop(search_key)
+                    try:
+                        player_url = future.result()
+                    except SearchFailedError as e:
+                        print(f"An error occurred while searching {search_key}: {e}")
+                        continue
+
+                    self.search_results[search_key] = player_url
+                    self.write_buffer.add(SEARCH_INSERT_QUERY, (search_key, player_url))
+                    for player in players:
+                        self.advance(player)
+
+        db_cursor.execute("SELECT status, COUNT(*) FROM Sofifa_Crawl_Players GROUP BY status")
+        return dict(db_cursor.fetchall())
+
+    def advance(self, player):
+        """
+        Moves a player to its next search that is not executed yet and queues it.
+
+        Searches whose result is known are evaluated directly. If a search finds the player or
+        no search is left, the player is completed.
+        """
+        searches = self.get_searches(player)
+        while player.stage < len(searches):
+            priority, name, team, fifa_version = searches[player.stage]
+            search_key = get_search_key(name, team, fifa_version)
+
+            if search_key not in self.search_results:
+                if search_key not in self.queued_players:
+                    self.queued_players[search_key] = []
+                    heapq.heappush(self.queue, (priority, next(self.sequence), search_key, (name, team, fifa_version)))
+                self.queued_players[search_key].append(player)
+                self.write_buffer.add(PLAYER_UPDATE_QUERY, (player.stage, STATUS_PENDING, None, player.player_id))
+                return
+
+            player_url = self.search_results[search_key]
+            if player_url:
+                self.write_buffer.add(PLAYER_UPDATE_QUERY, (player.stage, STATUS_FOUND, player_url, player.player_id))
+                return
+            player.stage += 1
+            searches = self.get_searches(player)
+
+        self.write_buffer.add(PLAYER_UPDATE_QUERY, (player.stage, STATUS_NOT_FOUND, None, player.player_id))
+
+    def get_searches(self, player):
+        """
+        Returns the searches of a player as (priority, name, team, fifa_version) in the order they are tried.
+
+        The search by full name comes first. The fallback searches by last name and team are only
+        generated once the player has moved past it.
+        """
+        if player.searches is not None:
+            return player.searches
+
+        searches = []
+        if player.first_name and player.last_name:
+            searches.append((FULL_NAME_PRIORITY, f"{player.first_name} {player.last_name}", None, None))
+        if player.stage < len(searches):
+            return searches
+
+        player.searches = searches
+        if not player.last_name:
+            return searches
+
+        if count_words(player.last_name) > 1:
+            name_parts = player.last_name.replace("-", " ").split()
+        else:
+            name_parts = [player.last_name]
+
+        for season_begin_year in FALLBACK_SEASONS:
+            fifa_version = map_season_to_fifa_version(season_begin_year)
+            if fifa_version not in FIFAPlayerScraper.DATE_URL_COMPONENT_FIFA_VERSION:
+                continue
+            for team in self.get_teams_index().get((str(player.player_id), season_begin_year), ()):
+                for name in name_parts:
+                    search = (FALLBACK_PRIORITY, name, team, fifa_version)
+                    if search not in searches:
+                        searches.append(search)
+        return searches
+
+    def get_teams_index(self):
+        """Returns the teams of all players per season, built with a single query on first use."""
+        if self.teams_index is None:
+            self.teams_index = build_player_season_teams_index(self.conn)
+        return self.teams_index
+
+    def search(self, name, team=None, fifa_version=None):
+        """
+        Executes a search on sofifa, called by the workers.
+
+        Returns
+        -------
+        str or None
+            The profile URL of the found player, None if the search found no player.
+        """
+        soup = self.get_soup(get_search_url(name, fifa_version))
+        if soup is None:
+            raise SearchFailedError(f"the search page of {name} could not be fetched")
+        return parse_search_result(soup, team)
@@ -0,0 +1,163 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from db.db_manager import connect_db, close_db
+from fifa_player_scraper import SOFIFA_BASE_URL, build_player_season_teams_index
+from sofifa_crawler import STATUS_FOUND, STATUS_NOT_FOUND
+
+DEFAULT_MAX_WORKERS = 2
+# pause of the google search between its result pages, in seconds
+GOOGLE_SLEEP_INTERVAL = 5
+GOOGLE_NUM_RESULTS = 10
+
+PLAYER_URL_REGEX = re.compile(r'sofifa\.com/player/(\d+)/([^/?#]+)')
+
+SEARCH_INSERT_QUERY = "INSERT OR REPLACE INTO Sofifa_Fallback_Searches (query, player_url) VALUES (?, ?)"
+PLAYER_UPDATE_QUERY = "UPDATE Sofifa_Crawl_Players SET status = ?, player_url = ? WHERE player_id = ?"
+
+
+class GoogleSearchBackend:
+    """
+    Search backend querying google for sofifa pages.
+
+    Any callable that takes a query and returns an iterable of result URLs can be used as a search
+    backend instead, e.g. a local stub in tests.
+
+    Parameters
+    ----------
+    num_results : int, optional
+        Number of requested results per query.
+    sleep_interval : float, optional
+        Pause between the result pages of a query, in seconds.
+    """
+
+    def __init__(self, num_results=GOOGLE_NUM_RESULTS, sleep_interval=GOOGLE_SLEEP_INTERVAL):
+        # imported here, such that the pipeline can run with another backend without the package
+        from googlesearch import search
+        self.search = search
+        self.num_results = num_results
+        self.sleep_interval = sleep_interval
+
+    def __call__(self, query):
+        return list(self.search(f"{query} site:sofifa.com", num_results=self.num_results, sleep_interval=self.sleep_interval))
+
+
+def get_player_url(result_urls):
+    """Returns the sofifa profile URL of the first search result that links to a player, None if there is none."""
+    for url in result_urls:
+        match = PLAYER_URL_REGEX.search(url)
+        if match:
+            return f"{SOFIFA_BASE_URL}/player/{match.group(1)}/{match.group(2)}/"
+    return None
+
+
+def get_fallback_queries(first_name, last_name, teams):
+    """
+    Returns the queries for a player in the order they are tried: the full name with every team, most recent first, then the full name alone.
+    """
+    full_name = " ".join(name for name in (first_name, last_name) if name)
+    queries = [f"{full_name} {team}" for team in teams]
+    queries.append(full_name)
+    return list(dict.fromkeys(queries))
+
+
+class FallbackSearchPipeline:
+    """
+    Resolves the players the sofifa search could not find with a web search.
+
+    The failed players are read from the crawl state ('Sofifa_Crawl_Players' with the status
+    'not_found'), not from the log. Every player has a list of queries, see `get_fallback_queries`.
+    The queries are executed in rounds: a round executes the next query of every unresolved player,
+    identical queries of different players once, with bounded parallelism. The results are cached
+    in 'Sofifa_Fallback_Searches', such that a query is never sent twice, also across runs.
+
+    Resolved players are marked as found with their profile URL, their cards can then be harvested
+    with FIFACardHarvester.
+
+    Parameters
+    ----------
+    search_backend : Callable[[str], Iterable[str]], optional
+        Function returning the result URLs of a query, by default a GoogleSearchBackend.
+    max_workers : int, optional
+        Maximum number of parallel queries.
+    conn : Connection, optional
+        The SQLite connection object, by default a new connection to the database.
+    """
+
+    def __init__(self, search_backend=None, max_workers=DEFAULT_MAX_WORKERS, conn=None):
+        self.search_backend = search_backend if search_backend is not None else GoogleSearchBackend()
+        self.max_workers = max_workers
+        self.owns_connection = conn is None
+        self.conn = connect_db() if conn is None else conn
+
+    def get_failed_players(self):
+        """Returns (player_id, first_name, last_name) of the players the sofifa search could not find."""
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT player_id, first_name, last_name FROM Sofifa_Crawl_Players WHERE status = ?", (STATUS_NOT_FOUND,))
+        return db_cursor.fetchall()
+
+    def run(self):
+        """
+        Resolves all failed players.
+
+        Returns
+        -------
+        dict
+            Mapping from the player id to the profile URL of the resolved players.
+        """
+        db_cursor = self.conn.cursor()
+        db_cursor.execute("SELECT query, player_url FROM Sofifa_Fallback_Searches")
+        results = dict(db_cursor.fetchall())
+
+        # the teams of every player, most recent season first
+        teams_by_player = {}
+        for (player_id, season), teams in sorted(build_player_season_teams_index(self.conn).items(), key=lambda item: -item[0][1]):
+            teams_by_player.setdefault(player_id, []).extend(teams)
+
+        players = {}
+        for player_id, first_name, last_name in self.get_failed_players():
+            if first_name or last_name:
+                players[player_id] = get_fallback_queries(first_name, last_name, teams_by_player.get(str(player_id), []))
+
+        resolved = {}
+        round_index = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while players:
+                queries = {player_id: player_queries[round_index] for player_id, player_queries in players.items()}
+                new_queries = sorted(set(queries.values()) - results.keys())
+                for query, player_url in zip(new_queries, executor.map(self.search, new_queries)):
+                    if player_url is not False:
+                        results[query] = player_url
+                        db_cursor.execute(SEARCH_INSERT_QUERY, (query, player_url))
+                self.conn.commit()
+
+                for player_id, query in queries.items():
+                    player_url = results.get(query)
+                    if player_url:
+                        resolved[player_id] = player_url
+                        db_cursor.execute(PLAYER_UPDATE_QUERY, (STATUS_FOUND, player_url, player_id))
+                    if player_url or round_index + 1 == len(players[player_id]):
+                        del players[player_id]
+                self.conn.commit()
+                round_index += 1
+        return resolved
+
+    def search(self, query):
+        """
+        Executes a query with the search backend.
+
+        Returns
+        -------
+        str, None or False
+            The profile URL of the first player in the results, None if no result links to a
+            player, False if the search failed (the query is not cached and retried by the next run).
+        """
+        try:
+            return get_player_url(self.search_backend(query))
+        except Exception as e:
+            print(f"An error occurred while searching for {query}: {e}")
+            return False
+
+    def close(self):
+        """Closes the database connection if it has been opened by the pipeline."""
+        if self.owns_connection:
+            close_db(self.conn)
@@ -0,0 +1,148 @@
+import threading
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_WAIT_TIMEOUT = 10
+
+
+def create_headless_chrome():
+    """Starts a headless Chrome."""
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("window-size=1024,768")
+    options.add_argument("--no-sandbox")
+    return webdriver.Chrome(options=options)
+
+
+def wait_for_element(driver, css_selector, timeout=DEFAULT_WAIT_TIMEOUT):
+    """
+    Waits until an element matching a CSS selector is present on the current page.
+
+    Parameters
+    ----------
+    driver : WebDriver
+        The browser.
+    css_selector : str
+        The CSS selector of the element.
+    timeout : float, optional
+        Maximum number of seconds to wait.
+
+    Returns
+    -------
+    bool
+        True if the element is present, False if the timeout has expired.
+    """
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)))
+        return True
+    except TimeoutException:
+        return False
+
+
+class WebDriverPool:
+    """
+    Pool of long-lived browsers that are leased page by page.
+
+    Browsers are started lazily up to the size of the pool and reused for all following pages, such
+    that the startup of a browser is paid once per worker instead of once per page. A browser that
+    fails is quit and replaced by a new one on the next lease.
+
+    Parameters
+    ----------
+    size : int, optional
+        Maximum number of browsers.
+    create_driver : Callable[[], WebDriver], optional
+        Function starting a browser, by default a headless Chrome.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, create_driver=create_headless_chrome):
+        self.size = size
+        self.create_driver = create_driver
+        self.idle_drivers = []
+        self.n_drivers = 0
+        # guards the slots of the pool, waiting threads are notified whenever a browser or a slot is freed
+        self.condition = threading.Condition()
+        self.closed = False
+
+    @contextmanager
+    def lease(self):
+        """
+        Leases a browser for the duration of a `with` block.
+
+        If the block raises, the browser may be in an unknown state and is quit, its slot is freed
+        for a new browser.
+
+        Yields
+        ------
+        WebDriver
+            A browser that is used by no other thread until the block is left.
+        """
+        driver = self._acquire()
+        discard = True
+        try:
+            yield driver
+            discard = False
+        finally:
+            self._release(driver, discard)
+
+    def close(self):
+        """Quits all idle browsers, leased browsers are quit when they are returned."""
+        with self.condition:
+            self.closed = True
+            idle_drivers, self.idle_drivers = self.idle_drivers, []
+            # threads waiting for a browser raise instead of waiting forever
+            self.condition.notify_all()
+        for driver in idle_drivers:
+            self._discard(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _acquire(self):
+        with self.condition:
+            while True:
+                if self.closed:
+                    raise RuntimeError("The webdriver pool is closed")
+                if self.idle_drivers:
+                    return self.idle_drivers.pop()
+                if self.n_drivers < self.size:
+                    self.n_drivers += 1
+                    break
+                # all browsers are leased, wait for a browser to be returned or quit
+                self.condition.wait()
+
+        try:
+            return self.create_driver()
+        except BaseException:
+            self._free_slot()
+            raise
+
+    def _release(self, driver, discard):
+        with self.condition:
+            if not discard and not self.closed:
+                self.idle_drivers.append(driver)
+                self.condition.notify()
+                return
+        self._discard(driver)
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self._free_slot()
+
+    def _free_slot(self):
+        with self.condition:
+            self.n_drivers -= 1
+            self.condition.notify()